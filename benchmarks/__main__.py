@@ -0,0 +1,99 @@
+"""Benchmark suite of the runner and API interaction, with JSON results and regression checks against a baseline.
+
+Run with: python -m benchmarks [--quick] [--only handlers long_polling] [--output results.json]
+Compare:  python -m benchmarks --compare baseline.json [--threshold 0.2]
+          python -m benchmarks --compare baseline.json --results results.json  (without running)
+Exits with status 1 when a result regressed: its rate dropped or its p99 latency rose by more than the threshold.
+"""
+from __future__ import annotations
+import argparse
+import json
+import logging
+import platform
+import sys
+import time
+from typing import Any
+
+import anyio
+
+from .suite import SCENARIOS, Settings
+
+
+
+async def run(names: list[str], settings: Settings) -> dict[str, dict[str, Any]]:
+    results = {}
+    for name in names:
+        print(f'{name}: {SCENARIOS[name].__doc__.splitlines()[0]}', file=sys.stderr)
+        for result in await SCENARIOS[name](settings):
+            results[result.name] = result.as_dict()
+            print(f'  {result.name:<32} {format_result(results[result.name])}', file=sys.stderr)
+    return results
+
+
+def format_result(result: dict[str, Any]) -> str:
+    text = f'{result["ops_per_s"]:>12,.0f} /s'
+    if 'p99_ms' in result:
+        text += f'  p50 {result["p50_ms"]:8.3f} ms  p99 {result["p99_ms"]:8.3f} ms'
+    return text
+
+
+def compare(results: dict[str, dict[str, Any]], baseline: dict[str, dict[str, Any]], threshold: float) -> list[str]:
+    """Names of the results that regressed from the baseline."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        changes = [f'rate {result["ops_per_s"] / base["ops_per_s"] - 1:+.1%}']
+        regressed = result['ops_per_s'] < base['ops_per_s'] * (1 - threshold)
+        if 'p99_ms' in result and 'p99_ms' in base:
+            changes.append(f'p99 {result["p99_ms"] / base["p99_ms"] - 1:+.1%}')
+            regressed |= result['p99_ms'] > base['p99_ms'] * (1 + threshold)
+        if regressed:
+            regressions.append(name)
+        print(f'{"REGRESSED" if regressed else "ok":>9}  {name:<32} {", ".join(changes)}')
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.splitlines()[1],
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS), help='scenarios to run')
+    parser.add_argument('--quick', action='store_true', help='shorter runs and fewer long-polls, for a smoke test')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON results to compare with')
+    parser.add_argument('--results', help='compare these JSON results instead of running the suite')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative change counted as a regression')
+    args = parser.parse_args()
+    logging.getLogger('httpx').setLevel(logging.WARNING)  # one line per request otherwise
+
+    if args.results:
+        with open(args.results) as f:
+            document = json.load(f)
+    else:
+        settings = Settings(args.quick)
+        document = {
+            'meta': {
+                'time': time.time(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'quick': args.quick,
+            },
+            'results': anyio.run(run, args.only, settings),
+        }
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(document, f, indent=2)
+        else:
+            json.dump(document, sys.stdout, indent=2)
+            print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(document['results'], baseline['results'], args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Construction of a Litestar app from runners with many handlers:
+binding the handlers of several runners, and a whole app for one runner, compared with the former dir() scan and deepcopy binding.
+
+Run with: python -m benchmarks.app_construction
+"""
+from __future__ import annotations
+import copy
+import time
+import types
+
+from litestar import Litestar, get
+from litestar.handlers import BaseRouteHandler
+
+from runner_with_api.litestar import LitestarAsyncRunner
+
+
+
+HANDLERS = 200
+RUNNERS = 4
+REPEAT = 5
+
+
+def make_handler(i: int) -> BaseRouteHandler:
+    async def handler(self) -> dict:
+        return {'i': i}
+
+    handler.__name__ = f'handler_{i}'
+    return get(f'/h{i}')(handler)
+
+
+BenchRunner = type('BenchRunner', (LitestarAsyncRunner,), {f'handler_{i}': make_handler(i) for i in range(HANDLERS)})
+
+
+def deepcopy_handlers(runner: LitestarAsyncRunner) -> list[BaseRouteHandler]:
+    """The binding replaced by the class registry: dir() scan of the instance and deepcopy of each handler."""
+    handlers = []
+    for name in dir(runner):
+        if name == 'handlers':
+            continue
+        method = getattr(runner, name)
+        if isinstance(method, BaseRouteHandler):
+            handler = copy.deepcopy(method)
+            handler._fn = types.MethodType(handler._fn, runner)
+            handlers.append(handler)
+    return handlers
+
+
+def bench(name: str, fn) -> None:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    elapsed = (time.perf_counter() - start) / REPEAT
+    print(f'{name:>22}: {elapsed * 1000:>8.1f} ms')
+
+
+def main() -> None:
+    print(f'{RUNNERS} runners x {HANDLERS} handlers')
+    bench('bind deepcopy', lambda: [deepcopy_handlers(BenchRunner()) for _ in range(RUNNERS)])
+    bench('bind registry', lambda: [BenchRunner().handlers_at(f'/r{i}') for i in range(RUNNERS)])
+    bench('app deepcopy', lambda: Litestar(deepcopy_handlers(BenchRunner())))
+    bench('app registry', lambda: Litestar(BenchRunner().handlers))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Runners with the same endpoints on both adapters, driven by the benchmark suite (python -m benchmarks)."""
+from __future__ import annotations
+import time
+
+import anyio
+from fastapi import FastAPI, Request as FastapiRequest
+from litestar import Litestar, Request as LitestarRequest, get
+
+from runner_with_api.fastapi import FastapiAsyncRunner, runner_router
+from runner_with_api.fastapi.cancellation import cancel_on_disconnect as fastapi_cancel_on_disconnect
+from runner_with_api.fastapi.utils import LongPollingResponse as FastapiLongPollingResponse
+from runner_with_api.litestar import LitestarAsyncRunner
+from runner_with_api.litestar.cancellation import cancel_on_disconnect as litestar_cancel_on_disconnect
+from runner_with_api.litestar.utils import LongPollingResponse as LitestarLongPollingResponse
+from runner_with_api.utils import ResultSlot
+
+
+
+BUSY = 0.001  # seconds of CPU per run() cycle, then the loop yields
+
+
+class BusyRunner:
+    """run() keeps the event loop busy like a processing loop, the handlers read its state."""
+
+    async def init(self) -> None:
+        self.cycle = 0
+        self.config = {'exposure': 1.5, 'gain': 2, 'channels': list(range(16))}
+
+    async def run(self) -> None:
+        while True:
+            deadline = time.perf_counter() + BUSY
+            while time.perf_counter() < deadline:
+                pass
+            self.cycle += 1
+            await anyio.sleep(0)
+
+
+class FastapiBenchRunner(BusyRunner, FastapiAsyncRunner):
+    def __init__(self) -> None:
+        self.slot = ResultSlot[dict](FastapiLongPollingResponse.serialize)
+
+    @runner_router.get('/config')
+    async def get_config(self) -> dict:
+        return self.config
+
+    @runner_router.get('/watched')
+    async def watched(self, request: FastapiRequest) -> dict:
+        async with fastapi_cancel_on_disconnect(request, watcher=self.disconnect_watcher):
+            return self.config
+
+    @runner_router.get('/poll')
+    async def poll(self):
+        return FastapiLongPollingResponse(self.slot.wait(), scheduler=self.keepalive_scheduler)
+
+
+class LitestarBenchRunner(BusyRunner, LitestarAsyncRunner):
+    def __init__(self) -> None:
+        self.slot = ResultSlot[dict](LitestarLongPollingResponse.serialize)
+
+    @get('/config')
+    async def get_config(self) -> dict:
+        return self.config
+
+    @get('/watched')
+    async def watched(self, request: LitestarRequest) -> dict:
+        async with litestar_cancel_on_disconnect(request, watcher=self.disconnect_watcher):
+            return self.config
+
+    @get('/poll')
+    async def poll(self) -> LitestarLongPollingResponse[dict]:
+        return LitestarLongPollingResponse(self.slot.wait(), scheduler=self.keepalive_scheduler)
+
+
+def fastapi_app() -> tuple[FastapiBenchRunner, FastAPI]:
+    runner = FastapiBenchRunner()
+    api = FastAPI(lifespan=runner.lifespan)
+    api.include_router(runner.router)
+    return runner, api
+
+
+def litestar_app() -> tuple[LitestarBenchRunner, Litestar]:
+    runner = LitestarBenchRunner()
+    return runner, Litestar(runner.handlers, lifespan=[runner.lifespan])
+
+
+fastapi_runner, fastapi_api = fastapi_app()  # served by uvicorn in a subprocess
+litestar_runner, litestar_api = litestar_app()
@@ -0,0 +1,52 @@
+"""Startup time of a runner computing its warm state in init() versus restoring it from a checkpoint.
+
+Run with: python -m benchmarks.checkpoint
+"""
+from __future__ import annotations
+import array
+import math
+import tempfile
+import time
+from unittest.mock import Mock
+
+import anyio
+
+from runner_with_api import ASGIRunner
+from runner_with_api.checkpoint import Checkpoint
+
+
+
+SIZE = 2_000_000  # float64 calibration table, 16 MB
+
+
+def make_runner(directory: str) -> type[ASGIRunner]:
+    class CalibratedRunner(ASGIRunner):
+        checkpoint = Checkpoint(directory, ['calibration', 'lookup'], interval=3600.)
+
+        async def init(self) -> None:
+            if not self.restored:
+                self.calibration = array.array('d', (math.sin(i * 1e-3) * math.exp(-i * 1e-7) for i in range(SIZE)))
+                self.lookup = {f'channel-{i}': i * 0.5 for i in range(10_000)}
+
+    return CalibratedRunner
+
+
+async def startup(runner: ASGIRunner) -> float:
+    start = time.perf_counter()
+    async with runner.lifespan(Mock()):
+        elapsed = time.perf_counter() - start
+    return elapsed
+
+
+async def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        Runner = make_runner(directory)
+        cold = await startup(Runner())  # saves the checkpoint on exit
+        warm = await startup(Runner())
+        print(f'{"cold init":>10}: {cold * 1000:8.1f} ms')
+        print(f'{"restore":>10}: {warm * 1000:8.1f} ms ({Runner.checkpoint.last_save["bytes"] / 1e6:.1f} MB checkpoint, '
+            f'saved in {Runner.checkpoint.last_save["duration"] * 1000:.1f} ms)')
+
+
+if __name__ == '__main__':
+    anyio.run(main)
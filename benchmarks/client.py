@@ -0,0 +1,39 @@
+"""HTTP load helpers shared by the benchmarks."""
+from __future__ import annotations
+import time
+
+import anyio
+import httpx
+
+
+
+async def load(client: httpx.AsyncClient, url: str, concurrency: int, duration: float) -> tuple[int, float, list[float]]:
+    """GET {url} from {concurrency} tasks for {duration} seconds. Return (requests, elapsed, latencies)."""
+    latencies: list[float] = []
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:  # cancelling requests in flight can hang the connection pool
+            t = time.perf_counter()
+            r = await client.get(url)
+            r.raise_for_status()
+            latencies.append(time.perf_counter() - t)
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(concurrency):
+            tg.start_soon(worker)
+    return len(latencies), time.perf_counter() - start, latencies
+
+
+async def wait_ready(url: str, timeout=30.) -> None:
+    """Poll {url} until it answers 200, e.g. a server starting in a subprocess."""
+    async with httpx.AsyncClient() as client:
+        with anyio.fail_after(timeout):
+            while True:
+                try:
+                    if (await client.get(url)).status_code == 200:
+                        return
+                except httpx.TransportError:
+                    pass
+                await anyio.sleep(0.2)
@@ -0,0 +1,70 @@
+"""Throughput of AnyioDeque: per-item put/get versus the batch and nowait APIs.
+
+Run with: python -m benchmarks.deque
+"""
+from __future__ import annotations
+import time
+
+import anyio
+
+from runner_with_api.utils import AnyioDeque
+
+
+
+N = 100_000
+BATCH = 100
+
+
+async def per_item() -> None:
+    deque = AnyioDeque[int](N)
+
+    async def consume():
+        for _ in range(N):
+            await deque.get()
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(consume)
+        for i in range(N):
+            await deque.put(i)
+
+
+async def batched() -> None:
+    deque = AnyioDeque[int](N)
+
+    async def consume():
+        received = 0
+        while received < N:
+            received += len(await deque.get_many())
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(consume)
+        for i in range(0, N, BATCH):
+            await deque.put_many(range(i, i + BATCH))
+
+
+async def nowait() -> None:
+    deque = AnyioDeque[int](N)
+
+    async def consume():
+        received = 0
+        while received < N:
+            received += len(await deque.get_many())
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(consume)
+        for i in range(N):
+            deque.put_nowait(i)
+            if i % BATCH == 0:
+                await anyio.sleep(0)
+
+
+async def main() -> None:
+    for bench in (per_item, batched, nowait):
+        start = time.perf_counter()
+        await bench()
+        elapsed = time.perf_counter() - start
+        print(f'{bench.__name__:>10}: {N / elapsed:>12,.0f} items/s')
+
+
+if __name__ == '__main__':
+    anyio.run(main)
@@ -0,0 +1,40 @@
+"""Encoding throughput and payload size of a frame of samples, as JSON, msgpack and raw array.
+
+Run with: python -m benchmarks.encodings
+"""
+from __future__ import annotations
+import array
+import random
+import time
+
+from runner_with_api.encoding import ARRAY, JSON, MSGPACK
+from runner_with_api.litestar.utils import LongPollingResponse
+
+
+
+SAMPLES = 100_000
+DURATION = 1.
+
+
+def bench(media_type: str, data) -> None:
+    encode = LongPollingResponse.encoding(media_type, (JSON, MSGPACK, ARRAY)).encode
+    payload = encode(data)
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        encode(data)
+        count += 1
+    elapsed = time.perf_counter() - start
+    print(f'{media_type:>25}: {len(payload) / 1024:8.1f} KiB, {count * len(payload) / elapsed / 1e6:8.1f} MB/s, '
+        f'{elapsed / count * 1e3:6.2f} ms/frame')
+
+
+def main() -> None:
+    samples = array.array('d', (random.random() for _ in range(SAMPLES)))
+    print(f'{SAMPLES} float64 samples')
+    for media_type in (JSON, MSGPACK, ARRAY):
+        bench(media_type, samples)
+
+
+if __name__ == '__main__':
+    main()
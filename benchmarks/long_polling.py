@@ -0,0 +1,61 @@
+"""CPU time and memory per parked long-poll, with per-connection timers versus a shared KeepaliveScheduler.
+
+Run with: python -m benchmarks.long_polling
+"""
+from __future__ import annotations
+import time
+import tracemalloc
+
+import anyio
+
+from runner_with_api.utils import KeepaliveScheduler, http_long_polling
+
+
+
+N = 10_000
+PERIOD = 0.1
+DURATION = 2.
+
+
+async def park(scheduler: KeepaliveScheduler | None) -> tuple[float, float]:
+    """Park N long-polls for DURATION seconds. Return (CPU microseconds per connection per second, bytes per connection)."""
+    release = anyio.Event()
+
+    async def func() -> bool:
+        await release.wait()
+        return True
+
+    async def poll() -> None:
+        async for _ in http_long_polling(func(), b'\n', PERIOD, scheduler):
+            pass
+
+    tracemalloc.start()
+    async with anyio.create_task_group() as tg:
+        if scheduler:
+            tg.start_soon(scheduler.run)
+        for _ in range(N):
+            tg.start_soon(poll)
+
+        await anyio.sleep(PERIOD)  # let everything park
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        cpu = time.process_time()
+        await anyio.sleep(DURATION)
+        cpu = time.process_time() - cpu
+
+        release.set()
+        await anyio.sleep(PERIOD)
+        tg.cancel_scope.cancel()
+
+    return cpu / N / DURATION * 1e6, memory / N
+
+
+async def main() -> None:
+    for name, scheduler in [('timers', None), ('scheduler', KeepaliveScheduler(PERIOD))]:
+        cpu, memory = await park(scheduler)
+        print(f'{name:>10}: {cpu:6.1f} us CPU/s, {memory / 1024:5.1f} KiB per parked connection')
+
+
+if __name__ == '__main__':
+    anyio.run(main)
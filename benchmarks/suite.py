@@ -0,0 +1,201 @@
+"""Scenarios of the benchmark suite: each returns named results with a rate and, when measured, latency percentiles."""
+from __future__ import annotations
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable
+
+import anyio
+import httpx
+
+from runner_with_api.frame_ring import FrameReader, FrameRing
+from runner_with_api.recorder import Recorder
+
+from . import deque as deque_bench
+from .apps import fastapi_app, litestar_app
+from .client import load, wait_ready
+
+
+
+class Result:
+    __slots__ = ('name', 'count', 'elapsed', 'latencies')
+
+    def __init__(self, name: str, count: int, elapsed: float, latencies: list[float] | None = None) -> None:
+        self.name = name
+        self.count = count
+        self.elapsed = elapsed
+        self.latencies = latencies
+
+
+    def as_dict(self) -> dict[str, Any]:
+        result: dict[str, Any] = {'count': self.count, 'ops_per_s': self.count / self.elapsed}
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            for p in (50, 99):
+                result[f'p{p}_ms'] = latencies[min(len(latencies) - 1, len(latencies) * p // 100)] * 1000
+        return result
+
+
+class Settings:
+    """Sizes of the scenarios, reduced with --quick."""
+    def __init__(self, quick=False) -> None:
+        self.duration = 0.5 if quick else 3.
+        self.concurrency = 16 if quick else 64
+        self.waiters = 1_000 if quick else 20_000
+        self.records = 20_000 if quick else 200_000
+
+
+Scenario = Callable[[Settings], Awaitable[list[Result]]]
+SCENARIOS: dict[str, Scenario] = {}
+
+def scenario(fn: Scenario) -> Scenario:
+    SCENARIOS[fn.__name__] = fn
+    return fn
+
+
+APPS = {'fastapi': fastapi_app, 'litestar': litestar_app}
+
+
+@scenario
+async def handlers(settings: Settings) -> list[Result]:
+    """Handler requests/s in process (httpx.ASGITransport) while run() keeps the event loop busy.
+    /watched is the same handler within cancel_on_disconnect, to measure its overhead."""
+    results = []
+    for adapter, make_app in APPS.items():
+        runner, api = make_app()
+        async with runner.lifespan(api):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api), base_url='http://bench.local') as client:
+                for path in ('/config', '/watched'):
+                    count, elapsed, latencies = await load(client, path, settings.concurrency, settings.duration)
+                    results.append(Result(f'{adapter}/asgi{path}', count, elapsed, latencies))
+        assert runner.cycle > 0
+    return results
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@scenario
+async def uvicorn(settings: Settings) -> list[Result]:
+    """Handler requests/s over a real socket, the app being served by uvicorn in a subprocess."""
+    results = []
+    for adapter in APPS:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, '-m', 'uvicorn', f'benchmarks.apps:{adapter}_api',
+            '--port', str(port), '--log-level', 'warning'], cwd=os.path.dirname(os.path.dirname(__file__)))
+        try:
+            url = f'http://127.0.0.1:{port}/config'
+            await wait_ready(url)
+            limits = httpx.Limits(max_connections=settings.concurrency)
+            async with httpx.AsyncClient(limits=limits) as client:
+                count, elapsed, latencies = await load(client, url, settings.concurrency, settings.duration)
+            results.append(Result(f'{adapter}/uvicorn/config', count, elapsed, latencies))
+        finally:
+            server.terminate()
+            server.wait()
+    return results
+
+
+@scenario
+async def long_polling(settings: Settings) -> list[Result]:
+    """Long-polls parked on a shared ResultSlot, then all resolved at once.
+    Measures the rate at which they are parked, then the delay from the slot being set to each response."""
+    results = []
+    for adapter, make_app in APPS.items():
+        runner, api = make_app()
+        async with runner.lifespan(api):
+            transport = httpx.ASGITransport(app=api)
+            async with httpx.AsyncClient(transport=transport, base_url='http://bench.local', timeout=None) as client:
+                received: list[float] = []
+
+                async def poll() -> None:
+                    r = await client.get('/poll')
+                    r.raise_for_status()
+                    received.append(time.perf_counter())
+
+                start = time.perf_counter()
+                async with anyio.create_task_group() as tg:
+                    for _ in range(settings.waiters):
+                        tg.start_soon(poll)
+                    while runner.slot.waiting < settings.waiters:
+                        await anyio.sleep(0.01)
+                    parked = time.perf_counter() - start
+
+                    published = time.perf_counter()
+                    runner.slot.set({'cycle': runner.cycle})
+
+                delivered = time.perf_counter() - published
+                results.append(Result(f'{adapter}/long_polling/park', settings.waiters, parked))
+                results.append(Result(f'{adapter}/long_polling/deliver', len(received), delivered,
+                    [t - published for t in received]))
+    return results
+
+
+@scenario
+async def deque(settings: Settings) -> list[Result]:
+    """AnyioDeque items/s, per item and with the batch and nowait APIs (see benchmarks.deque)."""
+    results = []
+    for bench in (deque_bench.per_item, deque_bench.batched, deque_bench.nowait):
+        start = time.perf_counter()
+        await bench()
+        results.append(Result(f'deque/{bench.__name__}', deque_bench.N, time.perf_counter() - start))
+    return results
+
+
+@scenario
+async def recorder(settings: Settings) -> list[Result]:
+    """Recorder records/s of 256 bytes buffered by record(), written by the flushing thread, and streamed by time range."""
+    n = settings.records
+    payload = bytes(256)
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = Recorder(directory, segment_size=16 << 20, max_bytes=32 << 20)
+        start = time.perf_counter()
+        for i in range(n):
+            recorder.record(payload, i * 0.001)  # 1 kHz
+        recorded = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await recorder.flush()
+        flushed = time.perf_counter() - start
+
+        kept = sum(segment.size for segment in recorder.segments) // (256 + 12)
+        start = time.perf_counter()
+        size = 0
+        async for chunk in recorder.stream():
+            size += len(chunk)
+        streamed = time.perf_counter() - start
+        assert size == kept * (256 + 12)
+    return [Result('recorder/record', n, recorded), Result('recorder/flush', n, flushed), Result('recorder/stream', kept, streamed)]
+
+
+@scenario
+async def frame_ring(settings: Settings) -> list[Result]:
+    """FrameRing frames/s of 1 MiB published, then mapped by a reader without copy, or copied and validated."""
+    n = settings.records // 20
+    frame = bytes(1 << 20)
+    ring = FrameRing(slots=16, slot_size=len(frame))
+    ring.open()
+    try:
+        with FrameReader(ring.name) as reader:
+            results = []
+            start = time.perf_counter()
+            for _ in range(n):
+                ring.publish(frame)
+            results.append(Result('frame_ring/publish', n, time.perf_counter() - start))
+
+            for name, read in (('map', lambda mapped: mapped.valid()), ('copy', lambda mapped: mapped.copy() is not None)):
+                start = time.perf_counter()
+                for _ in range(n):
+                    mapped = reader.frame()
+                    assert mapped is not None and read(mapped)
+                results.append(Result(f'frame_ring/{name}', n, time.perf_counter() - start))
+                del mapped
+    finally:
+        ring.close()
+    return results
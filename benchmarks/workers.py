@@ -0,0 +1,51 @@
+"""Requests/s of a JSON-heavy handler versus the number of uvicorn workers in multi-worker mode.
+
+Run with: python -m benchmarks.workers
+"""
+from __future__ import annotations
+import os
+import subprocess
+import sys
+import time
+
+import anyio
+import httpx
+
+from .client import load, wait_ready
+
+
+
+PORT = 8765
+CONCURRENCY = 64
+DURATION = 3.
+SERVER = '''
+from benchmarks.workers_app import runner
+runner.run_with_api('benchmarks.workers_app:api', workers={workers}, port={port}, log_level='warning')
+'''
+
+
+async def rate(url: str) -> float:
+    """Hammer {url} for DURATION seconds, return requests/s."""
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=CONCURRENCY)) as client:
+        count, elapsed, _ = await load(client, url, CONCURRENCY, DURATION)
+    return count / elapsed
+
+
+def main() -> None:
+    url = f'http://127.0.0.1:{PORT}/samples'
+    for n in (1, 2, 4):
+        if n > os.cpu_count():  # type: ignore[operator]
+            break
+        server = subprocess.Popen([sys.executable, '-c', SERVER.format(workers=n, port=PORT)])
+        try:
+            anyio.run(wait_ready, url)
+            requests_per_s = anyio.run(rate, url)
+            print(f'{n} worker(s): {requests_per_s:8.0f} req/s')
+        finally:
+            server.terminate()
+            server.wait()
+            time.sleep(0.5)
+
+
+if __name__ == '__main__':
+    main()
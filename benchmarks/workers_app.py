@@ -0,0 +1,31 @@
+"""Application served by benchmarks.workers."""
+from anyio import sleep
+from litestar import Litestar, get
+
+from runner_with_api.litestar import LitestarAsyncRunner
+from runner_with_api.workers import primary
+
+
+
+class BenchRunner(LitestarAsyncRunner):
+    async def init(self) -> None:
+        self.cycle = 0
+
+    async def run(self) -> None:
+        while True:
+            self.cycle += 1
+            await sleep(0.01)
+
+    @primary
+    async def get_cycle(self) -> int:
+        return self.cycle
+
+    @get('/samples')
+    async def samples(self) -> dict:
+        """JSON-heavy handler: small state read from the primary, large response built in the worker."""
+        cycle = await self.get_cycle()
+        return {'cycle': cycle, 'samples': [{'i': i, 'value': (cycle * i) % 997 / 997} for i in range(2000)]}
+
+
+runner = BenchRunner()
+api = Litestar(runner.handlers, lifespan=[runner.lifespan])
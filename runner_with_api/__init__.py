@@ -1,21 +1,70 @@
 from __future__ import annotations
 import logging
+import os
 import signal
-from contextlib import asynccontextmanager
-from typing import Any
+import tempfile
+import time
+from contextlib import asynccontextmanager, contextmanager
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Callable, TypeVar
 
-import uvicorn
-from anyio import create_task_group
-from uvicorn._types import ASGIApplication
+import anyio
+from anyio import create_task_group, from_thread
+
+from ._primary import IPC_PATH_ENV, primary
+from .cancellation import DisconnectWatcher
+from .metrics import Metrics
+from .periodic import Periodic
+from .response_cache import ResponseCache
+from .startup import Startup
+from .state import VersionedState
+from .supervisor import Supervisor
+from .utils import KeepaliveScheduler
+if TYPE_CHECKING:
+    from uvicorn._types import ASGIApplication
+
+    from .checkpoint import Checkpoint
+    from .frame_ring import FrameRing
+    from .offload import OffloadPool
+    from .recorder import Recorder
 
 
 
 logger = logging.getLogger(__name__)
+T = TypeVar('T')
 
 
 class ASGIRunner:
     """Base class for creating an async process runner bound to an ASGI application"""
 
+    metrics: Metrics | None = None
+    """Set to Metrics() to enable the instrumentation and the /metrics endpoint, each instance gets its own."""
+
+    checkpoint: Checkpoint | None = None
+    """Set to Checkpoint(directory, attributes) to save durable attributes and restore them before init()."""
+
+    restored = False
+    """Whether the checkpoint attributes were restored, init() can then skip recomputing them."""
+
+    frame_ring: FrameRing | None = None
+    """Set to FrameRing(slots, slot_size) to publish frames in shared memory for the local readers,
+    with self.frame_ring.publish(frame). The API serves its metadata at /frames.
+    Set on the class, it is a template: the lifespan gives each instance a copy of its own."""
+
+    drain_timeout = 0.
+    """Seconds the shutdown may spend draining (see drain()) before canceling the tasks. 0 cancels right away."""
+
+    drain_retry_after = 1.
+    """Long-polls refused or redirected while draining are told to retry within this many seconds."""
+
+    drain_redirect_time = 0.1
+    """Seconds kept at the end of drain_timeout to redirect the long-polls still parked if run() has not returned."""
+
+    drain_report: dict[str, Any] | None = None
+    """Outcome of the last drain: duration, whether run() finished, and the long-polls resolved, redirected,
+    rejected or dropped."""
+
+
     async def init(self) -> None:
         """Initialize the runner. The ASGI app will not service requests until this method is finished."""
         ...
@@ -23,7 +72,8 @@ class ASGIRunner:
 
     async def run(self) -> None:
         """Long running task. This should generally never return.
-        Gets canceled by the lifespan function."""
+        Gets canceled by the lifespan function.
+        With a drain_timeout, check self.stopping between cycles and return to finish cleanly on shutdown."""
         ...
 
 
@@ -34,34 +84,300 @@ class ASGIRunner:
         signal.raise_signal(signal.SIGTERM)  # currently the only way to shutdown uvicorn from code   # https://github.com/encode/uvicorn/discussions/1103
 
 
+    @contextmanager
+    def measure_iteration(self):
+        """Context manager for the body of the run() loop, recording the iteration time if metrics are enabled."""
+        if self.metrics is None:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.metrics.run_iteration.observe(time.perf_counter() - start)
+
+
+    def _collect_metrics(self, metrics: Metrics) -> None:
+        metrics.collect('runner_disconnect_cancellations_total', 'Handlers cancelled because the client disconnected.',
+            'counter', lambda: self.disconnect_watcher.cancelled)
+        metrics.collect('runner_disconnect_watched_total', 'Requests watched for client disconnects.',
+            'counter', lambda: self.disconnect_watcher.watched)
+        metrics.collect('runner_long_poll_waiters', 'Long-polls currently parked.',
+            'gauge', lambda: len(self.keepalive_scheduler.waiters))
+        metrics.collect('runner_offload_queued', 'Offloaded calls waiting for a thread or process.',
+            'gauge', lambda: self.offload_pool.queued)
+        metrics.collect('runner_offload_running', 'Offloaded calls running.',
+            'gauge', lambda: self.offload_pool.running)
+        metrics.collect('runner_supervised_crashes_total', 'Crashes of the supervised tasks.',
+            'counter', lambda: sum(health.crashes for health in self.supervisor.tasks.values()))
+        metrics.collect('runner_periodic_overruns_total', 'Periodic job calls that ended after their next deadline.',
+            'counter', lambda: sum(stats.overruns for stats in self.periodic.jobs.values()))
+        metrics.collect('runner_periodic_missed_total', 'Periodic job deadlines skipped or coalesced after an overrun.',
+            'counter', lambda: sum(stats.missed for stats in self.periodic.jobs.values()))
+        for name, stats in self.periodic.jobs.items():
+            metrics.job_jitter[name] = stats.jitter
+        metrics.collect('runner_response_cache_hits_total', 'Requests of @cached handlers answered from the cache.',
+            'counter', lambda: sum(cache.hits for cache in self.response_caches.values()))
+        metrics.collect('runner_response_cache_misses_total', 'Requests of @cached handlers that called the handler.',
+            'counter', lambda: sum(cache.misses for cache in self.response_caches.values()))
+        metrics.collect('runner_response_cache_not_modified_total', 'Requests of @cached handlers answered with 304.',
+            'counter', lambda: sum(cache.not_modified for cache in self.response_caches.values()))
+        metrics.collect('runner_recorder_records_total', 'Records of the Recorder attributes.',
+            'counter', lambda: sum(recorder.records for recorder in self._recorders()))
+        metrics.collect('runner_recorder_written_bytes_total', 'Bytes written to the segments of the Recorder attributes.',
+            'counter', lambda: sum(recorder.bytes_written for recorder in self._recorders()))
+        metrics.collect('runner_recorder_segment_bytes', 'Bytes in the segments of the Recorder attributes.',
+            'gauge', lambda: sum(segment.size for recorder in self._recorders() for segment in recorder.segments))
+        metrics.collect('runner_frames_published_total', 'Frames published in the shared memory frame_ring.',
+            'counter', self._frames_published)
+
+
+    def _frames_published(self) -> int:
+        return 0 if self.frame_ring is None or self.frame_ring.name is None else self.frame_ring.latest
+
+
+    def _recorders(self) -> list[Recorder]:
+        from .recorder import Recorder
+        return [value for value in vars(self).values() if isinstance(value, Recorder)]
+
+
+    @cached_property
+    def keepalive_scheduler(self) -> KeepaliveScheduler:
+        """Shared keepalive ticker for the long-polls of this runner, started by the lifespan function.
+        Pass it to LongPollingResponse(..., scheduler=self.keepalive_scheduler)."""
+        scheduler = KeepaliveScheduler()
+        if self.metrics is not None:
+            scheduler.wait_histogram = self.metrics.long_poll_wait
+        return scheduler
+
+
+    @cached_property
+    def stopping(self) -> anyio.Event:
+        """Set when the drain starts, run() should return after its current cycle."""
+        return anyio.Event()
+
+
+    async def drain(self) -> dict[str, Any]:
+        """Shut down gracefully within drain_timeout seconds:
+        refuse new long-polls of the keepalive_scheduler (503 with Retry-After), set stopping,
+        let the parked long-polls get their result until run() returns, then redirect the remaining ones with a retry hint.
+        If run() has not returned drain_redirect_time seconds before the deadline, they are redirected then.
+        Only the long-polls still connected at the deadline, despite the redirect, are dropped by the cancellation.
+        Called by the server of run_with_api before uvicorn waits for the open connections,
+        or by the lifespan on exit otherwise. Only the first call drains, it returns the drain_report.
+        """
+        if self.drain_report is not None:
+            return self.drain_report
+
+        start = anyio.current_time()
+        scheduler = self.keepalive_scheduler
+        scheduler.drain(self.drain_retry_after)
+        self.stopping.set()
+        logger.info(f'Draining for up to {self.drain_timeout}s, {len(scheduler.waiters)} long-polls parked')
+
+        deadline = start + self.drain_timeout
+        with anyio.CancelScope(deadline=deadline - self.drain_redirect_time):
+            if self._run_finished is not None:
+                await self._run_finished.wait()
+        scheduler.redirect()
+        with anyio.CancelScope(deadline=deadline):
+            await scheduler.wait_empty()
+
+        self.drain_report = {
+            'duration': anyio.current_time() - start,
+            'run_finished': self._run_finished is None or self._run_finished.is_set(),
+            'resolved': scheduler.resolved,
+            'redirected': scheduler.redirected,
+            'rejected': scheduler.rejected,
+            'dropped': len(scheduler.waiters),
+        }
+        logger.info(f'Drained: {self.drain_report}')
+        return self.drain_report
+
+
+    _run_finished: anyio.Event | None = None
+
+    async def _run(self) -> None:
+        self._run_finished = anyio.Event()
+        try:
+            await self.run()
+        finally:
+            self._run_finished.set()
+
+
+    @cached_property
+    def startup(self) -> Startup:
+        """Runs the @init_step methods of this runner: the steps after init() before serving, the warmups in the background.
+        Its report() is exposed by the /ready endpoint of the framework adapters."""
+        return Startup(self)
+
+
+    @primary
+    async def readiness(self) -> tuple[bool, dict[str, dict[str, Any]]]:
+        """Whether the runner is ready (init steps and warmups done, not draining) and the init steps report,
+        read from the primary process in multi-worker mode."""
+        ready = self.startup.ready and not self.stopping.is_set()
+        return ready, self.startup.report()
+
+
+    @cached_property
+    def supervisor(self) -> Supervisor:
+        """Restarts the @supervised methods of this runner, started by the lifespan function next to run().
+        Its health() is exposed by the /health/tasks endpoint of the framework adapters."""
+        return Supervisor(self)
+
+
+    @primary
+    async def task_health(self) -> dict[str, dict[str, Any]]:
+        """Health of the supervised tasks by name, read from the primary process in multi-worker mode."""
+        return self.supervisor.health()
+
+
+    @cached_property
+    def periodic(self) -> Periodic:
+        """Calls the @periodic methods of this runner at their rates, started by the lifespan function next to run()."""
+        return Periodic(self)
+
+
+    @primary
+    async def job_stats(self) -> dict[str, dict[str, Any]]:
+        """Period, calls, overruns, missed deadlines and jitter of the periodic jobs by name,
+        read from the primary process in multi-worker mode."""
+        return self.periodic.report()
+
+
+    @primary
+    async def set_job_period(self, name: str, period: float) -> None:
+        """Change the period of a periodic job without restarting it, e.g. from an API handler."""
+        self.periodic.set_period(name, period)
+
+
+    @primary
+    async def frame_ring_info(self) -> dict[str, Any] | None:
+        """Metadata of the frame_ring for the local readers, read from the primary process in multi-worker mode."""
+        return None if self.frame_ring is None else self.frame_ring.info()
+
+
+    @cached_property
+    def response_caches(self) -> dict[str, ResponseCache]:
+        """Caches of the @cached handlers, created when the framework adapter binds the handlers.
+        Keyed by handler name, prefixed by the path prefix with Litestar, and by 'path:name' of the route with FastAPI."""
+        return {}
+
+
+    @cached_property
+    def disconnect_watcher(self) -> DisconnectWatcher:
+        """Shared client disconnect detection for the requests of this runner, started by the lifespan function.
+        Pass it to cancel_on_disconnect(request, watcher=self.disconnect_watcher)."""
+        return DisconnectWatcher()
+
+
+    @cached_property
+    def offload_pool(self) -> OffloadPool:
+        """Bounded threads and processes for the blocking or CPU-bound stages of run(). Override to change the limits."""
+        from .offload import OffloadPool
+        return OffloadPool()
+
+
+    async def offload(self, fn: Callable[..., T], *args: Any, process=False) -> T:
+        """Run fn(*args) on the offload_pool, in a thread by default or in a process if {process}.
+        Equivalent to `await self.offload_pool.run_sync(fn, *args, process=process)`.
+        Methods decorated with runner_with_api.offload.offloaded are offloaded to threads when called."""
+        return await self.offload_pool.run_sync(fn, *args, process=process)
+
+
     @property
     def lifespan(self):
         """Lifespan context manager for the ASGIApplication (FastAPI, Litestar, Starlette, etc.).
-        It uses a closure to capture self for calling the user methods: init() and run().
+        It uses a closure to capture self for calling the user methods: init(), run(), the @init_step, @supervised and @periodic methods.
+        It also commits the coalesced writes of the VersionedState attributes of the runner, flushes its Recorder attributes,
+        and restores the checkpoint before init() then saves it periodically and on exit.
+        The shared memory of the frame_ring is created before init() and removed on exit.
         The user methods are canceled when the ASGI app is shutting down.
         The shutdown is also triggered if an exception is raised by the user methods.
+        In a worker process of the multi-worker mode, the user methods are not called,
+        the runner connects to the primary process instead (see run_with_api).
         """
+        from .recorder import Recorder
+
         @asynccontextmanager
         async def _lifespan(app: ASGIApplication):
             try:
-                await self.init()
+                ipc_path = os.environ.get(IPC_PATH_ENV)
+                if not ipc_path:
+                    if self.frame_ring is not None:
+                        if 'frame_ring' not in vars(self):
+                            self.frame_ring = self.frame_ring.copy()
+                        self.frame_ring.open()
+                    if self.checkpoint is not None:
+                        self.restored = await self.checkpoint.restore(self)
+                    await self.init()
+                    await self.startup.run(warmup=False)
 
                 async with create_task_group() as tg:
-                    tg.start_soon(self.run)
+                    tg.start_soon(self.keepalive_scheduler.run)
+                    tg.start_soon(self.disconnect_watcher.run)
+                    if self.metrics is not None:
+                        self._collect_metrics(self.metrics)
+                        tg.start_soon(self.metrics.sample_loop_lag)
+                    if ipc_path:
+                        from .workers import IPCClient
+                        self._ipc_client = IPCClient(ipc_path)
+                        await tg.start(self._ipc_client.run)
+                    else:
+                        tg.start_soon(self.startup.run, True)
+                        for value in vars(self).values():
+                            if isinstance(value, (VersionedState, Recorder)):
+                                tg.start_soon(value.run)
+                        tg.start_soon(self.supervisor.run)
+                        tg.start_soon(self.periodic.run)
+                        if self.checkpoint is not None:
+                            tg.start_soon(self.checkpoint.run, self)
+                        tg.start_soon(self._run)
                     yield
+                    if self.drain_timeout:
+                        await self.drain()
+                    if self.checkpoint is not None and not ipc_path:
+                        await self.checkpoint.save_runner(self)
                     logger.info('Canceling tasks')
                     tg.cancel_scope.cancel()
             except:
                 logger.exception('Unexpected error, will request shutdown!')
                 self._shutdown()
+            finally:
+                if self.frame_ring is not None and not ipc_path:
+                    self.frame_ring.close()
 
         return _lifespan
 
 
-    def run_with_api(self, app: ASGIApplication | Any, **uvicorn_kwargs):
+    def run_with_api(self, app: ASGIApplication | Any, workers: int | None = None, **uvicorn_kwargs):
         """Run the API server while the runner lifespan is managed.
         Unix signal handlers are installed by uvicorn for graceful shutdown.
         Can pass uvicorn kwargs such as host, port, log_config.
         Equivalent to uvicorn.run(app, **uvicorn_kwargs)
+
+        With {workers} > 1 (app must be an import string like "example:api"), init() and run() stay in this process
+        while the HTTP requests are served by uvicorn worker processes.
+        The handlers run in the workers and reach the runner through its @primary methods (see runner_with_api.workers).
         """
-        uvicorn.run(app, **uvicorn_kwargs)
+        import uvicorn  # imported on demand, it is not needed to import the runner or to serve it otherwise
+
+        if not workers or workers <= 1:
+            if self.drain_timeout and not uvicorn_kwargs.get('reload'):
+                from .server import DrainingServer
+                DrainingServer(self, uvicorn.Config(app, **uvicorn_kwargs)).run()
+            else:
+                uvicorn.run(app, **uvicorn_kwargs)
+            return
+
+        from .workers import serve_workers
+        ipc_path = os.path.join(tempfile.mkdtemp(prefix='runner-with-api-'), 'ipc.sock')
+        with from_thread.start_blocking_portal() as portal:
+            with portal.wrap_async_context_manager(serve_workers(self, ipc_path)):
+                os.environ[IPC_PATH_ENV] = ipc_path  # inherited by the spawned workers
+                try:
+                    uvicorn.run(app, workers=workers, **uvicorn_kwargs)
+                finally:
+                    del os.environ[IPC_PATH_ENV]
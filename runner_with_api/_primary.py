@@ -0,0 +1,27 @@
+"""The @primary decorator of the multi-worker mode (see runner_with_api.workers), kept apart from the IPC
+so that the runner classes can use it without importing the IPC modules."""
+from __future__ import annotations
+import functools
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, TypeVar
+if TYPE_CHECKING:
+    from .workers import IPCClient
+
+
+
+IPC_PATH_ENV = 'RUNNER_WITH_API_IPC'
+
+F = TypeVar('F', bound=Callable[..., Awaitable[Any]])
+
+
+def primary(method: F) -> F:
+    """Decorator for async runner methods that must run in the primary process.
+    In a worker process the call is forwarded to the primary, otherwise the method is called directly."""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        client: IPCClient | None = getattr(self, '_ipc_client', None)
+        if client is None:
+            return await method(self, *args, **kwargs)
+        return await client.call(method.__name__, args, kwargs)
+
+    wrapper._primary = True  # type: ignore[attr-defined]
+    return wrapper  # type: ignore[return-value]
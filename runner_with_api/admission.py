@@ -0,0 +1,191 @@
+"""
+Admission control: ASGI middleware bounding the HTTP requests handled concurrently in the event loop of run(),
+so that a traffic spike queues or gets rejected instead of starving the processing loop.
+"""
+from __future__ import annotations
+import json
+import math
+from collections import deque
+from typing import Callable, Deque, Iterable, Mapping
+
+import anyio
+
+
+
+def _under(path: str, prefix: str) -> bool:
+    """Whether {path} is {prefix} or below it, '/bulk' covers '/bulk/a' but not '/bulkhead'."""
+    return path == prefix or path.startswith(prefix.rstrip('/') + '/')
+
+
+class _Route:
+    __slots__ = ('prefix', 'limit', 'in_flight')
+
+    def __init__(self, prefix: str, limit: int) -> None:
+        self.prefix = prefix
+        self.limit = limit
+        self.in_flight = 0
+
+
+class _Waiter:
+    __slots__ = ('route', 'event', 'admitted')
+
+    def __init__(self, route: _Route | None) -> None:
+        self.route = route
+        self.event = anyio.Event()
+        self.admitted = False
+
+
+class AdmissionControl:
+    """
+    Admission of at most {limit} concurrent HTTP requests, and at most route_limits[prefix] for the paths under a prefix.
+    Requests over the limits wait in a FIFO queue of {queue_size} for up to {max_wait} seconds,
+    then (or right away if the queue is full) they are rejected with 503 and a Retry-After of {retry_after} seconds.
+    Paths under the {priority} prefixes (e.g. control endpoints) are always admitted, without counting nor queueing.
+    With {loop_lag} (e.g. `lambda: runner.metrics.last_loop_lag`), the global limit adapts every {adapt_interval} seconds:
+    it shrinks by a quarter while the lag is over {target_lag} seconds and grows back by one otherwise.
+
+    The middleware() factory wraps an ASGI app, all the wrapped apps share the limits of this instance
+    (Litestar builds the middleware stack of each route separately):
+    FastAPI: `api.add_middleware(admission.middleware)`, Litestar: `Litestar(..., middleware=[admission.middleware])`.
+    """
+    def __init__(self, limit=100, route_limits: Mapping[str, int] | None = None,
+        priority: Iterable[str] = (),
+        queue_size=100,
+        max_wait=5.,
+        retry_after=1.,
+        loop_lag: Callable[[], float] | None = None,
+        target_lag=0.05,
+        min_limit=1,
+        adapt_interval=0.5
+    ) -> None:
+        self.max_limit = limit
+        self.limit = limit
+        self.routes = sorted((_Route(prefix, n) for prefix, n in (route_limits or {}).items()),
+            key=lambda route: len(route.prefix), reverse=True)  # longest prefix first
+        self.priority = tuple(priority)
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self.loop_lag = loop_lag
+        self.target_lag = target_lag
+        self.min_limit = min_limit
+        self.adapt_interval = adapt_interval
+        self.last_adapt = 0.
+        self.in_flight = 0
+        self.waiters: Deque[_Waiter] = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.prioritized = 0
+
+
+    def middleware(self, app: Callable) -> Callable:
+        """ASGI middleware admitting the HTTP requests to {app}."""
+        async def admission_control(scope: dict, receive: Callable, send: Callable) -> None:
+            if scope['type'] != 'http':
+                return await app(scope, receive, send)
+            await self.admit(app, scope, receive, send)
+
+        return admission_control
+
+
+    async def admit(self, app: Callable, scope: dict, receive: Callable, send: Callable) -> None:
+        path: str = scope['path']
+        if any(_under(path, prefix) for prefix in self.priority):
+            self.prioritized += 1
+            return await app(scope, receive, send)
+
+        route = next((route for route in self.routes if _under(path, route.prefix)), None)
+        self._adapt()
+        if not self._try_admit(route):
+            if len(self.waiters) >= self.queue_size:
+                return await self._reject(send)
+
+            waiter = _Waiter(route)
+            self.waiters.append(waiter)
+            self.queued += 1
+            try:
+                with anyio.move_on_after(self.max_wait):
+                    await waiter.event.wait()
+            except BaseException:
+                self._abandon(waiter)
+                raise
+
+            if not waiter.admitted:
+                self._abandon(waiter)
+                return await self._reject(send)
+
+        try:
+            await app(scope, receive, send)
+        finally:
+            self._release(route)
+
+
+    def _try_admit(self, route: _Route | None) -> bool:
+        if self.in_flight >= self.limit or (route is not None and route.in_flight >= route.limit):
+            return False
+
+        self.in_flight += 1
+        if route is not None:
+            route.in_flight += 1
+        self.admitted += 1
+        return True
+
+
+    def _release(self, route: _Route | None) -> None:
+        self.in_flight -= 1
+        if route is not None:
+            route.in_flight -= 1
+        self._admit_waiters()
+
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        if waiter.admitted:
+            self._release(waiter.route)
+        else:
+            self.waiters.remove(waiter)
+
+
+    def _admit_waiters(self) -> None:
+        """Admit the waiters in FIFO order, skipping those whose route is still at its limit."""
+        if not self.waiters or self.in_flight >= self.limit:
+            return
+
+        for waiter in list(self.waiters):
+            if self._try_admit(waiter.route):
+                self.waiters.remove(waiter)
+                waiter.admitted = True
+                waiter.event.set()
+                if self.in_flight >= self.limit:
+                    return
+
+
+    def _adapt(self) -> None:
+        if self.loop_lag is None:
+            return
+
+        now = anyio.current_time()
+        if now - self.last_adapt < self.adapt_interval:
+            return
+
+        self.last_adapt = now
+        if self.loop_lag() > self.target_lag:
+            self.limit = max(self.min_limit, math.floor(self.limit * 0.75))
+        elif self.limit < self.max_limit:
+            self.limit += 1
+            self._admit_waiters()
+
+
+    async def _reject(self, send: Callable) -> None:
+        self.rejected += 1
+        body = json.dumps({'detail': 'Server overloaded', 'retry_after': self.retry_after}).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': 503,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'retry-after', str(math.ceil(self.retry_after)).encode()),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
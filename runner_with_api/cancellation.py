@@ -0,0 +1,148 @@
+from __future__ import annotations
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, MutableMapping
+
+import anyio
+import anyio.abc
+
+
+
+logger = logging.getLogger(__name__)
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+
+
+class _Watch:
+    """Single reader of the ASGI receive channel of a request, shared by the handler and the disconnect detection.
+    Messages read for the detection (e.g. body chunks still streaming) are kept for the handler."""
+    __slots__ = ('original', 'pending', 'reading', 'arrived', 'scope', 'on_disconnect', 'disconnected', 'waiter')
+
+    def __init__(self, receive: Receive, scope: anyio.CancelScope, on_disconnect: Callable[[], None]) -> None:
+        self.original = receive
+        self.pending: Deque[Message] = deque()
+        self.reading = False
+        self.arrived = anyio.Event()
+        self.scope = scope
+        self.on_disconnect = on_disconnect
+        self.disconnected = False
+        self.waiter = anyio.CancelScope()  # of wait_disconnect(), cancelled once the request is no longer watched
+
+
+    async def _read(self) -> None:
+        self.reading = True
+        try:
+            message = await self.original()
+        finally:
+            self.reading = False
+
+        self.pending.append(message)
+        self.arrived.set()
+        self.arrived = anyio.Event()
+
+        if message['type'] == 'http.disconnect' and not self.disconnected:
+            self.disconnected = True
+            self.on_disconnect()
+            self.scope.cancel()
+
+
+    async def wait_disconnect(self) -> None:
+        """Take the messages as the server delivers them, when the handler is not reading,
+        and cancel the handler as soon as the disconnect is delivered."""
+        with self.waiter:
+            while not self.disconnected:
+                if self.reading:
+                    await self.arrived.wait()
+                else:
+                    await self._read()
+
+
+    async def receive(self) -> Message:
+        """Replacement of the request's receive for the handler."""
+        while not self.pending:
+            if self.reading:
+                await self.arrived.wait()
+            else:
+                await self._read()
+
+        return self.pending.popleft()
+
+
+class DisconnectWatcher:
+    """
+    Detect the client disconnects of all watched requests from the task group of run(), instead of a task group per request.
+    Each watched request waits for its next ASGI message there, so the disconnect cancels the handler as soon as
+    the server delivers it, and an idle request costs nothing but its parked receive.
+    The run() method must be running, ASGIRunner.lifespan starts it for ASGIRunner.disconnect_watcher.
+    Otherwise the requests are watched from a task group of their own, and still counted.
+    """
+    def __init__(self) -> None:
+        self.watches: set[_Watch] = set()
+        self.watched = 0  # requests watched in total
+        self.cancelled = 0  # in-flight handlers cancelled because the client went away
+        self._task_group: anyio.abc.TaskGroup | None = None
+
+
+    async def run(self) -> None:
+        """Host the waits of the watched requests until cancelled."""
+        async with anyio.create_task_group() as tg:
+            self._task_group = tg
+            try:
+                await anyio.sleep_forever()
+            finally:
+                self._task_group = None
+
+
+    def add(self, watch: _Watch) -> bool:
+        """Watch a request, return whether its wait was started in the task group of run()."""
+        self.watched += 1
+        self.watches.add(watch)
+        if self._task_group is None:
+            return False
+        self._task_group.start_soon(watch.wait_disconnect)
+        return True
+
+
+    def discard(self, watch: _Watch) -> None:
+        self.watches.discard(watch)
+        watch.waiter.cancel()
+
+
+standalone = DisconnectWatcher()
+"""Counts the requests watched by cancel_on_disconnect() without a watcher. It is not run."""
+
+
+@asynccontextmanager
+async def cancel_on_disconnect(receive: Receive, on_disconnect: Callable[[], None] | None = None,
+    watcher: DisconnectWatcher | None = None
+) -> AsyncIterator[Receive]:
+    """
+    Async context manager for async code that needs to be cancelled if the client disconnects prematurely.
+    Yields the receive function that the request must use instead of the original one while inside the context,
+    so that the messages read while waiting for the disconnect (e.g. body chunks) are not lost.
+    With a running {watcher} no task group is created for the request, otherwise the disconnect is awaited
+    by a task of this request, counted by {watcher} or by the module's standalone watcher.
+    """
+    if watcher is None:
+        watcher = standalone
+
+    def disconnected() -> None:
+        watcher.cancelled += 1
+        if on_disconnect is not None:
+            on_disconnect()
+
+    with anyio.CancelScope() as scope:
+        watch = _Watch(receive, scope, disconnected)
+        try:
+            if watcher.add(watch):
+                yield watch.receive
+            else:
+                async with anyio.create_task_group() as tg:
+                    tg.start_soon(watch.wait_disconnect)
+                    try:
+                        yield watch.receive
+                    finally:
+                        tg.cancel_scope.cancel()
+        finally:
+            watcher.discard(watch)
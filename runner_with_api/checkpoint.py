@@ -0,0 +1,241 @@
+"""
+Checkpoint/restore of the warm state of a runner (calibration tables, caches, model weights...),
+so that a restarted process restores it instead of recomputing it in init().
+
+A checkpoint is a directory holding a manifest.json, the pickled values (state.pickle)
+and their large buffers (buffers.bin), which are memory-mapped on restore:
+NumPy arrays are restored without copy, array.array with a single copy.
+Other values, bytes included, are in the pickle (the pickler always writes bytes and bytearray in-band).
+"""
+from __future__ import annotations
+import array
+import io
+import json
+import logging
+import mmap
+import os
+import pickle
+import shutil
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Iterable, Mapping
+
+import anyio
+
+
+
+logger = logging.getLogger(__name__)
+MANIFEST = 'manifest.json'
+STATE = 'state.pickle'
+BUFFERS = 'buffers.bin'
+_ALIGNMENT = 64
+
+
+class CheckpointError(Exception):
+    """The checkpoint cannot be restored: incomplete, corrupted or of an unknown schema."""
+
+
+def _rebuild_array(typecode: str, buffer: memoryview) -> array.array:
+    data = array.array(typecode)
+    data.frombytes(buffer)
+    return data
+
+
+class _Pickler(pickle.Pickler):
+    """Pickler sending the buffers of the large array.array out-of-band, like NumPy does by itself."""
+
+    def __init__(self, file: io.BytesIO, buffer_callback: Callable[[pickle.PickleBuffer], Any], threshold: int) -> None:
+        super().__init__(file, protocol=5, buffer_callback=buffer_callback)
+        self.threshold = threshold
+
+
+    def reducer_override(self, obj: Any) -> Any:
+        if type(obj) is array.array and obj.itemsize * len(obj) >= self.threshold:
+            return _rebuild_array, (obj.typecode, pickle.PickleBuffer(memoryview(obj).cast('B')))
+        return NotImplemented
+
+
+def _write(path: Path, *chunks: Any) -> None:
+    with open(path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _fsync_directory(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Checkpoint:
+    """
+    Durable {attributes} of a runner, saved every {interval} seconds and on shutdown under {directory},
+    and restored by the lifespan before init(), which then finds runner.restored set and can skip their computation.
+    Set it on the runner class like metrics: `checkpoint = Checkpoint('/var/lib/camera', ['calibration', 'weights'])`.
+
+    Each save writes a new checkpoint directory next to a temporary name and renames it once complete,
+    the last {keep} are kept and the newest one that loads is restored.
+    Values are captured by reference and written in a thread: replace the durable attributes, do not mutate them in place.
+    Checkpoints record the {schema} version of the values, {migrations}[n] upgrades the values of schema n to n + 1.
+    Arrays of at least {threshold} bytes are stored aside and memory-mapped on restore.
+    """
+    def __init__(self, directory: str | os.PathLike, attributes: Iterable[str],
+        interval=60.,
+        schema=1,
+        migrations: Mapping[int, Callable[[dict[str, Any]], dict[str, Any]]] | None = None,
+        keep=2,
+        threshold=64 * 1024
+    ) -> None:
+        self.directory = Path(directory)
+        self.attributes = tuple(attributes)
+        self.interval = interval
+        self.schema = schema
+        self.migrations = dict(migrations or {})
+        self.keep = keep
+        self.threshold = threshold
+        self.saves = 0
+        self.last_save: dict[str, Any] | None = None
+        self.last_restore: dict[str, Any] | None = None
+        self._saving = threading.Lock()  # a save numbers its checkpoint after the previous one
+        self._runner_saves: anyio.Lock | None = None
+
+
+    def checkpoints(self) -> list[Path]:
+        """Complete checkpoints, newest first."""
+        if not self.directory.is_dir():
+            return []
+        return sorted((path for path in self.directory.iterdir() if path.name.isdigit()), key=lambda path: int(path.name), reverse=True)
+
+
+    def save(self, values: Mapping[str, Any]) -> Path:
+        """Write {values} as a new checkpoint (blocking) and return its path. Concurrent saves are serialized."""
+        with self._saving:
+            return self._save(values)
+
+
+    def _save(self, values: Mapping[str, Any]) -> Path:
+        start = time.perf_counter()
+        buffers: list[pickle.PickleBuffer] = []
+        state = io.BytesIO()
+        _Pickler(state, buffers.append, self.threshold).dump(dict(values))
+
+        layout = []
+        end = 0
+        for buffer in buffers:
+            end += -end % _ALIGNMENT
+            size = buffer.raw().nbytes
+            layout.append((end, size))
+            end += size
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        checkpoints = self.checkpoints()
+        number = int(checkpoints[0].name) + 1 if checkpoints else 1
+        path = self.directory / f'{number:08d}'
+        tmp = self.directory / f'.tmp-{number:08d}'
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+
+        state_bytes = state.getbuffer()
+        with open(tmp / BUFFERS, 'wb') as f:
+            for (offset, _), buffer in zip(layout, buffers):
+                f.seek(offset)
+                f.write(buffer.raw())
+            f.flush()
+            os.fsync(f.fileno())
+        _write(tmp / STATE, state_bytes)
+        manifest = {
+            'schema': self.schema,
+            'time': time.time(),
+            'attributes': sorted(values),
+            'state_crc32': zlib.crc32(state_bytes),
+            'buffers': layout,
+        }
+        _write(tmp / MANIFEST, json.dumps(manifest).encode())
+        os.rename(tmp, path)
+        _fsync_directory(self.directory)
+
+        for old in checkpoints[self.keep - 1:]:
+            shutil.rmtree(old, ignore_errors=True)
+
+        self.saves += 1
+        self.last_save = {'path': str(path), 'duration': time.perf_counter() - start, 'bytes': len(state_bytes) + end}
+        return path
+
+
+    def load(self, path: Path) -> dict[str, Any]:
+        """Values of the checkpoint at {path}, migrated to the current schema. Raise CheckpointError if it cannot be restored."""
+        try:
+            manifest = json.loads((path / MANIFEST).read_bytes())
+            state = (path / STATE).read_bytes()
+            if zlib.crc32(state) != manifest['state_crc32']:
+                raise CheckpointError(f'Corrupted checkpoint {path}')
+
+            end = sum(manifest['buffers'][-1]) if manifest['buffers'] else 0
+            if end:
+                with open(path / BUFFERS, 'rb') as f:
+                    mapped = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY))  # writable, private pages
+                if len(mapped) < end:
+                    raise CheckpointError(f'Truncated checkpoint {path}')
+            else:
+                mapped = memoryview(b'')
+            views = [mapped[offset:offset + size] for offset, size in manifest['buffers']]
+            values = pickle.loads(state, buffers=views)
+        except CheckpointError:
+            raise
+        except Exception as e:
+            raise CheckpointError(f'Cannot load checkpoint {path}: {e!r}') from e
+
+        schema = manifest['schema']
+        if schema > self.schema:
+            raise CheckpointError(f'Checkpoint {path} has schema {schema}, newer than {self.schema}')
+        while schema < self.schema:
+            if schema not in self.migrations:
+                raise CheckpointError(f'No migration from schema {schema} for checkpoint {path}')
+            values = self.migrations[schema](values)
+            schema += 1
+        return values
+
+
+    def values(self, runner: Any) -> dict[str, Any]:
+        return {name: getattr(runner, name) for name in self.attributes if hasattr(runner, name)}
+
+
+    async def save_runner(self, runner: Any) -> Path:
+        """Save the durable attributes of {runner}, in a thread.
+        Saves wait for the one in progress, and then capture the values, so the last save holds the newest values."""
+        if self._runner_saves is None:
+            self._runner_saves = anyio.Lock()
+        async with self._runner_saves:
+            return await anyio.to_thread.run_sync(self.save, self.values(runner))
+
+
+    async def restore(self, runner: Any) -> bool:
+        """Set the durable attributes of {runner} from the newest checkpoint that loads, return whether one did."""
+        start = time.perf_counter()
+        for path in await anyio.to_thread.run_sync(self.checkpoints):
+            try:
+                values = await anyio.to_thread.run_sync(self.load, path)
+            except CheckpointError as e:
+                logger.warning(f'{e}, trying the previous checkpoint')
+                continue
+
+            for name, value in values.items():
+                if name in self.attributes:
+                    setattr(runner, name, value)
+            self.last_restore = {'path': str(path), 'duration': time.perf_counter() - start, 'attributes': sorted(values)}
+            logger.info(f'Restored {", ".join(sorted(values))} from {path} in {self.last_restore["duration"]:.3f}s')
+            return True
+        return False
+
+
+    async def run(self, runner: Any) -> None:
+        """Save the runner every interval seconds. Started by the runner lifespan."""
+        while True:
+            await anyio.sleep(self.interval)
+            await self.save_runner(runner)
@@ -0,0 +1,302 @@
+"""
+Response compression: ASGI middleware compressing the responses chunk by chunk,
+so that the keepalives of the long-polls and the events of the streams still reach the clients right away.
+gzip is always available, zstd and br (brotli) when the zstandard or brotli packages are installed.
+"""
+from __future__ import annotations
+import struct
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, Mapping
+
+from .encoding import _preferences
+
+
+
+_GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+
+
+class _Gzip:
+    """gzip stream written as raw deflate segments, so that a segment compressed once can be spliced into many streams."""
+    name = 'gzip'
+    max_level = 9
+
+    def __init__(self, level: int) -> None:
+        self.level = level
+        self.deflate = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self.crc = 0
+        self.size = 0
+        self.header = _GZIP_HEADER
+
+
+    def _start(self, data: bytes) -> bytes:
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        header, self.header = self.header, b''
+        return header
+
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress and flush {data}."""
+        header = self._start(data)
+        return header + self.deflate.compress(data) + self.deflate.flush(zlib.Z_SYNC_FLUSH)
+
+
+    def splice(self, data: bytes, segment: bytes) -> bytes:
+        """The compressed stream of {data} from its precompressed {segment}."""
+        header = self._start(data)
+        self.deflate = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS)  # no back reference across the segment
+        return header + segment
+
+
+    def finish(self) -> bytes:
+        return self.header + self.deflate.flush() + struct.pack('<II', self.crc, self.size & 0xffffffff)
+
+
+    @staticmethod
+    def segment(data: bytes, level: int) -> bytes:
+        """Deflate segment of {data}, independent of what precedes it and ending on a byte boundary."""
+        deflate = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        return deflate.compress(data) + deflate.flush(zlib.Z_SYNC_FLUSH)
+
+
+class _Zstd:
+    """zstd stream, precompressed payloads are spliced as frames of their own."""
+    name = 'zstd'
+    max_level = 22
+
+    def __init__(self, level: int) -> None:
+        import zstandard
+        self.zstandard = zstandard
+        self.level = level
+        self.frame = zstandard.ZstdCompressor(level=level).compressobj()
+
+
+    def compress(self, data: bytes) -> bytes:
+        return self.frame.compress(data) + self.frame.flush(self.zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+
+    def splice(self, data: bytes, segment: bytes) -> bytes:
+        end = self.frame.flush()
+        self.frame = self.zstandard.ZstdCompressor(level=self.level).compressobj()
+        return end + segment
+
+
+    def finish(self) -> bytes:
+        return self.frame.flush()
+
+
+    @staticmethod
+    def segment(data: bytes, level: int) -> bytes:
+        import zstandard
+        return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+class _Brotli:
+    """brotli stream, which cannot be spliced: only whole responses are cached."""
+    name = 'br'
+    max_level = 11
+    segment = None
+
+    def __init__(self, level: int) -> None:
+        import brotli
+        self.compressor = brotli.Compressor(quality=level)
+
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data) + self.compressor.flush()
+
+
+    def finish(self) -> bytes:
+        return self.compressor.finish()
+
+
+def _available(name: str) -> bool:
+    try:
+        __import__({'gzip': 'zlib', 'zstd': 'zstandard', 'br': 'brotli'}[name])
+        return True
+    except ImportError:
+        return False
+
+
+_CODECS = {codec.name: codec for codec in (_Gzip, _Zstd, _Brotli)}
+
+
+class Compression:
+    """
+    Compression of the HTTP responses in the first of {encodings} that the client accepts (Accept-Encoding),
+    with the encodings whose package is installed. Each body chunk is compressed and flushed on its own,
+    so the streamed responses stay streamed. Responses already encoded, of other types than {content_types}
+    or of a single chunk under {minimum_size} bytes are sent as they are.
+    The compression {level} applies to every encoding (capped to its maximum),
+    route_levels[prefix] overrides it for the paths under a prefix, 0 disables the compression.
+
+    Serialized payloads with a key (e.g. shared by a ResultSlot) are compressed once per key, encoding and level,
+    and the last {cache_size} of them are kept.
+    The middleware() factory wraps an ASGI app, the wrapped apps share the cache and the counters of this instance:
+    FastAPI: `api.add_middleware(compression.middleware)`, Litestar: `Litestar(..., middleware=[compression.middleware])`.
+    """
+    def __init__(self, encodings: Iterable[str] = ('zstd', 'br', 'gzip'),
+        level=6,
+        route_levels: Mapping[str, int] | None = None,
+        minimum_size=512,
+        content_types: Iterable[str] = ('text/', 'application/json', 'application/msgpack', 'application/xml', 'image/svg+xml'),
+        cache_size=64
+    ) -> None:
+        self.encodings = tuple(name for name in encodings if name in _CODECS and _available(name))
+        self.level = level
+        self.route_levels = sorted((route_levels or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.minimum_size = minimum_size
+        self.content_types = tuple(content_types)
+        self.cache_size = cache_size
+        self.cache: OrderedDict[tuple[Hashable, str, int, bool], bytes] = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_time = 0.
+
+
+    def collect(self, metrics: Any) -> None:
+        """Expose the counters in the Metrics of a runner."""
+        metrics.collect('runner_compression_cpu_seconds_total', 'CPU time spent compressing responses.',
+            'counter', lambda: self.cpu_time)
+        metrics.collect('runner_compression_bytes_in_total', 'Bytes of responses before compression.',
+            'counter', lambda: self.bytes_in)
+        metrics.collect('runner_compression_bytes_out_total', 'Bytes of responses after compression.',
+            'counter', lambda: self.bytes_out)
+        metrics.collect('runner_compression_cache_hits_total', 'Shared payloads served already compressed.',
+            'counter', lambda: self.cache_hits)
+
+
+    def middleware(self, app: Callable) -> Callable:
+        """ASGI middleware compressing the responses of {app}."""
+        async def compression(scope: dict, receive: Callable, send: Callable) -> None:
+            if scope['type'] != 'http':
+                return await app(scope, receive, send)
+
+            encoding = self.encoding(scope)
+            level = self.route_level(scope['path'])
+            if encoding is None or not level:
+                return await app(scope, receive, send)
+            await app(scope, receive, _CompressingSend(self, send, encoding, level).send)
+
+        return compression
+
+
+    def encoding(self, scope: dict) -> str | None:
+        accept = next((value for name, value in scope['headers'] if name == b'accept-encoding'), b'').decode('latin-1')
+        accepted = set(_preferences(accept))  # browsers accept several encodings equally, prefer ours
+        return next((name for name in self.encodings if name in accepted or '*' in accepted), None)
+
+
+    def route_level(self, path: str) -> int:
+        return next((level for prefix, level in self.route_levels if path.startswith(prefix)), self.level)
+
+
+    def compressible(self, headers: list[tuple[bytes, bytes]]) -> bool:
+        content_type = b''
+        for name, value in headers:
+            if name == b'content-encoding':
+                return False
+            if name == b'content-type':
+                content_type = value
+        return content_type.decode('latin-1').startswith(self.content_types)
+
+
+    def cached(self, cache_key: tuple[Hashable, str, int, bool], compress: Callable[[], bytes]) -> bytes:
+        """{cache_key} is (payload key, encoding, level, whole response or spliced segment)."""
+        compressed = self.cache.get(cache_key)
+        if compressed is not None:
+            self.cache.move_to_end(cache_key)
+            self.cache_hits += 1
+            return compressed
+
+        self.cache_misses += 1
+        compressed = self.cache[cache_key] = compress()
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return compressed
+
+
+class _CompressingSend:
+    __slots__ = ('compression', 'send_', 'encoding', 'level', 'start', 'codec')
+
+    def __init__(self, compression: Compression, send: Callable, encoding: str, level: int) -> None:
+        self.compression = compression
+        self.send_ = send
+        self.encoding = encoding
+        self.level = min(level, _CODECS[encoding].max_level)
+        self.start: dict | None = None
+        self.codec: Any = None
+
+
+    async def send(self, message: dict) -> None:
+        if message['type'] == 'http.response.start':
+            if self.compression.compressible(message.get('headers', [])):
+                self.start = message  # sent with the first body chunk, once the response is known to be streamed or not
+                return
+        elif message['type'] == 'http.response.body' and (self.start is not None or self.codec is not None):
+            return await self.send_body(message)
+        await self.send_(message)
+
+
+    async def send_body(self, message: dict) -> None:
+        body: bytes = message.get('body', b'')
+        more_body: bool = message.get('more_body', False)
+        compression = self.compression
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            if not more_body and len(body) < compression.minimum_size:
+                await self.send_(start)
+                return await self.send_(message)
+
+            headers = [(name, value) for name, value in start.get('headers', []) if name != b'content-length']
+            headers.append((b'content-encoding', self.encoding.encode()))
+            headers.append((b'vary', b'accept-encoding'))
+            if not more_body:
+                compressed = self.compress_all(body)
+                headers.append((b'content-length', str(len(compressed)).encode()))
+                await self.send_({**start, 'headers': headers})
+                return await self.send_({**message, 'body': compressed})
+
+            await self.send_({**start, 'headers': headers})
+            self.codec = _CODECS[self.encoding](self.level)
+
+        if not body and more_body:
+            return
+        cpu = time.thread_time()
+        key = getattr(body, 'key', None)
+        segment = self.codec.segment
+        if key is not None and segment is not None:
+            compressed = self.codec.splice(body, compression.cached((key, self.encoding, self.level, False),
+                lambda: segment(body, self.level)))
+        elif body:
+            compressed = self.codec.compress(body)
+        else:
+            compressed = b''
+        if not more_body:
+            compressed += self.codec.finish()
+        compression.cpu_time += time.thread_time() - cpu
+        compression.bytes_in += len(body)
+        compression.bytes_out += len(compressed)
+        await self.send_({**message, 'body': compressed})
+
+
+    def compress_all(self, body: bytes) -> bytes:
+        compression = self.compression
+
+        def compress() -> bytes:
+            cpu = time.thread_time()
+            codec = _CODECS[self.encoding](self.level)
+            compressed = codec.compress(body) + codec.finish()
+            compression.cpu_time += time.thread_time() - cpu
+            return compressed
+
+        key = getattr(body, 'key', None)
+        compressed = compress() if key is None else compression.cached((key, self.encoding, self.level, True), compress)
+        compression.bytes_in += len(body)
+        compression.bytes_out += len(compressed)
+        return compressed
@@ -0,0 +1,117 @@
+"""
+Content negotiation for the long-poll and streaming responses: JSON, msgpack or raw little-endian arrays,
+chosen from the Accept header of the request.
+
+JSON payloads are sent as they are, after the newline keepalives.
+Binary payloads are framed with their length (4 bytes, little-endian) and the keepalives are empty frames,
+so a client reads frames until a non-empty one (long-poll) or for as long as the stream lasts.
+"""
+from __future__ import annotations
+import array
+import struct
+import sys
+from functools import lru_cache
+from typing import Any, Callable, Iterable
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+ARRAY = 'application/octet-stream'
+_aliases = {'application/x-msgpack': MSGPACK, 'application/vnd.msgpack': MSGPACK}
+_frame_header = struct.Struct('<I')
+
+
+
+class Encoding:
+    __slots__ = ('media_type', 'encode', 'keepalive')
+
+    def __init__(self, media_type: str, encode: Callable[[Any], bytes], keepalive: bytes) -> None:
+        self.media_type = media_type
+        self.encode = encode
+        self.keepalive = keepalive
+
+
+def frame(payload: Any) -> bytes:
+    """Length-prefixed frame of a bytes-like payload, joined with a single copy."""
+    view = memoryview(payload).cast('B')
+    return b''.join((_frame_header.pack(len(view)), view))
+
+
+@lru_cache(maxsize=None)
+def msgpack_packer() -> Callable[[Any], bytes] | None:
+    """msgpack encoder from the msgpack package, or from msgspec (a Litestar dependency), if either is installed."""
+    try:
+        import msgpack
+        return lambda data: msgpack.packb(data, use_bin_type=True)
+    except ImportError:
+        pass
+    try:
+        import msgspec.msgpack
+        return msgspec.msgpack.encode
+    except ImportError:
+        return None
+
+
+def array_bytes(data: Any) -> memoryview:
+    """Little-endian view of the buffer of {data} (NumPy array, array.array, bytes...),
+    without copy unless the byte order needs swapping."""
+    view = memoryview(data)
+    if not view.c_contiguous:
+        raise ValueError('The array must be C-contiguous')
+
+    order = view.format[0]
+    big_endian = order in '>!' or (order not in '<' and sys.byteorder == 'big' and view.itemsize > 1)
+    if big_endian:
+        if hasattr(data, 'dtype'):  # NumPy
+            data = data.astype(data.dtype.newbyteorder('<'))
+        elif isinstance(data, array.array):
+            data = array.array(data.typecode, data)
+            data.byteswap()
+        else:
+            raise ValueError(f'Cannot swap the byte order of {type(data).__name__}')
+        view = memoryview(data)
+    return view.cast('B')
+
+
+def negotiate(accept: str | None, json: Callable[[Any], bytes], msgpack: Callable[[Any], bytes] | None,
+    offered: Iterable[str] = (JSON, MSGPACK)
+) -> Encoding:
+    """Choose the encoding preferred by the {accept} header among the {offered} media types, JSON by default.
+    {json} and {msgpack} serialize the payloads of the framework (msgpack is skipped if None).
+    Offer ARRAY only for endpoints returning arrays (buffer protocol)."""
+    offered = tuple(offered)
+    for media_type in _preferences(accept):
+        if media_type in ('*/*', 'application/*'):
+            media_type = offered[0]
+        media_type = _aliases.get(media_type, media_type)
+        if media_type not in offered:
+            continue
+
+        if media_type == JSON:
+            break
+        if media_type == ARRAY:
+            return Encoding(ARRAY, lambda data: frame(array_bytes(data)), _frame_header.pack(0))
+        if media_type == MSGPACK and msgpack is not None:
+            return Encoding(MSGPACK, lambda data: frame(msgpack(data)), _frame_header.pack(0))
+
+    return Encoding(JSON, json, b'\n')
+
+
+def _preferences(accept: str | None) -> list[str]:
+    """Media types of an Accept header, by decreasing quality."""
+    if not accept:
+        return []
+
+    preferences = []
+    for i, part in enumerate(accept.split(',')):
+        media_type, *params = part.split(';')
+        q = 1.
+        for param in params:
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.
+        if q > 0:
+            preferences.append((-q, i, media_type.strip().lower()))
+    return [media_type for _, _, media_type in sorted(preferences)]
@@ -1,41 +1,136 @@
+import copy
 import logging
+import time
 import types
 from functools import cached_property
+from typing import Any, ClassVar
 
+from fastapi import Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.routing import APIRouter, APIRoute
 
 from .. import ASGIRunner
+from ..response_cache import ResponseCache
 
 
 
 logger = logging.getLogger(__name__)
-runner_router = APIRouter()
+
+
+class RunnerRoute(APIRoute):
+    """APIRoute recording the handler latency if the runner bound to the endpoint has metrics enabled,
+    and serving the @cached endpoints from the response cache, registered in the runner by route path and name."""
+
+    def __init__(self, path: str, endpoint: Any, **kwargs: Any) -> None:
+        super().__init__(path, endpoint, **kwargs)
+        runner = getattr(endpoint, '__self__', None)
+        policy = getattr(endpoint, '_cached', None)
+        if runner is not None and policy is not None:
+            cache = runner.response_caches[f'{self.path}:{self.name}'] = ResponseCache(policy, runner)
+            self.app = cache.middleware(self.app)
+
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        runner = getattr(self.endpoint, '__self__', None)
+        metrics = getattr(runner, 'metrics', None)
+        if metrics is None:
+            return handler
+
+        histogram = metrics.handler_histogram(self.name)
+
+        async def timed_handler(request: Request):
+            start = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+
+        return timed_handler
+
+
+runner_router = APIRouter(route_class=RunnerRoute)
+"""Router for decorating the runner methods. Each runner class takes its routes when it is defined."""
 
 
 class FastapiAsyncRunner(ASGIRunner):
     """Async process runner bound to FastAPI"""
 
-    def __new__(cls):
-        """Ensure singleton to avoid mixed bindings of the module scope router."""
-        if hasattr(cls, 'instance'):
-            raise ValueError(f'{cls} is a singleton')
-        cls.instance = super().__new__(cls)
-        return cls.instance
+    class_router: ClassVar[APIRouter] = APIRouter(route_class=RunnerRoute)
+    """The routes of the decorated methods of the class (and its bases), with unbound endpoints."""
+
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        """Collect the routes of runner_router created by decorating the methods, once per class."""
+        super().__init_subclass__(**kwargs)
+        attributes: dict[str, Any] = {}
+        for klass in reversed(cls.__mro__):
+            attributes.update(vars(klass))
+        methods = {id(value) for value in attributes.values()}  # overridden methods are left out
 
+        cls.class_router = APIRouter(route_class=RunnerRoute)
+        cls.class_router.routes = [route for route in runner_router.routes
+            if hasattr(route, 'endpoint') and id(route.endpoint) in methods]
 
-    def bind_router(self, router: APIRouter):
-        """Patch the FastAPI router (used for decorating the methods) to bind the decorated methods to the class instance."""
-        route: APIRoute
-        for route in router.routes:  # type: ignore[assignment]
-            if isinstance(route.endpoint, types.MethodType):
-                raise ValueError(f'{route} endpoint already bound to self')
 
-            route.endpoint = types.MethodType(route.endpoint, self)
+    def bind_router(self, router: APIRouter) -> APIRouter:
+        """Return a router with the routes of {router}, their endpoints bound to the runner.
+        The routes are only copied before include_router() rebuilds them, {router} is left untouched."""
+        unbound = APIRouter()
+        for route in router.routes:
+            endpoint = getattr(route, 'endpoint', None)
+            if isinstance(endpoint, types.MethodType):
+                raise ValueError(f'{route} endpoint already bound')
+
+            route = copy.copy(route)
+            if endpoint is not None:
+                route.endpoint = types.MethodType(endpoint, self)  # type: ignore[attr-defined]
+            unbound.routes.append(route)
+
+        bound = APIRouter(route_class=RunnerRoute)
+        bound.include_router(unbound)
+        return bound
 
 
     @cached_property
     def router(self) -> APIRouter:
-        """Return module-level runner_router with bound methods.
-        This is just a convenience property equivalent to `FastapiAsyncRunner.bind_router(runner_router)`."""
-        self.bind_router(runner_router)
-        return runner_router
+        """Router of this runner instance: the class_router bound to it.
+        Several runners can be served by one app under different prefixes, `api.include_router(runner.router, prefix='/a')`.
+        Includes the /metrics endpoint if metrics are enabled,
+        the /health/tasks endpoint (503 once a supervised task is given up) if the runner has supervised tasks,
+        the /live and /ready endpoints (503 until the warmups are done or while draining) if the runner has init steps,
+        and the /frames endpoint (metadata of the shared memory frame_ring) if the runner has a frame_ring."""
+        router = self.bind_router(self.class_router)
+
+        metrics = self.metrics
+        if metrics is not None:
+            async def metrics_endpoint() -> PlainTextResponse:
+                return PlainTextResponse(metrics.render())
+
+            router.add_api_route('/metrics', metrics_endpoint, include_in_schema=False, route_class_override=APIRoute)
+
+        if self.supervisor.policies:
+            async def task_health_endpoint() -> JSONResponse:
+                health = await self.task_health()
+                failed = any(task['state'] == 'failed' for task in health.values())
+                return JSONResponse(health, status_code=503 if failed else 200)
+
+            router.add_api_route('/health/tasks', task_health_endpoint, route_class_override=APIRoute)
+
+        if self.startup.steps:
+            async def live_endpoint() -> dict:
+                return {'live': True}
+
+            async def ready_endpoint() -> JSONResponse:
+                ready, steps = await self.readiness()
+                return JSONResponse({'ready': ready, 'steps': steps}, status_code=200 if ready else 503)
+
+            router.add_api_route('/live', live_endpoint, route_class_override=APIRoute)
+            router.add_api_route('/ready', ready_endpoint, route_class_override=APIRoute)
+
+        if self.frame_ring is not None:
+            async def frames_endpoint() -> dict:
+                return await self.frame_ring_info()
+
+            router.add_api_route('/frames', frames_endpoint, route_class_override=APIRoute)
+        return router
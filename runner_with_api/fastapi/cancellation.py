@@ -1,33 +1,28 @@
+from __future__ import annotations
 from contextlib import asynccontextmanager
 
-from anyio import create_task_group
 from fastapi import Request
 
 from . import logger
+from .. import cancellation
+from ..cancellation import DisconnectWatcher
 
 
 
 @asynccontextmanager
-async def cancel_on_disconnect(request: Request):
+async def cancel_on_disconnect(request: Request, watcher: DisconnectWatcher | None = None):
     """
     Async context manager for async code that needs to be cancelled if client disconnects prematurely.
     The client disconnect is monitored through the Request object.
+    Pass the runner's disconnect_watcher as {watcher} to avoid spawning a task for the request.
     """
-    async with create_task_group() as tg:
-        async def watch_disconnect():
-            while True:
-                message = await request.receive()
-
-                if message['type'] == 'http.disconnect':
-                    client = f'{request.client.host}:{request.client.port}' if request.client else '-:-'
-                    logger.info(f'{client} - "{request.method} {request.url.path}" 499 DISCONNECTED')
-
-                    tg.cancel_scope.cancel()
-                    break
-
-        tg.start_soon(watch_disconnect)
+    def on_disconnect() -> None:
+        client = f'{request.client.host}:{request.client.port}' if request.client else '-:-'
+        logger.info(f'{client} - "{request.method} {request.url.path}" 499 DISCONNECTED')
 
+    receive = request._receive
+    async with cancellation.cancel_on_disconnect(receive, on_disconnect, watcher) as request._receive:
         try:
             yield
         finally:
-            tg.cancel_scope.cancel()
+            request._receive = receive
@@ -1,13 +1,15 @@
 from __future__ import annotations
 import json
-from typing import Awaitable, Generic, Mapping, TypeVar
+from typing import Any, AsyncIterable, Awaitable, Generic, Iterable, Mapping, TypeVar
 
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from starlette.background import BackgroundTask
 
-from ..utils import http_long_polling
+from ..encoding import ARRAY, JSON, MSGPACK, Encoding, msgpack_packer, negotiate
+from ..utils import AnyioBroadcast, KeepaliveScheduler, Serialized, http_long_polling, http_streaming, sse_encode, sse_events
+from .. import websocket
 
 
 
@@ -17,25 +19,133 @@ class LongPollingResponse(StreamingResponse, Generic[T]):
     """Subclass of StreamingResponse"""
 
     def __init__(self, func: Awaitable[T], keepalive=1.,
+        scheduler: KeepaliveScheduler | None = None,
         status_code: int = 200,
         headers: Mapping[str, str] | None = None,
-        background: BackgroundTask | None = None
+        background: BackgroundTask | None = None,
+        accept: str | None = None,
+        encodings: Iterable[str] = (JSON, MSGPACK)
     ):
         """Keep the connection alive until awaitable func returns the final response.
-        The function must return a pydantic model or a json serializable object.
+        The function must return a pydantic model or a json serializable object,
+        or the bytes already serialized by a ResultSlot shared with other long-polls.
+        Pass the runner's keepalive_scheduler as {scheduler} to share one keepalive timer among all long-polls.
+        While the runner drains, the scheduler refuses new long-polls with 503 and a Retry-After header,
+        and resolves the parked ones with {"retry_after": seconds} instead of their result.
+        Pass the request's Accept header as {accept} to choose among {encodings} (see runner_with_api.encoding),
+        JSON by default. Add ARRAY for functions returning arrays, sent as raw little-endian bytes.
         """
-        async def response_serialized() -> str:
-            response = await func
+        encoding = LongPollingResponse.encoding(accept, encodings)
 
-            if isinstance(response, BaseModel):
-                return response.model_dump_json()
+        async def response_serialized() -> bytes:
+            response = await func
+            return response.encoded(encoding) if isinstance(response, Serialized) else encoding.encode(response)
 
-            return json.dumps(jsonable_encoder(response))
+        if scheduler is not None and scheduler.draining:
+            retry_after = scheduler.reject(func)
+            super().__init__(
+                iter((LongPollingResponse.retry(retry_after),)),
+                media_type='application/json',
+                status_code=503,
+                headers={**(headers or {}), 'Retry-After': str(retry_after)},
+                background=background
+            )
+            return
 
+        retry = None if encoding.media_type == ARRAY else lambda retry_after: encoding.encode({'retry_after': retry_after})
         super().__init__(
-            http_long_polling(response_serialized(), '\n', keepalive),
-            media_type='application/json',
+            http_long_polling(response_serialized(), encoding.keepalive, keepalive, scheduler, retry),
+            media_type=encoding.media_type,
             status_code=status_code,
             headers=headers,
             background=background
         )
+
+
+    @staticmethod
+    def retry(retry_after: float) -> bytes:
+        return LongPollingResponse.serialize({'retry_after': retry_after})
+
+
+    @staticmethod
+    def serialize(response: Any) -> bytes:
+        if isinstance(response, Serialized):
+            return response.encoded(LongPollingResponse.encoding(None))
+        if isinstance(response, BaseModel):
+            return response.model_dump_json().encode()
+        try:
+            return json.dumps(response).encode()  # fast path for the plain types, skipping jsonable_encoder
+        except TypeError:
+            return json.dumps(jsonable_encoder(LongPollingResponse.tolist(response))).encode()
+
+
+    @staticmethod
+    def serialize_msgpack(response: Any) -> bytes:
+        packer = msgpack_packer()
+        assert packer is not None
+        try:
+            return packer(response)
+        except TypeError:
+            return packer(jsonable_encoder(LongPollingResponse.tolist(response)))
+
+
+    @staticmethod
+    def tolist(response: Any) -> Any:
+        """Arrays (NumPy, array.array) as lists, for the JSON and msgpack encodings."""
+        return response.tolist() if hasattr(response, 'tolist') else response
+
+
+    @staticmethod
+    def encoding(accept: str | None, encodings: Iterable[str] = (JSON, MSGPACK)) -> Encoding:
+        msgpack = LongPollingResponse.serialize_msgpack if msgpack_packer() is not None else None
+        return negotiate(accept, LongPollingResponse.serialize, msgpack, encodings)
+
+
+class EventStreamResponse(StreamingResponse, Generic[T]):
+    """Subclass of StreamingResponse for Server-Sent Events (text/event-stream)"""
+
+    def __init__(self, source: AsyncIterable[T] | AnyioBroadcast[T], keepalive=1.,
+        last_event_id: str | None = None,
+        buffer_size: int = 0,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+        background: BackgroundTask | None = None,
+        accept: str | None = None,
+        encodings: Iterable[str] = (JSON, MSGPACK)
+    ):
+        """Stream the items of source (async iterator, AnyioDeque or AnyioBroadcast) as they arrive,
+        with the same keepalives as LongPollingResponse in between.
+        Pass the request's Last-Event-ID header as {last_event_id} to resume an AnyioBroadcast,
+        resuming is not possible with other sources and the header is ignored for them.
+        Items are serialized like LongPollingResponse. If {accept} negotiates a binary encoding,
+        the items are sent as length-prefixed frames instead of events.
+        """
+        encoding = LongPollingResponse.encoding(accept, encodings)
+
+        async def events_serialized():
+            async for event_id, data in sse_events(source, last_event_id):
+                if encoding.media_type == JSON:
+                    yield sse_encode(event_id, LongPollingResponse.serialize(data))
+                else:
+                    yield data.encoded(encoding) if isinstance(data, Serialized) else encoding.encode(data)
+
+        super().__init__(
+            http_streaming(events_serialized(), encoding.keepalive, keepalive, buffer_size),
+            media_type='text/event-stream' if encoding.media_type == JSON else encoding.media_type,
+            status_code=status_code,
+            headers={'Cache-Control': 'no-cache', **(headers or {})},
+            background=background
+        )
+
+
+class WebSocketHub(websocket.WebSocketHub):
+    """WebSocketHub serializing messages like LongPollingResponse."""
+
+    @staticmethod
+    def serialize(data: Any) -> str:
+        return LongPollingResponse.serialize(data).decode()
+
+
+    @staticmethod
+    def deserialize(message: str | bytes) -> Any:
+        return json.loads(message)
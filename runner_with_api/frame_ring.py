@@ -0,0 +1,231 @@
+"""
+Ring of frames in shared memory, for the consumers running on the same host (visualizer, recording sidecar...):
+they map the frames published by run() without copy, while the HTTP API only serves the ring metadata (see FrameRing.info()).
+
+Layout, little-endian: a 64 bytes header (magic, layout version, slot count, slot size, latest sequence),
+then the slots, each a 64 bytes header (version, sequence, size, timestamp) followed by the frame data, 64 bytes aligned.
+A slot version is odd while the frame is written (seqlock): a reader checks it is unchanged after reading the frame,
+otherwise the frame was overwritten meanwhile. This relies on the stores of the writer being seen in order,
+as on x86-64: on weakly-ordered CPUs, readers should copy the frame and validate it (Frame.copy()).
+"""
+from __future__ import annotations
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any
+
+
+
+HEADER = struct.Struct('<8sIIQQ')
+SLOT = struct.Struct('<QQQd')
+MAGIC = b'RWAFRAME'
+LAYOUT_VERSION = 1
+_ALIGNMENT = 64
+_LATEST = 24  # offset of the latest sequence in the header
+_RETRIES = 100  # reads of a slot being written before giving up
+_created: set[str] = set()  # names of the rings created by this process
+
+
+def _aligned(size: int) -> int:
+    return -(-size // _ALIGNMENT) * _ALIGNMENT
+
+
+class Frame:
+    """A frame mapped from the ring. {data} is only valid as long as valid() is true: the slot may be overwritten
+    once the ring wrapped around. Release {data} before closing the reader."""
+    __slots__ = ('sequence', 'timestamp', 'data', '_buffer', '_offset', '_version')
+
+    def __init__(self, sequence: int, timestamp: float, data: memoryview, buffer: memoryview, offset: int, version: int) -> None:
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self.data = data
+        self._buffer = buffer
+        self._offset = offset
+        self._version = version
+
+
+    def valid(self) -> bool:
+        """Whether the frame was not overwritten since it was mapped."""
+        return SLOT.unpack_from(self._buffer, self._offset)[0] == self._version
+
+
+    def copy(self) -> bytes | None:
+        """Copy of the frame data, or None if it was overwritten during the copy."""
+        data = bytes(self.data)
+        return data if self.valid() else None
+
+
+class _Ring:
+    def __init__(self) -> None:
+        self._shm: shared_memory.SharedMemory | None = None
+        self.slots = 0
+        self.slot_size = 0
+
+
+    @property
+    def buffer(self) -> memoryview:
+        if self._shm is None:
+            raise RuntimeError('The frame ring is not open')
+        return self._shm.buf
+
+
+    @property
+    def name(self) -> str | None:
+        return None if self._shm is None else self._shm.name
+
+
+    @property
+    def stride(self) -> int:
+        return _ALIGNMENT + _aligned(self.slot_size)
+
+
+    @property
+    def latest(self) -> int:
+        """Sequence of the last published frame, 0 before the first one."""
+        return struct.unpack_from('<Q', self.buffer, _LATEST)[0]
+
+
+    def _slot(self, sequence: int) -> int:
+        return _ALIGNMENT + (sequence - 1) % self.slots * self.stride
+
+
+    def frame(self, sequence: int | None = None) -> Frame | None:
+        """Frame {sequence} (the latest by default) mapped without copy,
+        or None if it is not published yet or was overwritten."""
+        buffer = self.buffer
+        latest = self.latest
+        if sequence is None:
+            sequence = latest
+        if sequence < 1 or sequence > latest or sequence <= latest - self.slots:
+            return None
+
+        offset = self._slot(sequence)
+        for _ in range(_RETRIES):
+            version, slot_sequence, size, timestamp = SLOT.unpack_from(buffer, offset)
+            if version % 2:  # being written
+                continue
+            if slot_sequence != sequence:
+                return None
+            frame = Frame(sequence, timestamp, buffer[offset + _ALIGNMENT:offset + _ALIGNMENT + size], buffer, offset, version)
+            if frame.valid():
+                return frame
+        return None
+
+
+class FrameRing(_Ring):
+    """
+    Ring of {slots} frames of up to {slot_size} bytes in shared memory, written by publish().
+    Set it on a runner class, ASGIRunner.frame_ring = FrameRing(...): the lifespan gives each runner instance a copy,
+    creates its shared memory before init() and removes it on exit, and the framework adapters serve info() at /frames.
+    {name} is generated unless given (a given name allows a single open ring),
+    {metadata} (e.g. dtype and shape of the frames) is passed to the readers in info().
+    """
+    def __init__(self, slots=8, slot_size=1 << 20, name: str | None = None, metadata: dict[str, Any] | None = None) -> None:
+        super().__init__()
+        if slots < 2:
+            raise ValueError('A frame ring needs at least 2 slots')
+        self.slots = slots
+        self.slot_size = slot_size
+        self.requested_name = name
+        self.metadata = metadata or {}
+        self._versions: list[int] = []
+        self._latest = 0
+
+
+    def copy(self) -> FrameRing:
+        """Ring of the same configuration, not open."""
+        return FrameRing(self.slots, self.slot_size, self.requested_name, self.metadata)
+
+
+    @property
+    def size(self) -> int:
+        return _ALIGNMENT + self.slots * self.stride
+
+
+    def open(self) -> None:
+        if self._shm is not None:
+            raise RuntimeError(f'The frame ring {self.name} is already open')
+        self._shm = shared_memory.SharedMemory(self.requested_name, create=True, size=self.size)
+        _created.add(self._shm.name)
+        HEADER.pack_into(self._shm.buf, 0, MAGIC, LAYOUT_VERSION, self.slots, self.slot_size, 0)
+        self._versions = [0] * self.slots
+        self._latest = 0
+
+
+    def close(self) -> None:
+        """Remove the shared memory. The readers keep their mapping until they close it."""
+        if self._shm is not None:
+            _created.discard(self._shm.name)
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+    def publish(self, data: Any, timestamp: float | None = None) -> int:
+        """Copy {data} (bytes or any contiguous buffer, e.g. a NumPy array) in the next slot, return its sequence number."""
+        buffer = self.buffer
+        view = memoryview(data).cast('B')
+        if view.nbytes > self.slot_size:
+            raise ValueError(f'Frame of {view.nbytes} bytes larger than the slots of {self.slot_size} bytes')
+
+        sequence = self._latest + 1
+        index = (sequence - 1) % self.slots
+        offset = self._slot(sequence)
+        version = self._versions[index]
+        struct.pack_into('<Q', buffer, offset, version + 1)
+        buffer[offset + _ALIGNMENT:offset + _ALIGNMENT + view.nbytes] = view
+        struct.pack_into('<QQd', buffer, offset + 8, sequence, view.nbytes, time.time() if timestamp is None else timestamp)
+        struct.pack_into('<Q', buffer, offset, version + 2)  # last, the frame is complete
+        self._versions[index] = version + 2
+        struct.pack_into('<Q', buffer, _LATEST, sequence)
+        self._latest = sequence
+        return sequence
+
+
+    def info(self) -> dict[str, Any]:
+        """Metadata for the readers: the shared memory name, its layout and the latest sequence."""
+        return {
+            'name': self.name,
+            'layout_version': LAYOUT_VERSION,
+            'slots': self.slots,
+            'slot_size': self.slot_size,
+            'slot_stride': self.stride,
+            'header_format': HEADER.format,
+            'slot_header_format': SLOT.format,
+            'data_offset': _ALIGNMENT,
+            'latest': self._latest,
+            'metadata': self.metadata,
+        }
+
+
+class FrameReader(_Ring):
+    """Maps the frame ring {name} (from FrameRing.info()) of a process running on the same host."""
+
+    def __init__(self, name: str) -> None:
+        super().__init__()
+        if sys.version_info >= (3, 13):
+            self._shm = shared_memory.SharedMemory(name, track=False)
+        else:
+            self._shm = shared_memory.SharedMemory(name)
+            if self._shm.name not in _created:  # tracked once per process, the writer removes it
+                resource_tracker.unregister(self._shm._name, 'shared_memory')  # type: ignore[attr-defined]
+        magic, version, self.slots, self.slot_size, _ = HEADER.unpack_from(self._shm.buf, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            self.close()
+            raise ValueError(f'{name} is not a frame ring of layout version {LAYOUT_VERSION}')
+
+
+    def close(self) -> None:
+        """Unmap the ring, the frames must have been released."""
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+
+    def __enter__(self) -> FrameReader:
+        return self
+
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
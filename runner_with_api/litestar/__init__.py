@@ -2,10 +2,13 @@ import copy
 import logging
 import types
 from functools import cached_property
+from typing import Any, ClassVar
 
+from litestar import MediaType, Response, get
 from litestar.handlers import BaseRouteHandler
 
 from .. import ASGIRunner
+from ..response_cache import ResponseCache
 
 
 
@@ -15,27 +18,117 @@ logger = logging.getLogger(__name__)
 class LitestarAsyncRunner(ASGIRunner):
     """Async process runner bound to Litestar"""
 
-    def _handlers(self) -> list[BaseRouteHandler]:
-        handlers = []
-        for name in dir(self):
-            if name == 'handlers':  # avoid infinite recursion with the property
-                continue
-            method = getattr(self, name)
+    _route_handlers: ClassVar[tuple[BaseRouteHandler, ...]] = ()
+    _mutable_attributes = ('_response_handler_mapping', 'opt')  # mutated in place by Litestar or the user
 
-            if isinstance(method, BaseRouteHandler):
-                handlers.append(method)
 
-        handlers.sort(key=lambda h: h.handler_id)
-        return handlers
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        """Collect the route handlers created by decorating the methods, once per class."""
+        super().__init_subclass__(**kwargs)
+        handlers: dict[str, BaseRouteHandler] = {}
+        for klass in reversed(cls.__mro__):
+            for name, value in vars(klass).items():
+                if isinstance(value, BaseRouteHandler):
+                    handlers[name] = value
+                else:
+                    handlers.pop(name, None)  # overridden by a plain method
+
+        cls._route_handlers = tuple(sorted(handlers.values(), key=lambda h: h.handler_id))
+
 
+    def _bind(self, handler: BaseRouteHandler, prefix: str = '') -> BaseRouteHandler:
+        """Shallow copy of the class handler bound to the runner. The class handler itself is never registered,
+        so it stays unresolved and only the attributes mutated in place need their own copy."""
+        handler = copy.copy(handler)
+        for name in self._mutable_attributes:
+            value = getattr(handler, name, None)
+            if value is not None:
+                setattr(handler, name, copy.copy(value))
 
-    def _bind(self, handler: BaseRouteHandler) -> BaseRouteHandler:
-        handler = copy.deepcopy(handler)
+        if prefix:
+            handler.paths = {_join(prefix, path) for path in handler.paths}
+        name = f'{prefix}/{handler.handler_name}' if prefix else handler.handler_name
+        policy = getattr(handler._fn, '_cached', None)
+        if policy is not None:
+            cache = self.response_caches[name] = ResponseCache(policy, self)
+            handler.middleware = [*(handler.middleware or ()), cache.middleware]
         handler._fn = types.MethodType(handler._fn, self)
+        if self.metrics is not None:
+            histogram = self.metrics.handler_histogram(name)
+            handler._fn = self.metrics.timed(histogram, handler._fn)
         return handler
 
 
+    def _metrics_handler(self, prefix: str) -> BaseRouteHandler:
+        metrics = self.metrics
+        assert metrics is not None
+
+        @get(_join(prefix, '/metrics'), media_type=MediaType.TEXT, include_in_schema=False, sync_to_thread=False)
+        def metrics_handler() -> str:
+            return metrics.render()
+
+        return metrics_handler
+
+
+    def _task_health_handler(self, prefix: str) -> BaseRouteHandler:
+        @get(_join(prefix, '/health/tasks'))
+        async def task_health_handler() -> Response[dict]:
+            health = await self.task_health()
+            failed = any(task['state'] == 'failed' for task in health.values())
+            return Response(health, status_code=503 if failed else 200)
+
+        return task_health_handler
+
+
+    def _readiness_handlers(self, prefix: str) -> list[BaseRouteHandler]:
+        @get(_join(prefix, '/live'), sync_to_thread=False)
+        def live_handler() -> dict:
+            return {'live': True}
+
+        @get(_join(prefix, '/ready'))
+        async def ready_handler() -> Response[dict]:
+            ready, steps = await self.readiness()
+            return Response({'ready': ready, 'steps': steps}, status_code=200 if ready else 503)
+
+        return [live_handler, ready_handler]
+
+
+    def _frames_handler(self, prefix: str) -> BaseRouteHandler:
+        @get(_join(prefix, '/frames'))
+        async def frames_handler() -> dict:
+            return await self.frame_ring_info()
+
+        return frames_handler
+
+
+    def handlers_at(self, prefix: str = '') -> list[BaseRouteHandler]:
+        """Get all route handlers created by decorating the methods, bound to the runner, with their paths under {prefix}.
+        Several runners can be served by one app under different prefixes:
+        `Litestar(a.handlers_at('/a') + b.handlers_at('/b'), lifespan=[a.lifespan, b.lifespan])`.
+        Passing the handlers in a litestar.Router would deep copy them, and the bound runner with them.
+        Includes the /metrics endpoint if metrics are enabled,
+        the /health/tasks endpoint (503 once a supervised task is given up) if the runner has supervised tasks,
+        the /live and /ready endpoints (503 until the warmups are done or while draining) if the runner has init steps,
+        and the /frames endpoint (metadata of the shared memory frame_ring) if the runner has a frame_ring."""
+        handlers = [self._bind(handler, prefix) for handler in self._route_handlers]
+        if self.metrics is not None:
+            handlers.append(self._metrics_handler(prefix))
+        if self.supervisor.policies:
+            handlers.append(self._task_health_handler(prefix))
+        if self.startup.steps:
+            handlers.extend(self._readiness_handlers(prefix))
+        if self.frame_ring is not None:
+            handlers.append(self._frames_handler(prefix))
+        return handlers
+
+
     @cached_property
     def handlers(self) -> list[BaseRouteHandler]:
-        """Get all route handlers created by decorating the methods, bound to the runner."""
-        return [self._bind(handler) for handler in self._handlers()]
+        """The route handlers of handlers_at() without prefix."""
+        return self.handlers_at()
+
+
+def _join(prefix: str, path: str) -> str:
+    if path == '/':
+        return prefix or '/'
+    return prefix.rstrip('/') + path
@@ -1,17 +1,16 @@
 from __future__ import annotations
+import sys
 from types import MethodType
-from typing import Awaitable, Generic, TypeVar
+from typing import Any, AsyncIterable, Awaitable, Generic, Iterable, TypeVar
 
 from litestar.background_tasks import BackgroundTask, BackgroundTasks
 from litestar.response import Response, Stream
-from litestar.serialization import encode_json
+from litestar.serialization import decode_json, default_serializer, encode_json, encode_msgpack
 from litestar.types import ResponseHeaders
-try:
-    from pydantic import BaseModel
-except ImportError:
-    class BaseModel: ...  # type: ignore[no-redef]
 
-from ..utils import http_long_polling
+from ..encoding import ARRAY, JSON, MSGPACK, Encoding, negotiate
+from ..utils import AnyioBroadcast, KeepaliveScheduler, Serialized, http_long_polling, http_streaming, sse_encode, sse_events
+from .. import websocket
 
 
 
@@ -21,20 +20,42 @@ class LongPollingResponse(Response[T], Generic[T]):
     """Subclass of Response"""
 
     def __init__(self, func: Awaitable[T], keepalive=1.,
+        scheduler: KeepaliveScheduler | None = None,
         status_code: int = 200,
         headers: "ResponseHeaders | None" = None,
-        background: BackgroundTask | BackgroundTasks | None = None
+        background: BackgroundTask | BackgroundTasks | None = None,
+        accept: str | None = None,
+        encodings: Iterable[str] = (JSON, MSGPACK)
     ):
         """Keep the connection alive until awaitable func returns the final response.
-        The function must return a msgspec, pydantic model or a json serializable object.
+        The function must return a msgspec, pydantic model or a json serializable object,
+        or the bytes already serialized by a ResultSlot shared with other long-polls.
+        Pass the runner's keepalive_scheduler as {scheduler} to share one keepalive timer among all long-polls.
+        While the runner drains, the scheduler refuses new long-polls with 503 and a Retry-After header,
+        and resolves the parked ones with {"retry_after": seconds} instead of their result.
+        Pass the request's Accept header as {accept} to choose among {encodings} (see runner_with_api.encoding),
+        JSON by default. Add ARRAY for functions returning arrays, sent as raw little-endian bytes.
         """
+        encoding = LongPollingResponse.encoding(accept, encodings)
+
         async def response_serialized() -> bytes:
             response = await func
-            return LongPollingResponse.serialize(response)
+            return response.encoded(encoding) if isinstance(response, Serialized) else encoding.encode(response)
+
+        if scheduler is not None and scheduler.draining:
+            retry_after = scheduler.reject(func)
+            super().__init__(
+                LongPollingResponse.retry(retry_after),  # type: ignore[arg-type]
+                background=background,
+                headers={**(headers or {}), 'Retry-After': str(retry_after)},  # type: ignore[dict-item]
+                media_type='application/json',
+                status_code=503,
+            )
+            return
 
         # for Stream()
         # super().__init__(
-        #     http_long_polling(response_serialized(), b'\n', keepalive),
+        #     http_long_polling(response_serialized(), b'\n', keepalive, scheduler),
         #     media_type='application/json',
         #     status_code=status_code,
         #     headers=headers,
@@ -45,15 +66,98 @@ class LongPollingResponse(Response[T], Generic[T]):
             b'',  # type: ignore[arg-type]
             background=background,
             headers=headers,
-            media_type='application/json',
+            media_type=encoding.media_type,
             status_code=status_code,
         )
-        self.iterator = http_long_polling(response_serialized(), b'\n', keepalive)
+        retry = None if encoding.media_type == ARRAY else lambda retry_after: encoding.encode({'retry_after': retry_after})
+        self.iterator = http_long_polling(response_serialized(), encoding.keepalive, keepalive, scheduler, retry)
         self.to_asgi_response = MethodType(Stream.to_asgi_response, self)  # type: ignore[method-assign]
 
 
     @staticmethod
     def serialize(response: T) -> bytes:
-        if isinstance(response, BaseModel):
+        if isinstance(response, Serialized):
+            return response.encoded(LongPollingResponse.encoding(None))
+        pydantic = sys.modules.get('pydantic')  # a pydantic model implies pydantic is imported, no need to import it here
+        if pydantic is not None and isinstance(response, pydantic.BaseModel):
             return response.model_dump_json().encode()
-        return encode_json(response)
+        return encode_json(response, LongPollingResponse.default)
+
+
+    @staticmethod
+    def serialize_msgpack(response: Any) -> bytes:
+        return encode_msgpack(response, LongPollingResponse.default)
+
+
+    @staticmethod
+    def default(value: Any) -> Any:
+        """Serializer of the types unknown to msgspec: pydantic models and arrays (NumPy, array.array) as lists."""
+        pydantic = sys.modules.get('pydantic')
+        if pydantic is not None and isinstance(value, pydantic.BaseModel):
+            return value.model_dump(mode='json')
+        if hasattr(value, 'tolist'):
+            return value.tolist()
+        return default_serializer(value)
+
+
+    @staticmethod
+    def encoding(accept: str | None, encodings: Iterable[str] = (JSON, MSGPACK)) -> Encoding:
+        return negotiate(accept, LongPollingResponse.serialize, LongPollingResponse.serialize_msgpack, encodings)
+
+
+    @staticmethod
+    def retry(retry_after: float) -> bytes:
+        return LongPollingResponse.serialize({'retry_after': retry_after})  # type: ignore[arg-type]
+
+
+class EventStreamResponse(Response[T], Generic[T]):
+    """Subclass of Response for Server-Sent Events (text/event-stream)"""
+
+    def __init__(self, source: AsyncIterable[T] | AnyioBroadcast[T], keepalive=1.,
+        last_event_id: str | None = None,
+        buffer_size: int = 0,
+        status_code: int = 200,
+        headers: "ResponseHeaders | None" = None,
+        background: BackgroundTask | BackgroundTasks | None = None,
+        accept: str | None = None,
+        encodings: Iterable[str] = (JSON, MSGPACK)
+    ):
+        """Stream the items of source (async iterator, AnyioDeque or AnyioBroadcast) as they arrive,
+        with the same keepalives as LongPollingResponse in between.
+        Pass the request's Last-Event-ID header as {last_event_id} to resume an AnyioBroadcast,
+        resuming is not possible with other sources and the header is ignored for them.
+        Items are serialized like LongPollingResponse. If {accept} negotiates a binary encoding,
+        the items are sent as length-prefixed frames instead of events.
+        """
+        encoding = LongPollingResponse.encoding(accept, encodings)
+
+        async def events_serialized():
+            async for event_id, data in sse_events(source, last_event_id):
+                if encoding.media_type == JSON:
+                    yield sse_encode(event_id, LongPollingResponse.serialize(data))
+                else:
+                    yield data.encoded(encoding) if isinstance(data, Serialized) else encoding.encode(data)
+
+        super().__init__(
+            b'',  # type: ignore[arg-type]
+            background=background,
+            headers=headers,
+            media_type='text/event-stream' if encoding.media_type == JSON else encoding.media_type,
+            status_code=status_code,
+        )
+        self.headers.setdefault('Cache-Control', 'no-cache')
+        self.iterator = http_streaming(events_serialized(), encoding.keepalive, keepalive, buffer_size)
+        self.to_asgi_response = MethodType(Stream.to_asgi_response, self)  # type: ignore[method-assign]
+
+
+class WebSocketHub(websocket.WebSocketHub):
+    """WebSocketHub serializing messages like LongPollingResponse."""
+
+    @staticmethod
+    def serialize(data: Any) -> str:
+        return LongPollingResponse.serialize(data).decode()
+
+
+    @staticmethod
+    def deserialize(message: str | bytes) -> Any:
+        return decode_json(message)
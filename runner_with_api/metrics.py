@@ -0,0 +1,141 @@
+"""
+Opt-in instrumentation of the runner, exposed in the Prometheus text format.
+Set `metrics = Metrics()` on the runner class (or instance) to enable it.
+Set on the class, each runner instance gets a Metrics of its own, created on first access.
+"""
+from __future__ import annotations
+import functools
+import inspect
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Iterable
+
+import anyio
+
+
+
+LATENCY_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5., 10.)
+WAIT_BUCKETS = (.01, .1, .5, 1., 2.5, 5., 10., 30., 60., 300.)
+
+
+class Histogram:
+    """Histogram with preallocated buckets: observe() only increments, nothing is allocated per event."""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.sum = 0.
+        self.count = 0
+
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+    def render(self, name: str, labels: str = '') -> Iterable[str]:
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels[:-1]}}} {self.sum}' if labels else f'{name}_sum {self.sum}'
+        yield f'{name}_count{{{labels[:-1]}}} {self.count}' if labels else f'{name}_count {self.count}'
+
+
+class Metrics:
+    """Histograms of the runner plus values read from its components when rendered."""
+    name = 'metrics'  # attribute of the runner class, see __set_name__()
+
+    def __init__(self, loop_lag_interval=0.1) -> None:
+        self.loop_lag_interval = loop_lag_interval
+        self.loop_lag = Histogram()
+        self.last_loop_lag = 0.
+        self.run_iteration = Histogram()
+        self.long_poll_wait = Histogram(WAIT_BUCKETS)
+        self.handler_latency: dict[str, Histogram] = {}
+        self.job_jitter: dict[str, Histogram] = {}  # of the @periodic jobs, registered by the runner
+        self.collectors: dict[str, tuple[str, str, Callable[[], float]]] = {}
+
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+
+    def __get__(self, instance: Any, owner: type | None = None) -> Metrics:
+        """As a class attribute, a copy per instance: the instances do not mix their measures."""
+        if instance is None:
+            return self
+        metrics = instance.__dict__[self.name] = Metrics(self.loop_lag_interval)
+        return metrics
+
+
+    def handler_histogram(self, handler: str) -> Histogram:
+        """Histogram of a handler, created once at binding time."""
+        return self.handler_latency.setdefault(handler, Histogram())
+
+
+    def collect(self, name: str, help: str, type: str, fn: Callable[[], float]) -> None:
+        """Register a counter or gauge that is read from {fn} when rendering, replacing the one of the same name."""
+        self.collectors[name] = (help, type, fn)
+
+
+    async def sample_loop_lag(self) -> None:
+        """Measure forever how late the event loop wakes up a sleeping task. Started by the runner lifespan."""
+        interval = self.loop_lag_interval
+        while True:
+            start = anyio.current_time()
+            await anyio.sleep(interval)
+            self.last_loop_lag = max(0., anyio.current_time() - start - interval)
+            self.loop_lag.observe(self.last_loop_lag)
+
+
+    def timed(self, histogram: Histogram, fn: Callable) -> Callable:
+        """Wrap a sync or async callable to observe its duration."""
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed_async(*args: Any, **kwargs: Any) -> Any:
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start)
+            return timed_async
+
+        @functools.wraps(fn)
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return timed
+
+
+    def render(self) -> str:
+        lines = []
+
+        def histogram(name: str, help: str, h: Histogram) -> None:
+            lines.extend((f'# HELP {name} {help}', f'# TYPE {name} histogram'))
+            lines.extend(h.render(name))
+
+        histogram('runner_loop_lag_seconds', 'Event loop wakeup delay.', self.loop_lag)
+        histogram('runner_run_iteration_seconds', 'Duration of the run() loop iterations.', self.run_iteration)
+        histogram('runner_long_poll_wait_seconds', 'Time long-polls waited for their result.', self.long_poll_wait)
+
+        name = 'runner_handler_latency_seconds'
+        lines.extend((f'# HELP {name} Duration of the runner route handlers.', f'# TYPE {name} histogram'))
+        for handler, h in self.handler_latency.items():
+            lines.extend(h.render(name, f'handler="{handler}",'))
+
+        if self.job_jitter:
+            name = 'runner_periodic_jitter_seconds'
+            lines.extend((f'# HELP {name} How late the periodic jobs start after their deadlines.', f'# TYPE {name} histogram'))
+            for job, h in self.job_jitter.items():
+                lines.extend(h.render(name, f'job="{job}",'))
+
+        for name, (help, type, fn) in self.collectors.items():
+            lines.extend((f'# HELP {name} {help}', f'# TYPE {name} {type}', f'{name} {fn()}'))
+
+        return '\n'.join(lines) + '\n'
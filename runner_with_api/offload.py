@@ -0,0 +1,71 @@
+from __future__ import annotations
+import functools
+import math
+import os
+from typing import Any, Callable, TypeVar
+
+import anyio
+from anyio import to_process, to_thread
+
+
+
+T = TypeVar('T')
+
+
+class OffloadPool:
+    """
+    Run blocking or CPU-bound stages outside the event loop, so they do not stall the API handlers.
+    Worker threads share memory with the loop, so buffers (bytes, memoryview, numpy arrays) cross without copies.
+    Worker processes (for pure python CPU-bound code that holds the GIL) receive pickled copies of the arguments.
+    Concurrency is bounded separately for threads and processes; calls over the limit wait in a queue.
+    """
+    def __init__(self, threads: int = 4, processes: int | None = None) -> None:
+        self.thread_limiter = anyio.CapacityLimiter(threads)
+        self.process_limiter = anyio.CapacityLimiter(processes or os.cpu_count() or 1)
+        self._unlimited = anyio.CapacityLimiter(math.inf)  # the limits above are already held
+        self.queued = 0  # calls waiting for a free thread/process
+        self.running = 0
+        self.completed = 0
+        self.wait_time = 0.  # total seconds spent queued
+        self.run_time = 0.  # total seconds spent running
+        self.max_latency = 0.  # queued + running, worst call
+
+
+    @property
+    def mean_latency(self) -> float:
+        return (self.wait_time + self.run_time) / self.completed if self.completed else 0.
+
+
+    async def run_sync(self, fn: Callable[..., T], *args: Any, process=False) -> T:
+        """Call fn(*args) in a worker thread, or a worker process if {process} (fn and args must be picklable)."""
+        limiter = self.process_limiter if process else self.thread_limiter
+        queued_at = anyio.current_time()
+        self.queued += 1
+        try:
+            await limiter.acquire()
+        finally:
+            self.queued -= 1
+
+        started_at = anyio.current_time()
+        self.running += 1
+        try:
+            if process:
+                return await to_process.run_sync(fn, *args, limiter=self._unlimited)
+            return await to_thread.run_sync(fn, *args, limiter=self._unlimited)
+        finally:
+            limiter.release()
+            self.running -= 1
+            finished_at = anyio.current_time()
+            self.completed += 1
+            self.wait_time += started_at - queued_at
+            self.run_time += finished_at - started_at
+            self.max_latency = max(self.max_latency, finished_at - queued_at)
+
+
+def offloaded(method: Callable[..., T]) -> Callable[..., Any]:
+    """Decorator turning a blocking runner method into an async method running on the runner's offload_pool threads."""
+    @functools.wraps(method)
+    async def wrapper(self, *args: Any, **kwargs: Any) -> T:
+        return await self.offload_pool.run_sync(functools.partial(method, self, **kwargs), *args)
+
+    return wrapper
@@ -0,0 +1,135 @@
+"""
+Periodic jobs: runner methods called at a fixed rate on absolute deadlines (start + k * period),
+so the timing does not drift by the duration of each call as `while True: ...; await sleep(period)` does.
+"""
+from __future__ import annotations
+import logging
+import math
+from typing import Any, Awaitable, Callable, Literal
+
+import anyio
+
+from .metrics import Histogram
+
+
+
+logger = logging.getLogger(__name__)
+Overrun = Literal['skip', 'catch-up', 'coalesce']
+
+
+class PeriodicJob:
+    __slots__ = ('name', 'period', 'overrun')
+
+    def __init__(self, name: str, period: float, overrun: Overrun) -> None:
+        self.name = name
+        self.period = period
+        self.overrun = overrun
+
+
+def periodic(period: float, name: str | None = None, overrun: Overrun = 'skip'
+) -> Callable[[Callable[[Any], Awaitable[None]]], Callable[[Any], Awaitable[None]]]:
+    """Decorator for async runner methods (taking only self) that the lifespan calls every {period} seconds next to run().
+    When a call overruns past the next deadlines, {overrun} decides what happens to the missed ones:
+    'skip' waits for the next deadline, 'catch-up' makes every missed call right away,
+    'coalesce' makes a single call right away for all of them.
+    An exception raised by the method shuts the process down, like for run().
+    """
+    def decorator(method: Callable[[Any], Awaitable[None]]) -> Callable[[Any], Awaitable[None]]:
+        method._periodic = PeriodicJob(name or method.__name__, period, overrun)  # type: ignore[attr-defined]
+        return method
+
+    return decorator
+
+
+class JobStats:
+    __slots__ = ('period', 'calls', 'overruns', 'missed', 'last_jitter', 'max_jitter', 'last_duration', 'jitter', '_rescheduled')
+
+    def __init__(self, period: float) -> None:
+        self.period = period
+        self.calls = 0
+        self.overruns = 0  # calls that ended after the next deadline
+        self.missed = 0  # deadlines without a call of their own (skipped or coalesced)
+        self.last_jitter = 0.  # how late the last call started after its deadline
+        self.max_jitter = 0.
+        self.last_duration = 0.
+        self.jitter = Histogram()
+        self._rescheduled: anyio.CancelScope | None = None  # wakes up the job when its period changes
+
+
+    def as_dict(self) -> dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__[:-2]}
+
+
+class Periodic:
+    """Call the @periodic methods of a runner at their rates. Started by the runner lifespan."""
+
+    def __init__(self, runner: Any) -> None:
+        self.runner = runner
+        self.specs: dict[str, tuple[PeriodicJob, str]] = {}
+        for klass in reversed(type(runner).__mro__):
+            for attr, value in vars(klass).items():
+                spec = getattr(value, '_periodic', None)
+                if isinstance(spec, PeriodicJob):
+                    self.specs[spec.name] = (spec, attr)
+
+        self.jobs = {name: JobStats(spec.period) for name, (spec, _) in self.specs.items()}
+
+
+    def report(self) -> dict[str, dict[str, Any]]:
+        return {name: stats.as_dict() for name, stats in self.jobs.items()}
+
+
+    def set_period(self, name: str, period: float) -> None:
+        """Change the period of a job. The next call is due {period} seconds after the previous deadline,
+        or right away if that is already past, and the following calls keep the new rate from there."""
+        if period <= 0:
+            raise ValueError(f'The period must be positive, got {period}')
+        stats = self.jobs[name]
+        stats.period = period
+        if stats._rescheduled is not None:
+            stats._rescheduled.cancel()
+
+
+    async def run(self) -> None:
+        async with anyio.create_task_group() as tg:
+            for spec, attr in self.specs.values():
+                tg.start_soon(self._run_job, spec, getattr(self.runner, attr))
+
+
+    async def _run_job(self, spec: PeriodicJob, fn: Callable[[], Awaitable[None]]) -> None:
+        stats = self.jobs[spec.name]
+        deadline = anyio.current_time()  # the first call is right away
+        previous = deadline - stats.period
+
+        while True:
+            while True:
+                with anyio.CancelScope() as stats._rescheduled:
+                    await anyio.sleep_until(deadline)
+                if not stats._rescheduled.cancel_called:
+                    break
+                deadline = max(previous + stats.period, anyio.current_time())  # set_period() was called
+            stats._rescheduled = None
+
+            start = anyio.current_time()
+            jitter = start - deadline
+            stats.last_jitter = jitter
+            stats.max_jitter = max(stats.max_jitter, jitter)
+            stats.jitter.observe(jitter)
+            await fn()
+            end = anyio.current_time()
+            stats.last_duration = end - start
+            stats.calls += 1
+
+            previous = deadline
+            period = stats.period
+            deadline += period
+            if end > deadline:
+                stats.overruns += 1
+                passed = math.floor((end - previous) / period)  # deadlines that passed during the call
+                if spec.overrun == 'skip':
+                    deadline = previous + (passed + 1) * period
+                    stats.missed += passed
+                elif spec.overrun == 'coalesce':
+                    deadline = previous + passed * period
+                    stats.missed += passed - 1
+                logger.debug(f'Periodic job {spec.name} overran its period of {period}s by {end - start - period:.3f}s')
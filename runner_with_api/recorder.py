@@ -0,0 +1,339 @@
+"""
+Append-only recorder of the run() output: record() only buffers in memory, run() flushes the buffer
+to segment files from a thread, and time-range queries are streamed from the memory-mapped segments.
+
+A segment is a sequence of records: timestamp (float64 seconds), payload size (uint32), payload, little-endian.
+Its sidecar .idx file holds the (timestamp, offset) of a record every index_interval bytes, to seek by time.
+"""
+from __future__ import annotations
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_right
+from pathlib import Path
+from typing import AsyncIterator, Iterator
+
+import anyio
+
+
+
+logger = logging.getLogger(__name__)
+RECORD = struct.Struct('<dI')
+INDEX = struct.Struct('<dQ')
+
+
+class Segment:
+    """A segment file, its time range and its sparse time index."""
+    __slots__ = ('path', 'start', 'end', 'size', 'times', 'offsets', 'indexed')
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.start = 0.
+        self.end = 0.
+        self.size = 0
+        self.times: list[float] = []
+        self.offsets: list[int] = []
+        self.indexed = 0  # index entries already in the .idx file
+
+
+    @property
+    def index_path(self) -> Path:
+        return self.path.with_suffix('.idx')
+
+
+    def seek(self, t: float) -> int:
+        """Offset of an indexed record at or before the first record at {t}."""
+        i = bisect_right(self.times, t) - 1
+        while i > 0 and self.times[i] >= t:  # equal timestamps may span several index entries
+            i -= 1
+        return self.offsets[i] if i >= 0 else 0
+
+
+def _scan(view: memoryview, offset: int, end: int) -> Iterator[tuple[int, float, int]]:
+    """(offset, timestamp, payload size) of the complete records from {offset} to {end}."""
+    while offset + RECORD.size <= end:
+        t, size = RECORD.unpack_from(view, offset)
+        if offset + RECORD.size + size > end:
+            return
+        yield offset, t, size
+        offset += RECORD.size + size
+
+
+def _find(view: memoryview, offset: int, end: int, t: float, inclusive: bool) -> int:
+    """Offset of the first record from {offset} at or after {t} (after {t} if not {inclusive}), or {end}."""
+    for offset, timestamp, _ in _scan(view, offset, end):
+        if timestamp > t or (inclusive and timestamp == t):
+            return offset
+    return end
+
+
+def parse(data: bytes | memoryview) -> Iterator[tuple[float, memoryview]]:
+    """(timestamp, payload) of the records in {data}, e.g. the body of a Recorder.stream() response."""
+    view = memoryview(data)
+    for offset, t, size in _scan(view, 0, len(view)):
+        yield t, view[offset + RECORD.size:offset + RECORD.size + size]
+
+
+class Recorder:
+    """
+    Records of bytes with their timestamp, kept in segment files under {directory}.
+    A new segment starts once the current one holds {segment_size} bytes or spans {segment_duration} seconds.
+    Segments are deleted, oldest first, beyond {max_bytes} in total or once older than {max_age} seconds,
+    and consecutive segments smaller than half a segment_size are merged (compaction).
+    The run() method flushes the buffered records every {flush_interval} seconds,
+    or as soon as {max_buffer} records are buffered. ASGIRunner.lifespan starts it for the Recorder attributes of the runner.
+    """
+    def __init__(self, directory: str | os.PathLike,
+        segment_size=64 << 20,
+        segment_duration=3600.,
+        max_bytes: int | None = None,
+        max_age: float | None = None,
+        flush_interval=0.1,
+        max_buffer=10_000,
+        index_interval=64 << 10
+    ) -> None:
+        self.directory = Path(directory)
+        self.segment_size = segment_size
+        self.segment_duration = segment_duration
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.index_interval = index_interval
+        self.records = 0
+        self.bytes_written = 0
+        self.flushes = 0
+        self.deleted = 0
+        self.compactions = 0
+        self._buffer: list[tuple[float, bytes]] = []
+        self._flushing: list[tuple[float, bytes]] = []  # being written by the flushing thread
+        self._written = 0  # records of _flushing already in the segments
+        self._flush_needed: anyio.Event | None = None
+        self._lock = threading.Lock()  # between the flushing thread and the queries, around the segments list
+        self._sequence = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segments = [self._open(path) for path in sorted(self.directory.glob('*.seg'))]
+        self._last = self.segments[-1].end if self.segments else 0.
+
+
+    def record(self, data: bytes, timestamp: float | None = None) -> None:
+        """Buffer a record, timestamped now by default. Timestamps earlier than the last one are raised to it,
+        the records stay in time order."""
+        t = time.time() if timestamp is None else timestamp
+        if t < self._last:
+            t = self._last
+        self._last = t
+        self._buffer.append((t, data))
+        self.records += 1
+        if len(self._buffer) >= self.max_buffer and self._flush_needed is not None:
+            self._flush_needed.set()
+
+
+    async def run(self) -> None:
+        """Flush the buffered records forever, and a last time when cancelled."""
+        try:
+            while True:
+                self._flush_needed = anyio.Event()
+                with anyio.move_on_after(self.flush_interval):
+                    await self._flush_needed.wait()
+                await self.flush()
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.flush()
+
+
+    async def flush(self) -> None:
+        buffer, self._buffer = self._buffer, []
+        if buffer:
+            self._flushing, self._written = buffer, 0
+            try:
+                await anyio.to_thread.run_sync(self._flush, buffer)
+            finally:
+                self._flushing = []
+
+
+    def _flush(self, records: list[tuple[float, bytes]]) -> None:
+        segment = self.segments[-1] if self.segments else None
+        i = 0
+        while i < len(records):
+            t = records[i][0]
+            if segment is None or segment.size >= self.segment_size or t - segment.start >= self.segment_duration:
+                segment = self._new_segment(t)
+            i = self._append(segment, records, i)
+        self.flushes += 1
+        self._retain()
+        self._compact()
+
+
+    def _new_segment(self, t: float) -> Segment:
+        self._sequence += 1
+        segment = Segment(self.directory / f'{int(t * 1e9):020d}-{os.getpid()}-{self._sequence:06d}.seg')
+        segment.start = segment.end = t
+        with self._lock:
+            self.segments.append(segment)
+        return segment
+
+
+    def _append(self, segment: Segment, records: list[tuple[float, bytes]], i: int) -> int:
+        """Write the records from {i} to the segment until it is full, return the index of the first one left."""
+        chunks = []
+        first = i
+        offset = segment.size
+        next_index = segment.offsets[-1] + self.index_interval if segment.offsets else 0
+        while i < len(records) and offset < self.segment_size:
+            t, data = records[i]
+            if t - segment.start >= self.segment_duration and offset > 0:
+                break
+            if offset >= next_index:
+                segment.times.append(t)
+                segment.offsets.append(offset)
+                next_index = offset + self.index_interval
+            chunks.append(RECORD.pack(t, len(data)))
+            chunks.append(data)
+            offset += RECORD.size + len(data)
+            segment.end = t
+            i += 1
+
+        with open(segment.path, 'ab') as f:
+            f.writelines(chunks)
+        with open(segment.index_path, 'ab') as f:
+            f.writelines(INDEX.pack(t, o) for t, o in zip(segment.times[segment.indexed:], segment.offsets[segment.indexed:]))
+        segment.indexed = len(segment.times)
+        self.bytes_written += offset - segment.size
+        with self._lock:
+            segment.size = offset
+            self._written += i - first
+        return i
+
+
+    def _retain(self) -> None:
+        now = time.time()
+        while len(self.segments) > 1:
+            oldest = self.segments[0]
+            total = sum(segment.size for segment in self.segments)
+            if not ((self.max_bytes is not None and total > self.max_bytes)
+                or (self.max_age is not None and oldest.end < now - self.max_age)):
+                return
+            with self._lock:
+                self.segments.pop(0)
+                oldest.path.unlink(missing_ok=True)  # mapped by a query, the file stays readable until unmapped
+                oldest.index_path.unlink(missing_ok=True)
+            self.deleted += 1
+
+
+    def _compact(self) -> None:
+        """Merge the consecutive closed segments that are smaller than half a segment_size together."""
+        i = 0
+        while i < len(self.segments) - 2:  # the last one is still written
+            first, second = self.segments[i], self.segments[i + 1]
+            if first.size + second.size > self.segment_size // 2:
+                i += 1
+                continue
+
+            merged = Segment(first.path)
+            merged.start, merged.end, merged.size = first.start, second.end, first.size + second.size
+            merged.times = first.times + second.times
+            merged.offsets = first.offsets + [offset + first.size for offset in second.offsets]
+            merged.indexed = len(merged.times)
+            tmp = first.path.with_suffix('.tmp')
+            with open(tmp, 'wb') as f:
+                f.write(first.path.read_bytes())
+                f.write(second.path.read_bytes())
+            tmp_index = first.path.with_suffix('.idx.tmp')
+            tmp_index.write_bytes(b''.join(INDEX.pack(t, o) for t, o in zip(merged.times, merged.offsets)))
+
+            with self._lock:
+                os.replace(tmp, merged.path)
+                os.replace(tmp_index, merged.index_path)
+                second.path.unlink(missing_ok=True)
+                second.index_path.unlink(missing_ok=True)
+                self.segments[i:i + 2] = [merged]
+            self.compactions += 1
+
+
+    def _open(self, path: Path) -> Segment:
+        """Segment of an existing file, its index reloaded and its last incomplete record (if any) cut.
+        Only the records after the last index entry are read, to find the end of the segment."""
+        segment = Segment(path)
+        file_size = path.stat().st_size
+        if segment.index_path.exists():
+            index = segment.index_path.read_bytes()
+            for t, offset in INDEX.iter_unpack(index[:len(index) - len(index) % INDEX.size]):
+                if offset < file_size:
+                    segment.times.append(t)
+                    segment.offsets.append(offset)
+
+        tail_offset = segment.offsets[-1] if segment.offsets else 0
+        with open(path, 'rb') as f:
+            f.seek(tail_offset)
+            tail = memoryview(f.read())
+        next_index = tail_offset + self.index_interval
+        for offset, t, size in _scan(tail, 0, len(tail)):
+            offset += tail_offset
+            if offset >= next_index:  # lost from the index, rebuilt
+                segment.times.append(t)
+                segment.offsets.append(offset)
+                next_index = offset + self.index_interval
+            segment.end = t
+            segment.size = offset + RECORD.size + size
+        if not segment.offsets and segment.size:
+            segment.times.append(RECORD.unpack_from(tail, 0)[0])
+            segment.offsets.append(0)
+        segment.start = segment.times[0] if segment.times else 0.
+        if segment.size < file_size:
+            logger.warning(f'Cutting the incomplete last record of {path}')
+            os.truncate(path, segment.size)
+        segment.index_path.write_bytes(b''.join(INDEX.pack(t, o) for t, o in zip(segment.times, segment.offsets)))
+        segment.indexed = len(segment.times)
+        return segment
+
+
+    def _mapped(self, start: float, end: float) -> tuple[list[tuple[Segment, memoryview]], list[tuple[float, bytes]]]:
+        """Segments mapped up to their written size, and the records not written yet."""
+        with self._lock:
+            mapped = []
+            for segment in self.segments:
+                if segment.size and segment.start <= end and segment.end >= start:
+                    with open(segment.path, 'rb') as f:
+                        mapped.append((segment, memoryview(mmap.mmap(f.fileno(), segment.size, access=mmap.ACCESS_READ))))
+            return mapped, self._flushing[self._written:] + self._buffer
+
+
+    @staticmethod
+    def _bounds(segment: Segment, view: memoryview, start: float, end: float) -> tuple[int, int]:
+        """Offsets of the first record at or after {start} and of the first one after {end} in the mapped segment."""
+        return (_find(view, segment.seek(start), len(view), start, inclusive=True),
+            _find(view, segment.seek(end), len(view), end, inclusive=False))
+
+
+    def read(self, start=float('-inf'), end=float('inf')) -> Iterator[tuple[float, memoryview]]:
+        """(timestamp, payload) of the records from {start} to {end} included, the written payloads mapped without copy."""
+        mapped, pending = self._mapped(start, end)
+        for segment, view in mapped:
+            for offset, t, size in _scan(view, segment.seek(start), len(view)):
+                if t > end:
+                    break
+                if t >= start:
+                    yield t, view[offset + RECORD.size:offset + RECORD.size + size]
+        for t, data in pending:
+            if start <= t <= end:
+                yield t, memoryview(data)
+
+
+    async def stream(self, start=float('-inf'), end=float('inf'), chunk_size=1 << 16) -> AsyncIterator[bytes]:
+        """Records from {start} to {end} included, in the segment format, as chunks of about {chunk_size} bytes.
+        The flushed records are sliced from the mapped segments, only the first and last index intervals are scanned,
+        followed by the records not written yet. The mapped pages are read from a thread, not on the event loop."""
+        mapped, pending = await anyio.to_thread.run_sync(self._mapped, start, end)
+        for segment, view in mapped:
+            first, last = await anyio.to_thread.run_sync(self._bounds, segment, view, start, end)
+            for offset in range(first, last, chunk_size):
+                chunk_end = min(offset + chunk_size, last)
+                yield await anyio.to_thread.run_sync(bytes, view[offset:chunk_end])  # ASGI servers take bytes, one copy
+
+        pending_chunk = b''.join(RECORD.pack(t, len(data)) + data for t, data in pending if start <= t <= end)
+        if pending_chunk:
+            yield pending_chunk
@@ -0,0 +1,125 @@
+"""
+Response cache of the read-only runner handlers: the serialized response is kept per state version of the runner,
+so that it is only recomputed once the state changed, and clients holding the current ETag get a 304.
+"""
+from __future__ import annotations
+import hashlib
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from .state import VersionedState
+
+
+
+class CachePolicy:
+    __slots__ = ('version', 'maxsize')
+
+    def __init__(self, version: str | Callable[[Any], Hashable], maxsize: int) -> None:
+        self.version = version
+        self.maxsize = maxsize
+
+
+def cached(version: str | Callable[[Any], Hashable], maxsize=128) -> Callable[[Callable], Callable]:
+    """Decorator for the GET handlers of a runner, placed below the route decorator (@get or @runner_router.get).
+    {version} is the name of a runner attribute, or a function of the runner, giving the version of the state
+    the handler reads: a VersionedState attribute gives its committed version.
+    Responses are kept for the current version of the state, per path, query string and Accept header,
+    up to the {maxsize} most recently used.
+    """
+    def decorator(fn: Callable) -> Callable:
+        fn._cached = CachePolicy(version, maxsize)  # type: ignore[attr-defined]
+        return fn
+
+    return decorator
+
+
+class _Entry:
+    __slots__ = ('status', 'headers', 'body')
+
+    def __init__(self, status: int, headers: list[tuple[bytes, bytes]], body: bytes) -> None:
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class ResponseCache:
+    """Cache of one handler bound to a runner, as an ASGI middleware of its route (see middleware())."""
+
+    def __init__(self, policy: CachePolicy, runner: Any) -> None:
+        self.policy = policy
+        self.runner = runner
+        self.entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+
+    def version(self) -> Hashable:
+        version = self.policy.version
+        value = getattr(self.runner, version) if isinstance(version, str) else version(self.runner)
+        if isinstance(value, VersionedState):
+            return value.snapshot().version
+        return value
+
+
+    @staticmethod
+    def etag(key: tuple) -> bytes:
+        return b'"' + hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest().encode() + b'"'
+
+
+    @staticmethod
+    def matches(if_none_match: bytes, etag: bytes) -> bool:
+        for tag in if_none_match.split(b','):
+            tag = tag.strip()
+            if tag == b'*' or tag.removeprefix(b'W/') == etag:
+                return True
+        return False
+
+
+    def middleware(self, app: Callable) -> Callable:
+        """ASGI middleware answering the GET requests from the cache, and with 304 if the client has the current ETag."""
+        async def response_cache(scope: dict, receive: Callable, send: Callable) -> None:
+            if scope['type'] != 'http' or scope['method'] != 'GET':
+                return await app(scope, receive, send)
+
+            headers = dict(scope['headers'])
+            key = (self.version(), scope['path'], scope['query_string'], headers.get(b'accept'))
+            etag = self.etag(key)
+            if self.matches(headers.get(b'if-none-match', b''), etag):
+                self.not_modified += 1
+                await send({'type': 'http.response.start', 'status': 304, 'headers': [(b'etag', etag)]})
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                await send({'type': 'http.response.start', 'status': entry.status, 'headers': entry.headers})
+                await send({'type': 'http.response.body', 'body': entry.body})
+                return
+
+            self.misses += 1
+            start: dict | None = None
+
+            async def store(message: dict) -> None:
+                nonlocal start
+                if message['type'] == 'http.response.start' and message['status'] == 200:
+                    message = start = {**message, 'headers': [*message.get('headers', []), (b'etag', etag)]}
+                elif message['type'] == 'http.response.body' and start is not None:
+                    if not message.get('more_body', False):  # streamed responses are not cached
+                        self._put(key, _Entry(start['status'], start['headers'], bytes(message.get('body', b''))))
+                    start = None
+                await send(message)
+
+            await app(scope, receive, store)
+
+        return response_cache
+
+
+    def _put(self, key: tuple, entry: _Entry) -> None:
+        self.entries[key] = entry
+        if len(self.entries) > self.policy.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
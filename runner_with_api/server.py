@@ -0,0 +1,18 @@
+from __future__ import annotations
+from typing import Any
+
+import uvicorn
+
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server draining the runner before waiting for the open connections (which include the parked long-polls)."""
+
+    def __init__(self, runner: Any, config: uvicorn.Config) -> None:
+        super().__init__(config)
+        self.runner = runner
+
+
+    async def shutdown(self, sockets=None) -> None:
+        await self.runner.drain()
+        await super().shutdown(sockets)
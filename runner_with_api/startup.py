@@ -0,0 +1,108 @@
+"""
+Staged initialization: besides init(), a runner can declare named init steps that run concurrently.
+Steps run before the app serves requests, unless they are warmups which run in the background:
+the app is then live (/live) right away but only ready (/ready) once the warmups are done.
+"""
+from __future__ import annotations
+import logging
+from graphlib import TopologicalSorter
+from typing import Any, Awaitable, Callable, Iterable
+
+import anyio
+
+
+
+logger = logging.getLogger(__name__)
+
+
+class InitStep:
+    __slots__ = ('name', 'after', 'warmup')
+
+    def __init__(self, name: str, after: tuple[str, ...], warmup: bool) -> None:
+        self.name = name
+        self.after = after
+        self.warmup = warmup
+
+
+def init_step(name: str | None = None, after: Iterable[str] = (), warmup=False
+) -> Callable[[Callable[[Any], Awaitable[None]]], Callable[[Any], Awaitable[None]]]:
+    """Decorator for async runner methods (taking only self) run by the lifespan after init(),
+    concurrently with the other steps, once the steps named in {after} are done.
+    With {warmup}, the step runs in the background while the app already serves requests.
+    """
+    def decorator(method: Callable[[Any], Awaitable[None]]) -> Callable[[Any], Awaitable[None]]:
+        method._init_step = InitStep(name or method.__name__, tuple(after), warmup)  # type: ignore[attr-defined]
+        return method
+
+    return decorator
+
+
+class StepStatus:
+    __slots__ = ('state', 'duration', 'done')
+
+    def __init__(self) -> None:
+        self.state = 'pending'  # running or done
+        self.duration: float | None = None
+        self.done: anyio.Event | None = None  # created by Startup.run, within the event loop
+
+
+    def as_dict(self) -> dict[str, Any]:
+        return {'state': self.state, 'duration': self.duration}
+
+
+class Startup:
+    """Run the @init_step methods of a runner in dependency order. Started by the runner lifespan."""
+
+    def __init__(self, runner: Any) -> None:
+        self.runner = runner
+        self.steps: dict[str, tuple[InitStep, str]] = {}
+        for klass in reversed(type(runner).__mro__):
+            for attr, value in vars(klass).items():
+                step = getattr(value, '_init_step', None)
+                if isinstance(step, InitStep):
+                    self.steps[step.name] = (step, attr)
+
+        for step, _ in self.steps.values():
+            for dependency in step.after:
+                if dependency not in self.steps:
+                    raise ValueError(f'Init step {step.name} runs after unknown step {dependency}')
+                if self.steps[dependency][0].warmup and not step.warmup:
+                    raise ValueError(f'Init step {step.name} cannot run after the warmup {dependency}')
+        tuple(TopologicalSorter({name: step.after for name, (step, _) in self.steps.items()}).static_order())  # raise CycleError
+
+        self.status = {name: StepStatus() for name in self.steps}
+
+
+    @property
+    def ready(self) -> bool:
+        return all(status.state == 'done' for status in self.status.values())
+
+
+    def report(self) -> dict[str, dict[str, Any]]:
+        return {name: status.as_dict() for name, status in self.status.items()}
+
+
+    async def run(self, warmup: bool) -> None:
+        """Run the steps (warmup=False) or the warmups (warmup=True) concurrently."""
+        for status in self.status.values():
+            if status.done is None:
+                status.done = anyio.Event()
+
+        async with anyio.create_task_group() as tg:
+            for step, attr in self.steps.values():
+                if step.warmup == warmup:
+                    tg.start_soon(self._run_step, step, getattr(self.runner, attr))
+
+
+    async def _run_step(self, step: InitStep, fn: Callable[[], Awaitable[None]]) -> None:
+        status = self.status[step.name]
+        for dependency in step.after:
+            await self.status[dependency].done.wait()  # type: ignore[union-attr]
+
+        status.state = 'running'
+        start = anyio.current_time()
+        await fn()
+        status.duration = anyio.current_time() - start
+        status.state = 'done'
+        status.done.set()  # type: ignore[union-attr]
+        logger.info(f'Init step {step.name} done in {status.duration:.3f}s')
@@ -0,0 +1,155 @@
+"""
+Versioned state shared between the API handlers (writers) and run() (reader), e.g. the configuration of a device.
+Bursts of writes are coalesced into a single commit, and waiters are only woken when the keys they watch changed.
+"""
+from __future__ import annotations
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping
+
+import anyio
+
+
+
+class VersionConflict(Exception):
+    """The state was written since the version given to compare-and-set."""
+
+    def __init__(self, expected: int, version: int) -> None:
+        super().__init__(f'Expected version {expected}, the state is at version {version}')
+        self.expected = expected
+        self.version = version
+
+
+class Snapshot:
+    """Immutable view of the state at a version. Taking one is O(1), the values are replaced, never mutated, on commit."""
+    __slots__ = ('version', 'values')
+
+    def __init__(self, version: int, values: Mapping[str, Any]) -> None:
+        self.version = version
+        self.values = values
+
+
+    def __getitem__(self, key: str) -> Any:
+        return self.values[key]
+
+
+class _Watch:
+    __slots__ = ('keys', 'event')
+
+    def __init__(self, keys: frozenset[str] | None) -> None:
+        self.keys = keys
+        self.event = anyio.Event()
+
+
+class VersionedState:
+    """
+    Key/value state with a version incremented by each write.
+    Writes within {debounce} seconds of each other are merged and committed together once the writes pause,
+    or after {max_delay} seconds of continuous writes. With debounce=0 each write is committed right away.
+    The run() method commits the coalesced writes, ASGIRunner.lifespan starts it for the VersionedState attributes of the runner.
+    """
+    def __init__(self, initial: Mapping[str, Any] | None = None, debounce=0., max_delay: float | None = None) -> None:
+        self.debounce = debounce
+        self.max_delay = max_delay if max_delay is not None else debounce * 10
+        self.version = 0  # of the last write, committed or not
+        self.key_versions: dict[str, int] = {}  # version of the commit that last changed each key
+        self.writes = 0
+        self.commits = 0
+        self._committed = Snapshot(0, MappingProxyType(dict(initial or {})))
+        self._pending: dict[str, Any] = {}
+        self._first_write = 0.
+        self._last_write = 0.
+        self._written: anyio.Event | None = None
+        self._watches: set[_Watch] = set()
+
+
+    def snapshot(self) -> Snapshot:
+        """The committed state, for run() to read a consistent set of values."""
+        return self._committed
+
+
+    def latest(self) -> Snapshot:
+        """The state including the writes not committed yet, for the handlers reading before a compare-and-set."""
+        if not self._pending:
+            return Snapshot(self.version, self._committed.values)
+        return Snapshot(self.version, MappingProxyType({**self._committed.values, **self._pending}))
+
+
+    def update(self, values: Mapping[str, Any], expected_version: int | None = None) -> int:
+        """Write {values} and return the new version.
+        With {expected_version}, raise VersionConflict if the state was written since that version (compare-and-set)."""
+        if expected_version is not None and expected_version != self.version:
+            raise VersionConflict(expected_version, self.version)
+
+        self.version += 1
+        self.writes += 1
+        if not self.debounce:
+            self._pending.update(values)
+            self.commit()
+            return self.version
+
+        self._last_write = anyio.current_time()
+        if not self._pending:
+            self._first_write = self._last_write
+        self._pending.update(values)
+        if self._written is not None:
+            self._written.set()
+        return self.version
+
+
+    def commit(self) -> None:
+        """Apply the pending writes. Waiters are woken if a value they watch actually changed."""
+        values = self._committed.values
+        changed = frozenset(key for key, value in self._pending.items() if key not in values or values[key] != value)
+        if changed:
+            values = MappingProxyType({**values, **self._pending})
+            for key in changed:
+                self.key_versions[key] = self.version
+        self._pending.clear()
+        self._committed = Snapshot(self.version, values)
+        self.commits += 1
+
+        if changed and self._watches:
+            for watch in [watch for watch in self._watches if watch.keys is None or watch.keys & changed]:
+                self._watches.discard(watch)
+                watch.event.set()
+
+
+    def changed_since(self, version: int, keys: Iterable[str] | None = None) -> bool:
+        if keys is None:
+            return any(v > version for v in self.key_versions.values())
+        return any(self.key_versions.get(key, 0) > version for key in keys)
+
+
+    async def wait_changed(self, keys: Iterable[str] | None = None, since: int | None = None) -> Snapshot:
+        """Wait until a commit changes one of {keys} (any key by default) after version {since}
+        (the committed version by default), and return the committed snapshot."""
+        keys = frozenset(keys) if keys is not None else None
+        since = self._committed.version if since is None else since
+        while not self.changed_since(since, keys):
+            watch = _Watch(keys)
+            self._watches.add(watch)
+            try:
+                await watch.event.wait()
+            finally:
+                self._watches.discard(watch)
+        return self._committed
+
+
+    async def run(self) -> None:
+        """Commit the coalesced writes forever."""
+        if not self.debounce:
+            return
+
+        while True:
+            self._written = anyio.Event()
+            if not self._pending:
+                await self._written.wait()
+
+            while True:
+                now = anyio.current_time()
+                delay = min(self._last_write + self.debounce, self._first_write + self.max_delay) - now
+                if delay <= 0:
+                    break
+                await anyio.sleep(delay)
+
+            self.commit()
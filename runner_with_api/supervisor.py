@@ -0,0 +1,121 @@
+"""
+Supervised long running tasks: besides run(), a runner can declare named tasks with their own restart policy,
+so that a crashing loop is restarted on its own instead of shutting down the whole process.
+"""
+from __future__ import annotations
+import logging
+from typing import Any, Awaitable, Callable, Literal
+
+import anyio
+
+
+
+logger = logging.getLogger(__name__)
+Restart = Literal['always', 'on-failure', 'never']
+
+
+class RestartPolicy:
+    __slots__ = ('name', 'restart', 'backoff', 'max_backoff', 'max_restarts', 'reset_after')
+
+    def __init__(self, name: str, restart: Restart, backoff: float, max_backoff: float,
+        max_restarts: int | None, reset_after: float
+    ) -> None:
+        self.name = name
+        self.restart = restart
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_restarts = max_restarts
+        self.reset_after = reset_after
+
+
+def supervised(name: str | None = None, restart: Restart = 'on-failure', backoff=0.01, max_backoff=10.,
+    max_restarts: int | None = None, reset_after=60.
+) -> Callable[[Callable[[Any], Awaitable[None]]], Callable[[Any], Awaitable[None]]]:
+    """Decorator for async runner methods (taking only self) that the lifespan runs next to run().
+    On exit, the task is restarted according to {restart}: 'always', only after an exception ('on-failure') or 'never'.
+    Restarts wait {backoff} seconds, doubled after each consecutive crash up to {max_backoff},
+    and reset once the task ran for {reset_after} seconds. After {max_restarts} crashes the task is given up.
+    """
+    def decorator(method: Callable[[Any], Awaitable[None]]) -> Callable[[Any], Awaitable[None]]:
+        method._supervised = RestartPolicy(  # type: ignore[attr-defined]
+            name or method.__name__, restart, backoff, max_backoff, max_restarts, reset_after)
+        return method
+
+    return decorator
+
+
+class TaskHealth:
+    __slots__ = ('state', 'starts', 'crashes', 'last_error', 'last_start')
+
+    def __init__(self) -> None:
+        self.state = 'pending'  # running, backoff, stopped (returned) or failed (given up)
+        self.starts = 0
+        self.crashes = 0
+        self.last_error: str | None = None
+        self.last_start: float | None = None
+
+
+    def as_dict(self) -> dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Supervisor:
+    """Run and restart the @supervised methods of a runner. Started by the runner lifespan."""
+
+    def __init__(self, runner: Any) -> None:
+        self.runner = runner
+        self.policies: dict[str, tuple[RestartPolicy, str]] = {}
+        for klass in reversed(type(runner).__mro__):
+            for attr, value in vars(klass).items():
+                policy = getattr(value, '_supervised', None)
+                if isinstance(policy, RestartPolicy):
+                    self.policies[policy.name] = (policy, attr)
+
+        self.tasks = {name: TaskHealth() for name in self.policies}
+
+
+    @property
+    def healthy(self) -> bool:
+        return all(health.state != 'failed' for health in self.tasks.values())
+
+
+    def health(self) -> dict[str, dict[str, Any]]:
+        return {name: health.as_dict() for name, health in self.tasks.items()}
+
+
+    async def run(self) -> None:
+        async with anyio.create_task_group() as tg:
+            for policy, attr in self.policies.values():
+                tg.start_soon(self._supervise, policy, getattr(self.runner, attr))
+
+
+    async def _supervise(self, policy: RestartPolicy, fn: Callable[[], Awaitable[None]]) -> None:
+        health = self.tasks[policy.name]
+        backoff = policy.backoff
+
+        while True:
+            health.state = 'running'
+            health.starts += 1
+            health.last_start = started = anyio.current_time()
+            try:
+                await fn()
+            except Exception as e:
+                health.crashes += 1
+                health.last_error = repr(e)
+                logger.exception(f'Supervised task {policy.name} crashed ({health.crashes} crashes)')
+
+                if policy.restart == 'never' or (policy.max_restarts is not None and health.crashes > policy.max_restarts):
+                    logger.error(f'Supervised task {policy.name} given up')
+                    health.state = 'failed'
+                    return
+            else:
+                if policy.restart != 'always':
+                    health.state = 'stopped'
+                    return
+
+            if anyio.current_time() - started >= policy.reset_after:
+                backoff = policy.backoff
+
+            health.state = 'backoff'
+            await anyio.sleep(backoff)
+            backoff = min(backoff * 2, policy.max_backoff)
@@ -1,8 +1,15 @@
 from __future__ import annotations
+import inspect
+import itertools
+import json
+import math
+import random
 from collections import deque
-from typing import AsyncGenerator, Awaitable, Deque, Generic, TypeVar
+from typing import Any, AsyncGenerator, AsyncIterable, Awaitable, Callable, Deque, Generic, Hashable, Iterable, TypeVar
 import anyio
 
+from .encoding import JSON, Encoding
+
 
 
 T = TypeVar('T')
@@ -14,6 +21,13 @@ class AnyioDeque(Generic[T]):
     def __init__(self, maxlen: int) -> None:
         self.deque: Deque[T] = deque(maxlen=maxlen)
         self.condition = anyio.Condition()
+        self.parked: list[anyio.Event] = []
+
+
+    @property
+    def waiters(self) -> int:
+        """Number of consumers parked waiting for an item."""
+        return len(self.parked)
 
 
     async def put(self, data: T) -> None:
@@ -21,40 +35,538 @@ class AnyioDeque(Generic[T]):
         Does not really block, but needs to be async for the internal synchronization primitives."""
         async with self.condition:
             self.deque.append(data)
-            self.condition.notify_all()
+            self._wake()
+
+
+    async def put_many(self, items: Iterable[T]) -> None:
+        """Extend the internal deque with all items under a single lock acquisition and wakeup.
+        If maxlen is reached, the oldest items are removed."""
+        async with self.condition:
+            self.deque.extend(items)
+            self._wake()
+
+
+    def put_nowait(self, data: T) -> None:
+        """Synchronous put. Does not touch the lock, only wakes the parked consumers if any."""
+        self.deque.append(data)
+        self._wake()
+
+
+    def put_many_nowait(self, items: Iterable[T]) -> None:
+        """Synchronous put_many. Does not touch the lock, only wakes the parked consumers if any."""
+        self.deque.extend(items)
+        self._wake()
+
+
+    def _wake(self) -> None:
+        if self.parked:
+            for event in self.parked:
+                event.set()
+            self.parked.clear()
+
+
+    async def _wait(self) -> None:
+        """Release the lock until woken by a producer, then re-acquire it.
+        Unlike anyio.Condition.wait(), the waiter is registered synchronously right after the caller
+        found the deque empty, so a put_nowait() cannot slip in between and get lost."""
+        event = anyio.Event()
+        self.parked.append(event)
+        self.condition.release()
+        try:
+            await event.wait()
+        finally:
+            if not event.is_set():
+                self.parked.remove(event)
+            with anyio.CancelScope(shield=True):
+                await self.condition.acquire()
 
 
     async def get(self) -> T:
         """Popleft from the internal deque. Wait for producer if deque is empty."""
         async with self.condition:
             while not self.deque:
-                await self.condition.wait()
+                await self._wait()
 
             data = self.deque.popleft()
             return data
 
 
+    def get_nowait(self) -> T:
+        """Popleft from the internal deque without waiting.
+        Raises anyio.WouldBlock if the deque is empty."""
+        if not self.deque:
+            raise anyio.WouldBlock
+        return self.deque.popleft()
+
+
+    async def get_many(self, max_items: int | None = None, timeout: float | None = None) -> list[T]:
+        """Wait until at least one item is available, then popleft up to {max_items} items
+        (all of them if None) in a single lock acquisition.
+        Returns an empty list if nothing arrived within {timeout} seconds."""
+        if self.deque:
+            return self._popleft_many(max_items)
+
+        with anyio.move_on_after(timeout):
+            async with self.condition:
+                while not self.deque:
+                    await self._wait()
+
+                return self._popleft_many(max_items)
+        return []
+
+
+    def drain(self) -> list[T]:
+        """Popleft everything currently buffered without waiting."""
+        return self._popleft_many(None)
+
+
+    def _popleft_many(self, max_items: int | None) -> list[T]:
+        if max_items is None or max_items >= len(self.deque):
+            items = list(self.deque)
+            self.deque.clear()
+            return items
+
+        return [self.deque.popleft() for _ in range(max_items)]
+
+
+    def __aiter__(self) -> AnyioDeque[T]:
+        return self
+
+
+    async def __anext__(self) -> T:
+        return await self.get()
+
+
+class AnyioBroadcast(Generic[T]):
+    """
+    Ring buffer for a single producer and many consumers.
+    Every item is stored once, each subscriber reads it through its own cursor.
+    Items are addressed by a monotonic sequence number, the oldest are overwritten when maxlen is reached.
+    """
+    def __init__(self, maxlen: int) -> None:
+        self.maxlen = maxlen
+        self.buffer: list[T | None] = [None] * maxlen
+        self.seq = 0  # sequence number of the next published item
+        self.parked: set[Subscription[T]] = set()
+
+
+    @property
+    def oldest(self) -> int:
+        """Sequence number of the oldest item still in the buffer."""
+        return max(0, self.seq - self.maxlen)
+
+
+    def publish(self, data: T) -> int:
+        """Store the item and wake the parked subscribers, which are exactly the ones now behind.
+        Returns the sequence number of the item."""
+        seq = self.seq
+        self.buffer[seq % self.maxlen] = data
+        self.seq = seq + 1
+        self._wake()
+        return seq
+
+
+    def publish_many(self, items: Iterable[T]) -> None:
+        """Store all items with a single wakeup of the parked subscribers."""
+        for data in items:
+            self.buffer[self.seq % self.maxlen] = data
+            self.seq += 1
+        self._wake()
+
+
+    async def put(self, data: T) -> None:
+        """Same as publish(), for interchangeability with AnyioDeque."""
+        self.publish(data)
+
+
+    def _wake(self) -> None:
+        if self.parked:
+            for subscription in self.parked:
+                subscription.event.set()
+            self.parked.clear()
+
+
+    def subscribe(self, start: int | None = None) -> Subscription[T]:
+        """Create a read cursor. By default it only sees items published from now on.
+        Pass {start} to resume from a known sequence number (e.g. the last one received + 1)."""
+        return Subscription(self, self.seq if start is None else min(start, self.seq))
+
+
+class Subscription(Generic[T]):
+    """Read cursor over an AnyioBroadcast. Holds no copy of the items."""
+    __slots__ = ('broadcast', 'cursor', 'dropped', 'event')
+
+    def __init__(self, broadcast: AnyioBroadcast[T], cursor: int) -> None:
+        self.broadcast = broadcast
+        self.cursor = cursor  # sequence number of the next item to read
+        self.dropped = 0  # items overwritten before this subscriber could read them
+        self.event = anyio.Event()
+
+
+    @property
+    def lag(self) -> int:
+        """Number of buffered items not yet read."""
+        return self.broadcast.seq - max(self.cursor, self.broadcast.oldest)
+
+
+    def get_nowait(self) -> T:
+        """Read the next item. Raises anyio.WouldBlock if there is none."""
+        broadcast = self.broadcast
+        if self.cursor < broadcast.oldest:
+            self.dropped += broadcast.oldest - self.cursor
+            self.cursor = broadcast.oldest
+
+        if self.cursor >= broadcast.seq:
+            raise anyio.WouldBlock
+
+        data = broadcast.buffer[self.cursor % broadcast.maxlen]
+        self.cursor += 1
+        return data  # type: ignore[return-value]
+
+
+    async def _wait(self) -> None:
+        while self.cursor >= self.broadcast.seq:
+            self.event = anyio.Event()
+            self.broadcast.parked.add(self)
+            try:
+                await self.event.wait()
+            finally:
+                self.broadcast.parked.discard(self)
+
+
+    async def get(self) -> T:
+        """Read the next item. Wait for the producer if this subscriber is caught up."""
+        await self._wait()
+        return self.get_nowait()
+
+
+    async def get_many(self, max_items: int | None = None, timeout: float | None = None) -> list[T]:
+        """Wait until at least one item is available, then read up to {max_items} items (all if None).
+        Returns an empty list if nothing arrived within {timeout} seconds."""
+        with anyio.move_on_after(timeout):
+            await self._wait()
+
+        items = []
+        while max_items is None or len(items) < max_items:
+            try:
+                items.append(self.get_nowait())
+            except anyio.WouldBlock:
+                break
+        return items
+
+
+    def __aiter__(self) -> Subscription[T]:
+        return self
+
+
+    async def __anext__(self) -> T:
+        return await self.get()
+
+
+_NO_VALUE: Any = object()
+
+
+class Serialized(bytes):
+    """Payload that is already serialized in {media_type}, as sent (binary encodings are framed).
+    LongPollingResponse writes it as is if the client negotiated that media type, see encoded() otherwise.
+    A {key} identifying the content (e.g. a state version) lets Compression compress it once for all the clients."""
+    key: Hashable | None = None
+    media_type = JSON
+
+    def __new__(cls, payload: bytes = b'', key: Hashable | None = None, media_type: str = JSON, value: Any = _NO_VALUE) -> Serialized:
+        self = super().__new__(cls, payload)
+        self.key = key
+        self.media_type = media_type
+        self.value = value
+        self.variants: dict[str, Serialized] = {}
+        return self
+
+
+    def encoded(self, encoding: Encoding) -> Serialized:
+        """The payload in the {encoding}: itself if of the same media type, otherwise the value (or the decoded JSON)
+        encoded once, the other requests sharing this payload reuse it."""
+        if encoding.media_type == self.media_type:
+            return self
+        variant = self.variants.get(encoding.media_type)
+        if variant is None:
+            value = self.value
+            if value is _NO_VALUE:
+                if self.media_type != JSON:
+                    raise ValueError(f'Cannot re-encode a {self.media_type} payload without its value')
+                value = json.loads(self)
+            key = None if self.key is None else (self.key, encoding.media_type)
+            variant = self.variants[encoding.media_type] = Serialized(encoding.encode(value), key, encoding.media_type, value)
+        return variant
+
+
+_payload_keys = itertools.count()  # unique per process, unlike id()
+
+
+class _Generation:
+    __slots__ = ('event', 'payload', 'waiters')
+
+    def __init__(self) -> None:
+        self.event = anyio.Event()
+        self.payload = Serialized()
+        self.waiters = 0
+
+
+class ResultSlot(Generic[T]):
+    """
+    Shared "next result" for many long-polls waiting on the same value.
+    The value is serialized once per set() and the same bytes object is handed to every waiter,
+    and once more per other encoding negotiated by the waiters (see Serialized.encoded()).
+    """
+    def __init__(self, serialize: Callable[[T], bytes]) -> None:
+        """{serialize} is normally LongPollingResponse.serialize of the adapter in use."""
+        self.serialize = serialize
+        self.generation = _Generation()
+        self.published = 0  # number of set() calls
+        self.serializations = 0  # set() calls that had waiters, hence were serialized
+        self.fanout = 0  # waiters served in total
+
+
+    @property
+    def hits(self) -> int:
+        """Waiters served without a serialization of their own."""
+        return self.fanout - self.serializations
+
+
+    @property
+    def waiting(self) -> int:
+        return self.generation.waiters
+
+
+    async def wait(self) -> Serialized:
+        """Wait for the next set() and return its serialized value."""
+        generation = self.generation
+        generation.waiters += 1
+        try:
+            await generation.event.wait()
+        except BaseException:
+            generation.waiters -= 1
+            raise
+        return generation.payload
+
+
+    def set(self, value: T) -> None:
+        """Publish the value to the current waiters. Nothing is serialized if nobody is waiting."""
+        generation = self.generation
+        self.generation = _Generation()
+        self.published += 1
+
+        if generation.waiters:
+            generation.payload = Serialized(self.serialize(value), next(_payload_keys), value=value)
+            self.serializations += 1
+            self.fanout += generation.waiters
+        generation.event.set()
+
+
 T1 = TypeVar('T1')
 T2 = TypeVar('T2')
 
-async def http_long_polling(func: Awaitable[T1], keepalive_yield: T2, keepalive_period=1.
+class _Waiter:
+    __slots__ = ('event', 'result', 'done')
+
+    def __init__(self) -> None:
+        self.event = anyio.Event()
+        self.result = None
+        self.done = False
+
+
+class KeepaliveScheduler:
+    """
+    Single ticker for the keepalives of all parked long-polls, instead of a timer per connection.
+    Every {period} seconds all idle waiters are woken in one batch.
+    The run() method must be running, ASGIRunner.lifespan starts it for ASGIRunner.keepalive_scheduler.
+    """
+    def __init__(self, period=1.) -> None:
+        self.period = period
+        self.wait_histogram: Any = None  # optional metrics.Histogram of the time until the result
+        self.waiters: set[_Waiter] = set()
+        self.has_waiters = anyio.Event()
+        self.ticks = 0
+        self.draining = False
+        self.redirecting = False
+        self.retry_after = 1.
+        self.rejected = 0  # while draining: new long-polls refused
+        self.resolved = 0  # while draining: long-polls that got their result
+        self.redirected = 0  # long-polls resolved with a retry hint
+        self._empty: anyio.Event | None = None
+
+
+    async def run(self) -> None:
+        """Tick forever, sleeping while there are no waiters."""
+        while True:
+            if not self.waiters:
+                self.has_waiters = anyio.Event()
+                await self.has_waiters.wait()
+
+            await anyio.sleep(self.period)
+            self.ticks += 1
+            for waiter in self.waiters:
+                waiter.event.set()
+
+
+    def add(self, waiter: _Waiter) -> None:
+        self.waiters.add(waiter)
+        self.has_waiters.set()
+
+
+    def discard(self, waiter: _Waiter) -> None:
+        self.waiters.discard(waiter)
+        if not self.waiters and self._empty is not None:
+            self._empty.set()
+
+
+    def drain(self, retry_after=1.) -> None:
+        """Start draining: new long-polls are refused with 503 and a Retry-After of {retry_after} seconds,
+        parked ones keep waiting for their result."""
+        self.draining = True
+        self.retry_after = retry_after
+
+
+    def redirect(self) -> int:
+        """Resolve the parked long-polls with a retry hint instead of their result, return how many were parked.
+        The hints are spread over retry_after seconds so that the clients do not reconnect all at once."""
+        self.redirecting = True
+        for waiter in self.waiters:
+            waiter.event.set()
+        return len(self.waiters)
+
+
+    def reject(self, func: Awaitable[Any]) -> int:
+        """Refuse a new long-poll while draining: close its awaitable and return the Retry-After seconds."""
+        self.rejected += 1
+        if inspect.iscoroutine(func):
+            func.close()
+        return math.ceil(self.retry_after)
+
+
+    def retry_hint(self) -> float:
+        return round(random.uniform(0, self.retry_after), 3)
+
+
+    async def wait_empty(self) -> None:
+        """Wait until no long-poll is parked."""
+        while self.waiters:
+            self._empty = anyio.Event()
+            await self._empty.wait()
+
+
+async def http_long_polling(func: Awaitable[T1], keepalive_yield: T2, keepalive_period=1.,
+    scheduler: KeepaliveScheduler | None = None,
+    retry_yield: Callable[[float], T2] | None = None
 ) -> AsyncGenerator[T1 | T2, None]:
     """Wait for the result of func, while yielding {keepalive_yield} every {keepalive_period} seconds.
     Once the result is available, yield it and return.
+    With a {scheduler}, the keepalives follow its shared ticks (and period) instead of a timer of their own,
+    and a long-poll redirected by the draining scheduler yields retry_yield(seconds) (if given) instead of the result.
     """
-    event = anyio.Event()
+    waiter = _Waiter()
 
     async def func_wrapper() -> None:
-        event.result = await func  # type: ignore[attr-defined]
-        event.set()
+        waiter.result = await func  # type: ignore[assignment]
+        waiter.done = True
+        waiter.event.set()
 
     async with anyio.create_task_group() as tg:
         tg.start_soon(func_wrapper)
 
+        if scheduler is None:
+            while True:
+                with anyio.move_on_after(keepalive_period):
+                    await waiter.event.wait()
+
+                if waiter.done:
+                    yield waiter.result  # type: ignore[misc]
+                    return
+
+                yield keepalive_yield
+        else:
+            scheduler.add(waiter)
+            start = anyio.current_time()
+            try:
+                while True:
+                    await waiter.event.wait()
+
+                    if waiter.done:
+                        if scheduler.wait_histogram is not None:
+                            scheduler.wait_histogram.observe(anyio.current_time() - start)
+                        if scheduler.draining:
+                            scheduler.resolved += 1
+                        yield waiter.result  # type: ignore[misc]
+                        return
+
+                    if scheduler.redirecting:
+                        scheduler.redirected += 1
+                        if retry_yield is not None:
+                            yield retry_yield(scheduler.retry_hint())
+                        tg.cancel_scope.cancel()
+                        return
+
+                    waiter.event = anyio.Event()
+                    yield keepalive_yield
+            finally:
+                scheduler.discard(waiter)
+
+
+_NOTHING = object()
+
+async def http_streaming(source: AsyncIterable[T1], keepalive_yield: T2, keepalive_period=1., buffer_size=0
+) -> AsyncGenerator[T1 | T2, None]:
+    """Yield the items of source as they arrive, and {keepalive_yield} whenever nothing arrived for {keepalive_period} seconds.
+    The source is only advanced {buffer_size} items ahead of the consumer, so a slow client holds back
+    an async generator (or lets an AnyioDeque / AnyioBroadcast drop the oldest items) instead of buffering without limit.
+    """
+    send_stream, receive_stream = anyio.create_memory_object_stream[T1](buffer_size)
+
+    async def pump() -> None:
+        async with send_stream:
+            async for data in source:
+                await send_stream.send(data)
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(pump)
+        try:
+            async with receive_stream:
+                while True:
+                    data: T1 | object = _NOTHING
+                    with anyio.move_on_after(keepalive_period):
+                        try:
+                            data = await receive_stream.receive()
+                        except anyio.EndOfStream:
+                            return
+
+                    yield keepalive_yield if data is _NOTHING else data  # type: ignore[misc]
+        finally:
+            tg.cancel_scope.cancel()
+
+
+async def sse_events(source: AsyncIterable[T] | AnyioBroadcast[T], last_event_id: str | None = None
+) -> AsyncGenerator[tuple[int, T], None]:
+    """Pair the items of source with Server-Sent Events ids.
+    For an AnyioBroadcast the id is the sequence number, so a client reconnecting with Last-Event-ID
+    resumes right after the last item it received (if it is still buffered).
+    Other sources cannot be resumed, so Last-Event-ID is ignored and the ids count from 0.
+    """
+    if isinstance(source, AnyioBroadcast):
+        try:
+            start = max(0, int(last_event_id) + 1) if last_event_id else None
+        except ValueError:
+            start = None
+
+        subscription = source.subscribe(start)
         while True:
-            with anyio.move_on_after(keepalive_period):
-                await event.wait()
-                yield event.result  # type: ignore[attr-defined]
-                return
+            data = await subscription.get()
+            yield subscription.cursor - 1, data
+    else:
+        event_id = 0
+        async for data in source:
+            yield event_id, data
+            event_id += 1
+
 
-            yield keepalive_yield
+def sse_encode(event_id: int, data: bytes) -> bytes:
+    """Frame a single-line payload (e.g. compact JSON) as a Server-Sent Event."""
+    return b'id: %d\ndata: %s\n\n' % (event_id, data)
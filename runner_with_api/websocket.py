@@ -0,0 +1,98 @@
+from __future__ import annotations
+import json
+import logging
+from typing import Any, Awaitable, Callable, Union
+
+import anyio
+
+from .utils import AnyioDeque
+
+
+
+logger = logging.getLogger(__name__)
+Message = Union[str, bytes]
+
+
+class WebSocketHub:
+    """
+    Push messages from the runner to any number of WebSocket connections and dispatch the messages received back.
+    Works with the Starlette (FastAPI) and Litestar WebSocket objects.
+    Each connection has its own AnyioDeque send queue: if a client is too slow, its oldest messages are dropped.
+    """
+    def __init__(self, maxlen: int = 100, coalesce: bool = False) -> None:
+        """With {coalesce}, all messages queued for a connection since its last write are joined with newlines
+        into a single frame (clients must split the frames on newlines).
+        Otherwise every message is a frame of its own, and batching only saves the queue wakeups."""
+        self.maxlen = maxlen
+        self.coalesce = coalesce
+        self.connections: set[AnyioDeque[Message]] = set()
+
+
+    @staticmethod
+    def serialize(data: Any) -> Message:
+        """Serialize an outgoing message. Strings are sent as text frames, bytes as binary frames."""
+        return json.dumps(data)
+
+
+    @staticmethod
+    def deserialize(message: Message) -> Any:
+        """Deserialize an incoming message for the on_message callback."""
+        return json.loads(message)
+
+
+    def broadcast(self, data: Any) -> None:
+        """Serialize once and queue the same message for every connection. Does not block."""
+        message = self.serialize(data)
+        for queue in self.connections:
+            queue.put_nowait(message)
+
+
+    async def serve(self, websocket: Any, on_message: Callable[[Any], Awaitable[Any]] | None = None) -> None:
+        """Accept the connection and serve it until the client disconnects.
+        Every received message is passed to {on_message}, and a non-None return value is sent back to this client only.
+        Messages that cannot be deserialized and errors raised by {on_message} are logged, the connection stays open.
+        """
+        await websocket.accept()
+        queue = AnyioDeque[Message](self.maxlen)
+        self.connections.add(queue)
+        try:
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(self._send_loop, websocket, queue)
+
+                while True:
+                    event = await websocket.receive()
+                    if event['type'] == 'websocket.disconnect':
+                        break
+                    if on_message is None:
+                        continue
+
+                    message = event['text'] if event.get('text') is not None else event.get('bytes') or b''
+                    try:
+                        reply = await on_message(self.deserialize(message))
+                    except Exception:
+                        logger.exception(f'Failed to handle WebSocket message {message[:100]!r}')
+                        continue
+
+                    if reply is not None:
+                        queue.put_nowait(self.serialize(reply))
+
+                tg.cancel_scope.cancel()
+        finally:
+            self.connections.discard(queue)
+
+
+    async def _send_loop(self, websocket: Any, queue: AnyioDeque[Message]) -> None:
+        """Write everything that was queued since the last wakeup in one go."""
+        while True:
+            batch = await queue.get_many()
+
+            if self.coalesce:
+                text = [message for message in batch if isinstance(message, str)]
+                binary = [message for message in batch if not isinstance(message, str)]
+                batch = (['\n'.join(text)] if text else []) + ([b'\n'.join(binary)] if binary else [])  # type: ignore[list-item]
+
+            for message in batch:
+                if isinstance(message, str):
+                    await websocket.send({'type': 'websocket.send', 'text': message})
+                else:
+                    await websocket.send({'type': 'websocket.send', 'bytes': message})
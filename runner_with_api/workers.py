@@ -0,0 +1,136 @@
+"""
+Multi-worker mode: the runner (init and run) lives in the primary process, the HTTP API is served by uvicorn workers.
+
+The rule for what runs where:
+- HTTP handlers (request parsing, validation, serialization) run in the worker processes.
+- Runner methods decorated with @primary run in the primary process, next to run().
+  Called from a worker, they are proxied over a Unix socket (pickled arguments and return value).
+Handlers must therefore read and write the runner state through @primary methods,
+their own copy of the runner in the worker is never initialized nor running.
+"""
+from __future__ import annotations
+import logging
+import os
+import pickle
+import struct
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+import anyio
+from anyio.abc import SocketStream, TaskStatus
+from anyio.streams.buffered import BufferedByteReceiveStream
+
+from ._primary import IPC_PATH_ENV, primary
+
+
+
+logger = logging.getLogger(__name__)
+_header = struct.Struct('!I')
+
+
+async def _send_frame(stream: SocketStream, obj: Any) -> None:
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    await stream.send(_header.pack(len(data)) + data)
+
+
+async def _receive_frame(reader: BufferedByteReceiveStream) -> Any:
+    size, = _header.unpack(await reader.receive_exactly(_header.size))
+    return pickle.loads(await reader.receive_exactly(size))
+
+
+class IPCServer:
+    """Serve the @primary methods of a runner to the worker processes over a Unix socket."""
+
+    def __init__(self, runner: Any, path: str) -> None:
+        self.runner = runner
+        self.path = path
+        self.calls = 0
+
+
+    async def serve(self, *, task_status: TaskStatus[None] = anyio.TASK_STATUS_IGNORED) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        listener = await anyio.create_unix_listener(self.path)
+        task_status.started()
+        try:
+            await listener.serve(self._handle)
+        finally:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+    async def _handle(self, stream: SocketStream) -> None:
+        reader = BufferedByteReceiveStream(stream)
+        lock = anyio.Lock()
+
+        async def call(call_id: int, name: str, args: tuple, kwargs: dict) -> None:
+            self.calls += 1
+            try:
+                method = getattr(type(self.runner), name)
+                if not getattr(method, '_primary', False):
+                    raise AttributeError(f'{name} is not a @primary method of {type(self.runner).__name__}')
+                result = (True, await method.__wrapped__(self.runner, *args, **kwargs))
+            except Exception as e:
+                result = (False, e)
+
+            async with lock:
+                await _send_frame(stream, (call_id, *result))
+
+        async with stream, anyio.create_task_group() as tg:
+            while True:
+                try:
+                    call_id, name, args, kwargs = await _receive_frame(reader)
+                except (anyio.IncompleteRead, anyio.EndOfStream, anyio.BrokenResourceError):
+                    break
+                tg.start_soon(call, call_id, name, args, kwargs)
+
+
+class IPCClient:
+    """Connection from a worker process to the IPCServer of the primary. Calls are multiplexed by id."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.stream: SocketStream | None = None
+        self.lock = anyio.Lock()
+        self.pending: dict[int, tuple[anyio.Event, list]] = {}
+        self.next_id = 0
+
+
+    async def run(self, *, task_status: TaskStatus[None] = anyio.TASK_STATUS_IGNORED) -> None:
+        """Connect, then dispatch the replies until cancelled."""
+        async with await anyio.connect_unix(self.path) as self.stream:
+            reader = BufferedByteReceiveStream(self.stream)
+            task_status.started()
+
+            while True:
+                call_id, ok, value = await _receive_frame(reader)
+                event, result = self.pending.pop(call_id)
+                result.extend((ok, value))
+                event.set()
+
+
+    async def call(self, name: str, args: tuple, kwargs: dict) -> Any:
+        assert self.stream is not None, 'IPCClient is not running'
+        call_id = self.next_id
+        self.next_id += 1
+        event, result = self.pending[call_id] = (anyio.Event(), [])
+
+        async with self.lock:
+            await _send_frame(self.stream, (call_id, name, args, kwargs))
+        await event.wait()
+
+        ok, value = result
+        if not ok:
+            raise value
+        return value
+
+
+@asynccontextmanager
+async def serve_workers(runner: Any, path: str) -> AsyncIterator[IPCServer]:
+    """Run the runner lifespan and the IPCServer in the primary process."""
+    server = IPCServer(runner, path)
+    async with runner.lifespan(None), anyio.create_task_group() as tg:
+        await tg.start(server.serve)
+        yield server
+        tg.cancel_scope.cancel()
@@ -1,18 +1,32 @@
 import logging
+import time
+import types
+from contextlib import AsyncExitStack, asynccontextmanager
 
 import pytest
 from anyio import sleep
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from fastapi.testclient import TestClient
 
 from runner_with_api.fastapi import FastapiAsyncRunner, runner_router as router
+from runner_with_api.frame_ring import FrameReader, FrameRing
+from runner_with_api.metrics import Metrics
+from runner_with_api.periodic import periodic
+from runner_with_api.recorder import Recorder, parse
+from runner_with_api.response_cache import cached
+from runner_with_api.startup import init_step
+from runner_with_api.supervisor import supervised
 
 
 
 class MyRunner(FastapiAsyncRunner):
+    metrics = Metrics()
+
     def __init__(self):
         self.initialized = False
         self.running = False
+        self.ticks = 0
 
 
     async def init(self):
@@ -33,6 +47,27 @@ class MyRunner(FastapiAsyncRunner):
             self.running = False
 
 
+    @init_step(warmup=True)
+    async def warmup(self) -> None:
+        await sleep(0.2)
+
+
+    @supervised(max_restarts=0)
+    async def heartbeat(self) -> None:
+        while True:
+            await sleep(1)
+
+
+    @periodic(1.)
+    async def tick(self) -> None:
+        self.ticks += 1
+
+
+    @router.put('/tick/period')
+    async def set_tick_period(self, period: float) -> None:
+        await self.set_job_period('tick', period)
+
+
     @router.put('/config')
     async def configure(self, config: dict) -> None:
         logging.info('Configuring process')
@@ -70,3 +105,187 @@ def test_configure():
         assert runner.running is True
 
     assert runner.running is False
+
+
+def test_metrics():
+    with TestClient(api) as client:
+        client.get('/config')
+
+        r = client.get('/metrics')
+        assert r.status_code == 200
+        assert 'runner_handler_latency_seconds_count{handler="get_config"}' in r.text  # also counts test_configure
+        assert 'runner_disconnect_cancellations_total 0' in r.text
+
+
+def test_task_health():
+    with TestClient(api) as client:
+        r = client.get('/health/tasks')
+        assert r.status_code == 200
+        assert r.json()['heartbeat']['state'] == 'running'
+
+
+def test_periodic():
+    with TestClient(api) as client:
+        ticks = runner.ticks
+        assert client.put('/tick/period', params={'period': 0.02}).status_code == 200
+        time.sleep(0.2)
+        assert runner.ticks - ticks >= 5
+        client.put('/tick/period', params={'period': 1.})
+
+        assert 'runner_periodic_jitter_seconds_count{job="tick"}' in client.get('/metrics').text
+
+
+def test_readiness():
+    with TestClient(api) as client:
+        assert client.get('/live').status_code == 200
+        r = client.get('/ready')
+        assert r.status_code == 503
+        assert r.json()['steps']['warmup']['state'] == 'running'
+
+        time.sleep(0.3)
+        r = client.get('/ready')
+        assert r.status_code == 200
+        assert r.json()['ready'] is True
+
+
+def test_prefixes():
+    class Camera(MyRunner):
+        metrics = None
+
+        def __init__(self, name: str):
+            super().__init__()
+            self.name = name
+
+        @router.get('/config')  # overrides MyRunner.get_config
+        async def get_config(self) -> dict:
+            return {'camera': self.name, **self.config}
+
+    paths = [route.path for route in Camera.class_router.routes]
+    assert paths.count('/config') == 2  # put and the overriding get
+    cameras = [Camera('cam0'), Camera('cam1')]
+
+    api = FastAPI(lifespan=lambda app: _lifespans(app, cameras))
+    for camera in cameras:
+        api.include_router(camera.router, prefix=f'/{camera.name}')
+
+    with TestClient(api) as client:
+        client.put('/cam1/config', json={'exposure': 2})
+        assert client.get('/cam0/config').json() == {'camera': 'cam0'}
+        assert client.get('/cam1/config').json() == {'camera': 'cam1', 'exposure': 2}
+        assert client.get('/config').status_code == 404
+
+    assert not isinstance(Camera.class_router.routes[0].endpoint, types.MethodType)
+
+
+@asynccontextmanager
+async def _lifespans(app: FastAPI, runners: list[FastapiAsyncRunner]):
+    async with AsyncExitStack() as stack:
+        for runner in runners:
+            await stack.enter_async_context(runner.lifespan(app))
+        yield
+
+
+def test_response_cache():
+    class CachedRunner(MyRunner):
+        metrics = Metrics()
+
+        def __init__(self):
+            super().__init__()
+            self.config_version = 0
+            self.computed = 0
+
+        @router.get('/cached/config')
+        @cached('config_version')
+        async def get_cached_config(self) -> dict:
+            self.computed += 1
+            return self.config
+
+        @router.put('/cached/config')
+        async def set_cached_config(self, config: dict) -> None:
+            self.config = config
+            self.config_version += 1
+
+    runner = CachedRunner()
+    api = FastAPI(lifespan=runner.lifespan)
+    api.include_router(runner.router, prefix='/cam')
+
+    with TestClient(api) as client:
+        r = client.get('/cam/cached/config')
+        etag = r.headers['etag']
+        assert client.get('/cam/cached/config').json() == {}
+        assert client.get('/cam/cached/config', headers={'If-None-Match': f'W/{etag}'}).status_code == 304
+        assert runner.computed == 1
+
+        client.put('/cam/cached/config', json={'gain': 2})
+        r = client.get('/cam/cached/config', headers={'If-None-Match': etag})
+        assert (r.status_code, r.json(), runner.computed) == (200, {'gain': 2}, 2)
+
+        cache = runner.response_caches['/cam/cached/config:get_cached_config']
+        assert (cache.hits, cache.misses, cache.not_modified) == (1, 2, 1)
+        assert 'runner_response_cache_not_modified_total 1' in client.get('/cam/metrics').text
+
+
+def test_response_cache_prefixes():
+    class CachedRunner(MyRunner):
+        metrics = Metrics()
+        version = 0
+
+        @router.get('/prefixed/config')
+        @cached('version')
+        async def get_prefixed_config(self) -> dict:
+            return self.config
+
+    runner = CachedRunner()
+    api = FastAPI(lifespan=runner.lifespan)
+    api.include_router(runner.router, prefix='/a')
+    api.include_router(runner.router, prefix='/b')
+
+    with TestClient(api) as client:
+        for path in ('/a/prefixed/config', '/a/prefixed/config', '/b/prefixed/config'):
+            assert client.get(path).json() == {}
+
+        first = runner.response_caches['/a/prefixed/config:get_prefixed_config']
+        second = runner.response_caches['/b/prefixed/config:get_prefixed_config']
+        assert (first.hits, first.misses, second.hits, second.misses) == (1, 1, 0, 1)
+        metrics = client.get('/a/metrics').text
+        assert 'runner_response_cache_hits_total 1' in metrics
+        assert 'runner_response_cache_misses_total 2' in metrics
+
+
+def test_recorder(tmp_path):
+    class RecordingRunner(MyRunner):
+        def __init__(self):
+            super().__init__()
+            self.recorder = Recorder(tmp_path, flush_interval=0.01)
+
+        @router.get('/records')
+        async def get_records(self, start: float, end: float) -> StreamingResponse:
+            return StreamingResponse(self.recorder.stream(start, end), media_type='application/octet-stream')
+
+    runner = RecordingRunner()
+    api = FastAPI(lifespan=runner.lifespan)
+    api.include_router(runner.router)
+
+    with TestClient(api) as client:
+        for i in range(100):
+            runner.recorder.record(bytes([i]), 1000 + i)
+        time.sleep(0.1)
+        assert runner.recorder.flushes
+        r = client.get('/records', params={'start': 1010, 'end': 1019.5})
+        assert [(t, bytes(data)) for t, data in parse(r.content)] == [(1000. + i, bytes([i])) for i in range(10, 20)]
+
+
+def test_frames():
+    class FramesRunner(MyRunner):
+        frame_ring = FrameRing(slots=4, slot_size=64, metadata={'shape': [8]})
+
+    runner = FramesRunner()
+    api = FastAPI(lifespan=runner.lifespan)
+    api.include_router(runner.router)
+
+    with TestClient(api) as client:
+        runner.frame_ring.publish(bytes(range(8)))
+        info = client.get('/frames').json()
+        assert (info['latest'], info['metadata']) == (1, {'shape': [8]})
+        with FrameReader(info['name']) as reader:
+            assert reader.frame(info['latest']).copy() == bytes(range(8))
@@ -1,11 +1,18 @@
 from __future__ import annotations
 
+import array
+import struct
+
+import msgspec
 import pytest
-from anyio import sleep
+from anyio import create_task_group, sleep
 from httpx import ASGITransport, AsyncClient
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.testclient import TestClient
 
-from runner_with_api.fastapi.utils import LongPollingResponse
+from runner_with_api.encoding import ARRAY, JSON, MSGPACK
+from runner_with_api.utils import KeepaliveScheduler, ResultSlot
+from runner_with_api.fastapi.utils import EventStreamResponse, LongPollingResponse, WebSocketHub
 
 
 
@@ -20,6 +27,40 @@ async def polling():
 
     return LongPollingResponse(func(), keepalive=0.1)
 
+
+@app.get('/samples')
+async def samples(request: Request):
+    async def func():
+        await sleep(0.3)
+        return array.array('f', [0.5, 1.5])
+
+    return LongPollingResponse(func(), keepalive=0.1, accept=request.headers.get('accept'), encodings=(JSON, MSGPACK, ARRAY))
+
+
+slot = ResultSlot[int](LongPollingResponse.serialize)
+
+@app.get('/slot')
+async def slot_polling(request: Request):
+    return LongPollingResponse(slot.wait(), keepalive=0.1, accept=request.headers.get('accept'))
+
+
+draining = KeepaliveScheduler()
+draining.drain(retry_after=2.5)
+
+@app.get('/draining')
+async def draining_polling():
+    return LongPollingResponse(slot.wait(), keepalive=0.1, scheduler=draining)
+
+
+@app.get('/events')
+async def events(request: Request):
+    async def source():
+        for i in range(3):
+            await sleep(0.15)
+            yield {'i': i}
+
+    return EventStreamResponse(source(), keepalive=0.1, last_event_id=request.headers.get('last-event-id'))
+
 ###################################################################################################
 @pytest.fixture
 async def client():
@@ -31,3 +72,101 @@ async def client():
 async def test_polling(client: AsyncClient):
     r = await client.get('/polling')
     assert r.json() is True
+
+
+def frames(content: bytes) -> list[bytes]:
+    frames = []
+    while content:
+        size, = struct.unpack_from('<I', content)
+        frames.append(content[4:4+size])
+        content = content[4+size:]
+    return frames
+
+
+@pytest.mark.anyio
+async def test_encodings(client: AsyncClient):
+    r = await client.get('/samples', headers={'Accept': 'application/msgpack'})
+    assert r.headers['content-type'] == MSGPACK
+    *keepalives, payload = frames(r.content)
+    assert keepalives and not any(keepalives)
+    assert msgspec.msgpack.decode(payload) == [0.5, 1.5]
+
+    r = await client.get('/samples', headers={'Accept': 'application/octet-stream'})
+    assert r.headers['content-type'] == ARRAY
+    assert struct.unpack('<2f', frames(r.content)[-1]) == (0.5, 1.5)
+
+    r = await client.get('/samples', headers={'Accept': 'text/html, */*;q=0.8'})
+    assert r.json() == [0.5, 1.5]
+
+
+@pytest.mark.anyio
+async def test_slot_polling(client: AsyncClient):
+    results = []
+
+    async def poll():
+        results.append((await client.get('/slot')).json())
+
+    async def poll_msgpack():
+        r = await client.get('/slot', headers={'Accept': 'application/msgpack'})
+        assert r.headers['content-type'] == MSGPACK
+        results.append(msgspec.msgpack.decode(frames(r.content)[-1]))
+
+    async with create_task_group() as tg:
+        for _ in range(3):
+            tg.start_soon(poll)
+            tg.start_soon(poll_msgpack)
+        await sleep(0.2)
+        payload = slot.generation
+        slot.set(42)
+
+    assert results == [42] * 6
+    assert (slot.serializations, slot.fanout) == (1, 6)
+    assert list(payload.payload.variants) == [MSGPACK]  # encoded once for the 3 msgpack long-polls
+
+
+@pytest.mark.anyio
+async def test_draining(client: AsyncClient):
+    r = await client.get('/draining')
+    assert r.status_code == 503
+    assert r.headers['retry-after'] == '3'
+    assert r.json() == {'retry_after': 3}
+    assert draining.rejected == 1
+    assert slot.waiting == 0
+
+
+@pytest.mark.anyio
+async def test_events(client: AsyncClient):
+    r = await client.get('/events', headers={'Last-Event-ID': '9'})
+    assert r.headers['content-type'].startswith('text/event-stream')
+
+    events = [event.strip() for event in r.text.split('\n\n') if event.strip()]
+    assert events == [f'id: {i}\ndata: {{"i": {i}}}' for i in range(3)]
+    assert r.text.count('\n') > 3 * 3  # keepalives in between
+
+
+hub = WebSocketHub()
+
+@app.websocket('/ws')
+async def ws(websocket: WebSocket):
+    async def on_message(command: dict):
+        if command['cmd'] == 'publish':
+            hub.broadcast(command['data'])
+        elif command['cmd'] == 'ping':
+            return 'pong'
+
+    await hub.serve(websocket, on_message)
+
+
+def test_websocket():
+    with TestClient(app) as client:
+        with client.websocket_connect('/ws') as ws1, client.websocket_connect('/ws') as ws2:
+            ws1.send_text('')  # malformed, logged and ignored
+            ws1.send_json({'cmd': 'ping'})
+            assert ws1.receive_json() == 'pong'
+
+            ws2.send_json({'cmd': 'publish', 'data': {'a': 1}})
+            assert ws1.receive_json() == {'a': 1}
+            assert ws2.receive_json() == {'a': 1}
+            assert len(hub.connections) == 2
+
+    assert not hub.connections
@@ -1,11 +1,20 @@
 import logging
+import time
 
 import pytest
 from anyio import sleep
 from litestar import Litestar, get, put
+from litestar.response import Stream
 from litestar.testing import TestClient
 
+from runner_with_api.frame_ring import FrameReader, FrameRing
 from runner_with_api.litestar import LitestarAsyncRunner
+from runner_with_api.metrics import Metrics
+from runner_with_api.recorder import Recorder, parse
+from runner_with_api.response_cache import cached
+from runner_with_api.startup import init_step
+from runner_with_api.state import VersionedState
+from runner_with_api.supervisor import supervised
 
 
 
@@ -72,3 +81,173 @@ def test_configure():
         assert runner.running is True
 
     assert runner.running is False
+
+
+def test_metrics():
+    class MetricsRunner(MyRunner):
+        metrics = Metrics()
+
+    runner = MetricsRunner()
+    api = Litestar(runner.handlers, lifespan=[runner.lifespan])
+
+    with TestClient(api) as client:
+        client.put('/config', json={})
+        client.get('/config')
+
+        r = client.get('/metrics')
+        assert r.status_code == 200
+        assert 'runner_handler_latency_seconds_count{handler="configure"} 1' in r.text
+        assert 'runner_handler_latency_seconds_count{handler="get_config"} 1' in r.text
+        assert 'runner_long_poll_waiters 0' in r.text
+
+
+def test_task_health():
+    class SupervisedRunner(MyRunner):
+        @supervised(max_restarts=0)
+        async def crash(self):
+            raise RuntimeError('boom')
+
+    runner = SupervisedRunner()
+    api = Litestar(runner.handlers, lifespan=[runner.lifespan])
+
+    with TestClient(api) as client:
+        assert runner.running is True
+        r = client.get('/health/tasks')
+        assert r.status_code == 503
+        assert r.json()['crash']['state'] == 'failed'
+        assert r.json()['crash']['last_error'] == "RuntimeError('boom')"
+
+
+def test_readiness():
+    class WarmupRunner(MyRunner):
+        @init_step(warmup=True)
+        async def warmup(self):
+            await sleep(0.2)
+
+    runner = WarmupRunner()
+    api = Litestar(runner.handlers, lifespan=[runner.lifespan])
+
+    with TestClient(api) as client:
+        assert client.get('/live').status_code == 200
+        r = client.get('/ready')
+        assert r.status_code == 503
+        assert r.json()['steps']['warmup']['state'] == 'running'
+
+        time.sleep(0.3)
+        r = client.get('/ready')
+        assert r.status_code == 200
+        assert r.json()['ready'] is True
+
+
+def test_prefixes():
+    class Camera(MyRunner):
+        @get('/config')  # overrides MyRunner.get_config
+        async def get_config(self) -> dict:
+            return {'camera': self.name, **self.config}
+
+        @get('/')
+        async def index(self) -> str:
+            return self.name
+
+    assert [h.handler_name for h in Camera._route_handlers].count('get_config') == 1
+    cameras = [Camera(), Camera()]
+    for i, camera in enumerate(cameras):
+        camera.name = f'cam{i}'
+
+    api = Litestar([*cameras[0].handlers_at('/cam0'), *cameras[1].handlers_at('/cam1/')],
+        lifespan=[camera.lifespan for camera in cameras])
+
+    with TestClient(api) as client:
+        client.put('/cam1/config', json={'exposure': 2})
+        assert client.get('/cam0/config').json() == {'camera': 'cam0'}
+        assert client.get('/cam1/config').json() == {'camera': 'cam1', 'exposure': 2}
+        assert client.get('/cam1').text == 'cam1'
+        assert client.get('/config').status_code == 404
+
+    handler = Camera.__dict__['get_config']
+    assert handler.owner is None  # the class handlers are only copied
+    assert handler.paths == {'/config'}
+
+
+def test_response_cache():
+    class CachedRunner(MyRunner):
+        metrics = Metrics()
+
+        def __init__(self):
+            super().__init__()
+            self.state = VersionedState({'exposure': 1})
+            self.computed = 0
+
+        @get('/state')
+        @cached('state', maxsize=2)
+        async def get_state(self, channel: int = 0) -> dict:
+            self.computed += 1
+            return {'channel': channel, **self.state.snapshot().values}
+
+    runner = CachedRunner()
+    api = Litestar(runner.handlers, lifespan=[runner.lifespan])
+
+    with TestClient(api) as client:
+        r = client.get('/state')
+        etag = r.headers['etag']
+        assert client.get('/state').json() == {'channel': 0, 'exposure': 1}
+        assert runner.computed == 1
+
+        r = client.get('/state', headers={'If-None-Match': etag})
+        assert (r.status_code, r.content, r.headers['etag']) == (304, b'', etag)
+
+        runner.state.update({'exposure': 2})
+        r = client.get('/state', headers={'If-None-Match': etag})
+        assert r.status_code == 200
+        assert r.json() == {'channel': 0, 'exposure': 2}
+        assert r.headers['etag'] != etag
+
+        for channel in (1, 2):  # evict the entry without query string
+            client.get('/state', params={'channel': channel})
+        client.get('/state')
+        assert runner.computed == 5
+
+        cache = runner.response_caches['get_state']
+        assert (cache.hits, cache.misses, cache.not_modified, cache.evictions) == (1, 5, 1, 3)
+        assert 'runner_response_cache_hits_total 1' in client.get('/metrics').text
+
+
+def test_recorder(tmp_path):
+    class RecordingRunner(MyRunner):
+        def __init__(self):
+            super().__init__()
+            self.recorder = Recorder(tmp_path, flush_interval=0.01)
+
+        @get('/records', media_type='application/octet-stream')
+        async def get_records(self, start: float, end: float) -> Stream:
+            return Stream(self.recorder.stream(start, end))
+
+    runner = RecordingRunner()
+    api = Litestar(runner.handlers, lifespan=[runner.lifespan])
+
+    with TestClient(api) as client:
+        for i in range(100):
+            runner.recorder.record(bytes([i]), 1000 + i)
+        r = client.get('/records', params={'start': 1090, 'end': 2000})  # read from the buffer
+        assert [bytes(data) for _, data in parse(r.content)] == [bytes([i]) for i in range(90, 100)]
+        time.sleep(0.1)
+        assert runner.recorder.flushes
+        r = client.get('/records', params={'start': 1010, 'end': 1019.5})
+        assert [(t, bytes(data)) for t, data in parse(r.content)] == [(1000. + i, bytes([i])) for i in range(10, 20)]
+
+
+def test_frames():
+    class FramesRunner(MyRunner):
+        frame_ring = FrameRing(slots=4, slot_size=64)
+
+    runner = FramesRunner()
+    api = Litestar(runner.handlers_at('/cam'), lifespan=[runner.lifespan])
+
+    with TestClient(api) as client:
+        for i in range(6):
+            runner.frame_ring.publish(bytes([i]) * 8)
+        info = client.get('/cam/frames').json()
+        assert (info['slots'], info['slot_size'], info['latest']) == (4, 64, 6)
+        with FrameReader(info['name']) as reader:
+            assert reader.frame(2) is None
+            assert reader.frame(3).copy() == bytes([2]) * 8
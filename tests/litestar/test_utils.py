@@ -1,15 +1,23 @@
 from __future__ import annotations
 
+import array
+import struct
+
 import msgspec
 import pytest
-from anyio import sleep
-from litestar import Litestar, get
-from litestar.testing import AsyncTestClient
+from anyio import Event, create_task_group, sleep
+from httpx import ASGITransport, AsyncClient
+from litestar import Litestar, Request, WebSocket, get, websocket
+from litestar.testing import AsyncTestClient, TestClient
 from litestar.openapi.config import OpenAPIConfig
 from litestar.openapi.plugins import RapidocRenderPlugin
 from pydantic import BaseModel
 
-from runner_with_api.litestar.utils import LongPollingResponse
+from runner_with_api.admission import AdmissionControl
+from runner_with_api.compression import Compression
+from runner_with_api.encoding import ARRAY, JSON, MSGPACK
+from runner_with_api.utils import KeepaliveScheduler, ResultSlot
+from runner_with_api.litestar.utils import EventStreamResponse, LongPollingResponse, WebSocketHub
 
 
 
@@ -22,8 +30,53 @@ async def polling() -> LongPollingResponse[bool]:
     return LongPollingResponse(func(), keepalive=0.1)
 
 
+@get('/samples')
+async def samples(request: Request) -> LongPollingResponse[list]:
+    async def func():
+        await sleep(0.3)
+        return array.array('f', [0.5, 1.5])
+
+    return LongPollingResponse(func(), keepalive=0.1, accept=request.headers.get('accept'), encodings=(JSON, MSGPACK, ARRAY))
+
+
+@get('/models')
+async def models(request: Request) -> LongPollingResponse[dict]:
+    class Model(BaseModel):
+        a: int
+
+    async def func():
+        return {'model': Model(a=1)}
+
+    return LongPollingResponse(func(), keepalive=0.1, accept=request.headers.get('accept'))
+
+
+slot = ResultSlot[int](LongPollingResponse.serialize)
+
+@get('/slot')
+async def slot_polling(request: Request) -> LongPollingResponse[int]:
+    return LongPollingResponse(slot.wait(), keepalive=0.1, accept=request.headers.get('accept'))
+
+
+draining = KeepaliveScheduler()
+draining.drain(retry_after=2.5)
+
+@get('/draining')
+async def draining_polling() -> LongPollingResponse[int]:
+    return LongPollingResponse(slot.wait(), keepalive=0.1, scheduler=draining)
+
+
+@get('/events')
+async def events(request: Request) -> EventStreamResponse[dict]:
+    async def source():
+        for i in range(3):
+            await sleep(0.15)
+            yield {'i': i}
+
+    return EventStreamResponse(source(), keepalive=0.1, last_event_id=request.headers.get('last-event-id'))
+
+
 app = Litestar(
-    [polling],
+    [polling, samples, models, slot_polling, draining_polling, events],
     openapi_config=OpenAPIConfig(
         title="Litestar Long Polling",
         version="0.1.0",
@@ -44,6 +97,81 @@ async def test_polling(client: AsyncTestClient):
     assert r.json() is True
 
 
+def frames(content: bytes) -> list[bytes]:
+    frames = []
+    while content:
+        size, = struct.unpack_from('<I', content)
+        frames.append(content[4:4+size])
+        content = content[4+size:]
+    return frames
+
+
+@pytest.mark.anyio
+async def test_encodings(client: AsyncTestClient):
+    r = await client.get('/samples', headers={'Accept': 'application/msgpack'})
+    assert r.headers['content-type'] == MSGPACK
+    *keepalives, payload = frames(r.content)
+    assert keepalives and not any(keepalives)
+    assert msgspec.msgpack.decode(payload) == [0.5, 1.5]
+
+    r = await client.get('/samples', headers={'Accept': 'application/octet-stream'})
+    assert r.headers['content-type'] == ARRAY
+    assert struct.unpack('<2f', frames(r.content)[-1]) == (0.5, 1.5)
+
+    r = await client.get('/samples', headers={'Accept': 'text/html, */*;q=0.8'})
+    assert r.json() == [0.5, 1.5]
+
+    r = await client.get('/models', headers={'Accept': 'application/msgpack'})
+    assert msgspec.msgpack.decode(frames(r.content)[-1]) == {'model': {'a': 1}}
+
+
+@pytest.mark.anyio
+async def test_slot_polling():
+    results = []
+    # AsyncTestClient runs one request at a time, the long-polls need to be concurrent
+    client = AsyncClient(transport=ASGITransport(app=app), base_url='http://litestar.local')
+
+    async def poll():
+        results.append((await client.get('/slot')).json())
+
+    async def poll_msgpack():
+        r = await client.get('/slot', headers={'Accept': 'application/msgpack'})
+        assert r.headers['content-type'] == MSGPACK
+        results.append(msgspec.msgpack.decode(frames(r.content)[-1]))
+
+    async with create_task_group() as tg:
+        for _ in range(3):
+            tg.start_soon(poll)
+            tg.start_soon(poll_msgpack)
+        await sleep(0.2)
+        payload = slot.generation
+        slot.set(42)
+
+    assert results == [42] * 6
+    assert (slot.serializations, slot.fanout) == (1, 6)
+    assert list(payload.payload.variants) == [MSGPACK]  # encoded once for the 3 msgpack long-polls
+
+
+@pytest.mark.anyio
+async def test_draining(client: AsyncTestClient):
+    r = await client.get('/draining')
+    assert r.status_code == 503
+    assert r.headers['retry-after'] == '3'
+    assert r.json() == {'retry_after': 3}
+    assert draining.rejected == 1
+    assert slot.waiting == 0
+
+
+@pytest.mark.anyio
+async def test_events(client: AsyncTestClient):
+    r = await client.get('/events', headers={'Last-Event-ID': '9'})
+    assert r.headers['content-type'].startswith('text/event-stream')
+
+    events = [event.strip() for event in r.text.split('\n\n') if event.strip()]
+    assert events == [f'id: {i}\ndata: {{"i":{i}}}' for i in range(3)]
+    assert r.text.count('\n') > 3 * 3  # keepalives in between
+
+
 def test_polling_serialization() -> None:
     class MsgspecModel(msgspec.Struct):
         data: list[int] = msgspec.field(default_factory=list)
@@ -54,3 +182,86 @@ def test_polling_serialization() -> None:
     serialized = b'{"data":[]}'
     assert LongPollingResponse.serialize(MsgspecModel()) == serialized
     assert LongPollingResponse.serialize(PydanticModel()) == serialized
+
+
+hub = WebSocketHub()
+
+@websocket('/ws')
+async def ws(socket: WebSocket) -> None:
+    async def on_message(command: dict):
+        if command['cmd'] == 'publish':
+            hub.broadcast(command['data'])
+        elif command['cmd'] == 'ping':
+            return 'pong'
+
+    await hub.serve(socket, on_message)
+
+
+app.register(ws)
+
+
+def test_websocket():
+    with TestClient(app) as client:
+        with client.websocket_connect('/ws') as ws1, client.websocket_connect('/ws') as ws2:
+            ws1.send_text('')  # malformed, logged and ignored
+            ws1.send_json({'cmd': 'ping'})
+            assert ws1.receive_json(timeout=1) == 'pong'
+
+            ws2.send_json({'cmd': 'publish', 'data': {'a': 1}})
+            assert ws1.receive_json(timeout=1) == {'a': 1}
+            assert ws2.receive_json(timeout=1) == {'a': 1}
+            assert len(hub.connections) == 2
+
+    assert not hub.connections
+
+
+@pytest.mark.anyio
+async def test_admission_shared_by_routes():
+    admission = AdmissionControl(limit=1, queue_size=0)
+    release = Event()
+
+    @get('/a')
+    async def a() -> str:
+        await release.wait()
+        return 'a'
+
+    @get('/b')
+    async def b() -> str:
+        return 'b'
+
+    app = Litestar([a, b], middleware=[admission.middleware])
+    async with AsyncClient(transport=ASGITransport(app=app), base_url='http://litestar.local') as client:
+        async with create_task_group() as tg:
+            tg.start_soon(client.get, '/a')
+            await sleep(0.01)
+            assert (await client.get('/b')).status_code == 503  # the limit is global, not per route
+            release.set()
+
+        assert (await client.get('/b')).status_code == 200
+
+
+@pytest.mark.anyio
+async def test_compressed_slot_polling():
+    compression = Compression(minimum_size=0)
+    samples = ResultSlot[list](LongPollingResponse.serialize)
+
+    @get('/samples')
+    async def poll() -> LongPollingResponse[list]:
+        return LongPollingResponse(samples.wait(), keepalive=0.1)
+
+    app = Litestar([poll], middleware=[compression.middleware])
+    results = []
+    async with AsyncClient(transport=ASGITransport(app=app), base_url='http://litestar.local') as client:
+        async def fetch():
+            r = await client.get('/samples')
+            assert r.headers['content-encoding'] == 'gzip'
+            results.append(r.json())
+
+        async with create_task_group() as tg:
+            for _ in range(3):
+                tg.start_soon(fetch)
+            await sleep(0.15)
+            samples.set(list(range(100)))
+
+    assert results == [list(range(100))] * 3
+    assert (compression.cache_misses, compression.cache_hits) == (1, 2)  # compressed once for the 3 streams
@@ -0,0 +1,91 @@
+import pytest
+from anyio import Event, create_task_group, sleep
+from httpx import ASGITransport, AsyncClient
+
+from runner_with_api.admission import AdmissionControl
+
+
+
+release = Event()
+
+async def app(scope, receive, send):
+    if scope['path'] != '/control':
+        await release.wait()
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': scope['path'].encode()})
+
+
+def client(admission: AdmissionControl) -> AsyncClient:
+    return AsyncClient(transport=ASGITransport(app=admission.middleware(app)), base_url='http://admission.local')
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    global release
+    release = Event()
+
+
+@pytest.mark.anyio
+async def test_admission():
+    admission = AdmissionControl(limit=2, queue_size=1, max_wait=1., retry_after=2.5, priority=['/control'])
+    responses = {}
+
+    async with client(admission) as c:
+        async def get(i: int):
+            responses[i] = await c.get('/telemetry')
+
+        async with create_task_group() as tg:
+            for i in range(4):
+                tg.start_soon(get, i)
+                await sleep(0.01)
+
+            assert (admission.in_flight, len(admission.waiters)) == (2, 1)
+            assert responses[3].status_code == 503  # rejected right away, the queue is full
+            assert responses[3].headers['retry-after'] == '3'
+            assert responses[3].json()['retry_after'] == 2.5
+
+            r = await c.get('/control')  # never queued behind the telemetry
+            assert r.status_code == 200
+            assert (await c.get('/controller')).status_code == 503  # not under the /control prefix
+            release.set()
+
+    assert [responses[i].status_code for i in range(3)] == [200] * 3
+    assert (admission.admitted, admission.queued, admission.rejected, admission.prioritized) == (3, 1, 2, 1)
+    assert admission.in_flight == 0
+
+
+@pytest.mark.anyio
+async def test_admission_route_limit():
+    admission = AdmissionControl(limit=10, route_limits={'/bulk': 1}, max_wait=0.05)
+
+    async with client(admission) as c:
+        async with create_task_group() as tg:
+            tg.start_soon(c.get, '/bulk/a')
+            await sleep(0.01)
+            r = await c.get('/bulk/b')  # waits max_wait behind /bulk/a
+            assert r.status_code == 503
+
+            tg.start_soon(c.get, '/other')
+            tg.start_soon(c.get, '/bulkhead')  # not under the /bulk prefix
+            await sleep(0.01)
+            assert admission.in_flight == 3
+            release.set()
+
+    assert admission.rejected == 1
+
+
+@pytest.mark.anyio
+async def test_admission_adaptive():
+    lag = 0.2
+    admission = AdmissionControl(limit=8, loop_lag=lambda: lag, target_lag=0.05, adapt_interval=0)
+    release.set()
+
+    async with client(admission) as c:
+        for limit in (6, 4, 3, 2, 1, 1):
+            await c.get('/')
+            assert admission.limit == limit
+
+        lag = 0.
+        for limit in (2, 3):
+            await c.get('/')
+            assert admission.limit == limit
@@ -0,0 +1,52 @@
+import pytest
+
+from benchmarks.__main__ import compare
+from benchmarks.suite import SCENARIOS, Settings
+
+
+
+@pytest.fixture
+def settings():
+    settings = Settings(quick=True)
+    settings.duration = 0.1
+    settings.concurrency = 4
+    settings.waiters = 50
+    settings.records = 1_000
+    return settings
+
+
+@pytest.mark.anyio
+async def test_handlers(settings):
+    results = {result.name: result.as_dict() for result in await SCENARIOS['handlers'](settings)}
+    assert set(results) == {f'{adapter}/asgi/{path}' for adapter in ('fastapi', 'litestar') for path in ('config', 'watched')}
+    for result in results.values():
+        assert result['count'] > 0
+        assert 0 < result['p50_ms'] <= result['p99_ms']
+
+
+@pytest.mark.anyio
+async def test_long_polling(settings):
+    results = {result.name: result.as_dict() for result in await SCENARIOS['long_polling'](settings)}
+    for adapter in ('fastapi', 'litestar'):
+        assert results[f'{adapter}/long_polling/park']['count'] == 50
+        assert results[f'{adapter}/long_polling/deliver']['count'] == 50  # every long-poll got the result
+
+
+@pytest.mark.anyio
+async def test_recorder(settings):
+    results = {result.name: result.as_dict() for result in await SCENARIOS['recorder'](settings)}
+    assert [results[f'recorder/{name}']['count'] for name in ('record', 'flush', 'stream')] == [1_000] * 3
+
+
+@pytest.mark.anyio
+async def test_frame_ring(settings):
+    results = {result.name: result.as_dict() for result in await SCENARIOS['frame_ring'](settings)}
+    assert set(results) == {'frame_ring/publish', 'frame_ring/map', 'frame_ring/copy'}
+
+
+def test_compare(capsys):
+    baseline = {'a': {'ops_per_s': 100., 'p99_ms': 1.}, 'b': {'ops_per_s': 100.}, 'c': {'ops_per_s': 100., 'p99_ms': 1.}}
+    results = {'a': {'ops_per_s': 90., 'p99_ms': 1.1}, 'b': {'ops_per_s': 70.}, 'c': {'ops_per_s': 100., 'p99_ms': 1.5},
+        'new': {'ops_per_s': 1.}}
+    assert compare(results, baseline, 0.2) == ['b', 'c']
+    assert 'REGRESSED  b' in capsys.readouterr().out
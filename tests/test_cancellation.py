@@ -0,0 +1,69 @@
+import pytest
+from anyio import create_memory_object_stream, create_task_group, fail_after, get_cancelled_exc_class, sleep
+
+from runner_with_api.cancellation import DisconnectWatcher, cancel_on_disconnect, standalone
+
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('shared', [True, False])
+async def test_cancel_on_disconnect(shared: bool):
+    watcher = DisconnectWatcher() if shared else None
+    standalone_counts = (standalone.watched, standalone.cancelled)
+    send, receive_stream = create_memory_object_stream[dict](10)
+    disconnects = []
+    state = {}
+
+    async def asgi_receive():
+        return await receive_stream.receive()
+
+    async def handler():
+        async with cancel_on_disconnect(asgi_receive, lambda: disconnects.append(1), watcher) as receive:
+            try:
+                state['body'] = await receive()  # the first chunk may already have been read by the watcher
+                await sleep(1)
+            except get_cancelled_exc_class():
+                state['cancelled'] = True
+                raise
+
+    with fail_after(1):
+        async with create_task_group() as tg:
+            if watcher:
+                tg.start_soon(watcher.run)
+            await send.send({'type': 'http.request', 'body': b'chunk', 'more_body': True})
+            await sleep(0.05)
+
+            async with create_task_group() as handlers:
+                handlers.start_soon(handler)
+                await sleep(0.05)
+                await send.send({'type': 'http.disconnect'})
+                with fail_after(0.01):  # delivered right away, not at the next poll
+                    while 'cancelled' not in state:
+                        await sleep(0)
+
+            tg.cancel_scope.cancel()
+
+    assert state == {'body': {'type': 'http.request', 'body': b'chunk', 'more_body': True}, 'cancelled': True}
+    assert disconnects == [1]
+    if watcher:
+        assert (watcher.watched, watcher.cancelled) == (1, 1)
+        assert not watcher.watches
+    else:
+        assert (standalone.watched, standalone.cancelled) == (standalone_counts[0] + 1, standalone_counts[1] + 1)
+
+
+@pytest.mark.anyio
+async def test_watch_ends_with_handler():
+    watcher = DisconnectWatcher()
+    send, receive_stream = create_memory_object_stream[dict](10)
+    async with create_task_group() as tg:
+        tg.start_soon(watcher.run)
+        await sleep(0.01)
+        async with cancel_on_disconnect(receive_stream.receive, watcher=watcher) as receive:
+            await send.send({'type': 'http.request', 'body': b'', 'more_body': False})
+            assert (await receive())['type'] == 'http.request'
+        await send.send({'type': 'http.disconnect'})  # after the handler, no longer waited for
+        await sleep(0.01)
+        assert (watcher.watched, watcher.cancelled, watcher.watches) == (1, 0, set())
+        assert receive_stream.receive_nowait() == {'type': 'http.disconnect'}
+        tg.cancel_scope.cancel()
@@ -0,0 +1,129 @@
+import array
+import os
+import time
+from unittest.mock import Mock
+
+import anyio
+import pytest
+from anyio import sleep
+
+from runner_with_api import ASGIRunner
+from runner_with_api import checkpoint as checkpoint_module
+from runner_with_api.checkpoint import BUFFERS, STATE, Checkpoint, CheckpointError
+
+
+
+weights = array.array('f', range(100_000))
+
+
+def test_roundtrip(tmp_path):
+    checkpoint = Checkpoint(tmp_path, ['weights'], threshold=1024)
+    values = {'weights': weights, 'table': {'gain': 1.5}, 'small': array.array('b', b'abc'), 'buffer': array.array('B', bytes(4096))}
+    path = checkpoint.save(values)
+
+    assert path.name == '00000001'
+    assert os.path.getsize(path / STATE) < 1024  # the large buffers are stored aside
+    assert os.path.getsize(path / BUFFERS) >= weights.itemsize * len(weights) + 4096
+
+    restored = checkpoint.load(path)
+    assert restored == values
+    restored['buffer'][0] = 1  # the checkpoint is left untouched
+    assert checkpoint.load(path)['buffer'][0] == 0
+
+
+def test_last_good(tmp_path, caplog):
+    checkpoint = Checkpoint(tmp_path, ['table'], keep=2)
+    for i in range(3):
+        checkpoint.save({'table': i})
+    assert [path.name for path in checkpoint.checkpoints()] == ['00000003', '00000002']
+
+    (checkpoint.checkpoints()[0] / STATE).write_bytes(b'garbage')
+    with pytest.raises(CheckpointError):
+        checkpoint.load(checkpoint.checkpoints()[0])
+
+    class Runner:
+        table = None
+
+    runner = Runner()
+    assert anyio.run(checkpoint.restore, runner)
+    assert runner.table == 1
+    assert 'Corrupted checkpoint' in caplog.text
+
+
+def test_schema(tmp_path):
+    Checkpoint(tmp_path, ['table'], schema=1).save({'table': {'gain': 2}})
+
+    migrated = Checkpoint(tmp_path, ['table'], schema=2,
+        migrations={1: lambda values: {'table': {**values['table'], 'offset': 0}}})
+    assert migrated.load(migrated.checkpoints()[0]) == {'table': {'gain': 2, 'offset': 0}}
+
+    with pytest.raises(CheckpointError, match='No migration'):
+        Checkpoint(tmp_path, ['table'], schema=2).load(migrated.checkpoints()[0])
+
+    migrated.save({'table': {}})
+    with pytest.raises(CheckpointError, match='newer'):
+        Checkpoint(tmp_path, ['table'], schema=1).load(migrated.checkpoints()[0])
+
+
+@pytest.mark.anyio
+async def test_lifespan(tmp_path):
+    class MyRunner(ASGIRunner):
+        checkpoint = Checkpoint(tmp_path, ['weights', 'calibration'], interval=0.05)
+
+        def __init__(self):
+            self.trainings = 0
+
+        async def init(self):
+            if not self.restored:
+                self.trainings += 1
+                self.weights = weights
+                self.calibration = {'offset': 0.5}
+
+        async def run(self):
+            while True:
+                await sleep(1)
+
+    cold = MyRunner()
+    async with cold.lifespan(Mock()):
+        await sleep(0.12)
+    assert MyRunner.checkpoint.saves >= 3  # periodic and on exit
+    assert (cold.restored, cold.trainings) == (False, 1)
+
+    warm = MyRunner()
+    async with warm.lifespan(Mock()):
+        assert (warm.restored, warm.trainings) == (True, 0)
+        assert warm.weights == weights
+        assert warm.calibration == {'offset': 0.5}
+    assert MyRunner.checkpoint.last_restore['attributes'] == ['calibration', 'weights']
+
+
+@pytest.mark.anyio
+async def test_save_during_shutdown(tmp_path, monkeypatch):
+    write = checkpoint_module._write
+
+    def slow_write(*args):  # the saves overlap between their numbering and their rename
+        time.sleep(0.02)
+        write(*args)
+
+    monkeypatch.setattr(checkpoint_module, '_write', slow_write)
+
+    class MyRunner(ASGIRunner):
+        checkpoint = Checkpoint(tmp_path, ['counter'], interval=0.01, keep=10)
+
+        async def init(self):
+            self.counter = 0
+
+        async def run(self):
+            while True:
+                self.counter += 1
+                await sleep(0.005)
+
+    runner = MyRunner()
+    async with runner.lifespan(Mock()):
+        await sleep(0.08)  # exits while a periodic save is in progress
+    checkpoint = MyRunner.checkpoint
+    assert checkpoint.saves >= 2
+    assert [path.name for path in checkpoint.checkpoints()] == [f'{n:08d}' for n in range(checkpoint.saves, 0, -1)]
+    counters = [checkpoint.load(path)['counter'] for path in checkpoint.checkpoints()]
+    assert counters == sorted(counters, reverse=True) and counters[0] > 0  # the final save holds the newest values
+    assert not list(tmp_path.glob('.tmp-*'))
@@ -0,0 +1,108 @@
+import gzip
+import json
+import zlib
+
+import pytest
+from anyio import sleep
+from httpx import ASGITransport, AsyncClient
+
+from runner_with_api.compression import Compression
+from runner_with_api.metrics import Metrics
+from runner_with_api.utils import ResultSlot, Serialized, http_long_polling
+
+
+
+big = json.dumps({'samples': list(range(1000))}).encode()
+shared = Serialized(big, key=('samples', 1))
+
+
+async def app(scope, receive, send):
+    content_type = b'application/octet-stream' if scope['path'] == '/binary' else b'application/json'
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', content_type)]})
+    if scope['path'] == '/poll':
+        async def result():
+            await sleep(0.25)
+            return shared
+        async for chunk in http_long_polling(result(), b'\n', 0.1):
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    elif scope['path'] == '/small':
+        await send({'type': 'http.response.body', 'body': b'{}'})
+    else:
+        await send({'type': 'http.response.body', 'body': shared})
+
+
+async def call(compression: Compression, path: str, accept_encoding: bytes = b'gzip') -> list[dict]:
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'path': path, 'headers': [(b'accept-encoding', accept_encoding)]}
+    await compression.middleware(app)(scope, None, send)
+    return messages
+
+
+@pytest.mark.anyio
+async def test_streaming():
+    compression = Compression(encodings=('zstd', 'gzip'))
+    start, *bodies = await call(compression, '/poll', b'deflate, gzip, br')
+    headers = dict(start['headers'])
+    assert headers[b'content-encoding'] == b'gzip'
+    assert b'content-length' not in headers
+
+    decompressor = zlib.decompressobj(wbits=31)
+    received = [decompressor.decompress(message['body']) for message in bodies]
+    assert received[:2] == [b'\n', b'\n']  # each keepalive is decodable as soon as it is sent
+    assert b''.join(received) == b'\n\n' + big
+    assert decompressor.eof
+
+    # the shared payload is compressed once and spliced into the next stream
+    start, *bodies = await call(compression, '/poll')
+    assert gzip.decompress(b''.join(message['body'] for message in bodies)) == b'\n\n' + big
+    assert (compression.cache_hits, compression.cache_misses) == (1, 1)
+    assert compression.bytes_out < compression.bytes_in / 2
+
+
+@pytest.mark.anyio
+async def test_whole_responses():
+    compression = Compression(route_levels={'/raw': 0, '/fast': 1})
+    start, body = await call(compression, '/samples')
+    assert dict(start['headers'])[b'content-length'] == str(len(body['body'])).encode()
+    assert gzip.decompress(body['body']) == big
+    await call(compression, '/samples')
+    assert compression.cache_hits == 1
+    fast = await call(compression, '/fast/samples')
+    assert gzip.decompress(fast[1]['body']) == big
+    assert compression.cache_misses == 2  # other level
+
+    for path, accept_encoding in [('/raw/samples', b'gzip'), ('/binary', b'gzip'), ('/small', b'gzip'), ('/samples', b'identity')]:
+        start, body = await call(compression, path, accept_encoding)
+        assert b'content-encoding' not in dict(start['headers'])
+
+
+@pytest.mark.anyio
+async def test_metrics():
+    compression = Compression()
+    metrics = Metrics()
+    compression.collect(metrics)
+    async with AsyncClient(transport=ASGITransport(app=compression.middleware(app)), base_url='http://compression.local') as client:
+        r = await client.get('/poll')  # decoded by httpx
+        assert r.headers['content-encoding'] == 'gzip'
+        assert r.content == b'\n\n' + big
+
+    assert compression.cpu_time > 0
+    assert f'runner_compression_bytes_in_total {len(big) + 2}' in metrics.render()
+
+
+@pytest.mark.anyio
+async def test_slot_keys():
+    slot = ResultSlot[int](lambda value: str(value).encode())
+    payloads = []
+
+    for value in (1, 1):
+        generation = slot.generation
+        generation.waiters = 1
+        slot.set(value)
+        payloads.append(generation.payload)
+    assert payloads[0] == payloads[1] and payloads[0].key != payloads[1].key
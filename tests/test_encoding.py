@@ -0,0 +1,64 @@
+import array
+import struct
+import sys
+
+import pytest
+
+from runner_with_api.encoding import ARRAY, JSON, MSGPACK, array_bytes, frame, msgpack_packer, negotiate
+
+
+
+def json(data):
+    return b'json'
+
+
+def msgpack(data):
+    return b'msgpack'
+
+
+@pytest.mark.parametrize('accept, offered, media_type', [
+    (None, (JSON, MSGPACK), JSON),
+    ('*/*', (JSON, MSGPACK), JSON),
+    ('application/msgpack', (JSON, MSGPACK), MSGPACK),
+    ('application/x-msgpack', (JSON, MSGPACK), MSGPACK),
+    ('application/json;q=0.5, application/msgpack', (JSON, MSGPACK), MSGPACK),
+    ('application/msgpack;q=0.5, application/json', (JSON, MSGPACK), JSON),
+    ('application/msgpack;q=0', (JSON, MSGPACK), JSON),
+    ('application/msgpack', (JSON,), JSON),
+    ('application/octet-stream, application/msgpack;q=0.9', (JSON, MSGPACK, ARRAY), ARRAY),
+    ('application/octet-stream', (JSON, MSGPACK), JSON),
+])
+def test_negotiate(accept, offered, media_type):
+    encoding = negotiate(accept, json, msgpack, offered)
+    assert encoding.media_type == media_type
+    if media_type == JSON:
+        assert encoding.keepalive == b'\n'
+        assert encoding.encode(None) == b'json'
+    else:
+        assert encoding.keepalive == b'\0\0\0\0'
+
+
+def test_negotiate_without_msgpack():
+    assert negotiate('application/msgpack', json, None).media_type == JSON
+
+
+def test_frames():
+    assert frame(b'abc') == b'\x03\0\0\0abc'
+    assert negotiate('application/msgpack', json, msgpack).encode(None) == b'\x07\0\0\0msgpack'
+    packer = msgpack_packer()
+    assert packer is not None  # msgspec is installed with Litestar
+    assert packer({'a': 1}) == b'\x81\xa1a\x01'
+
+
+def test_array_bytes():
+    data = array.array('d', [1., 2., 3.])
+    view = array_bytes(data)
+    assert view.obj is data or sys.byteorder == 'big'  # no copy on little-endian hosts
+    assert struct.unpack('<3d', view) == (1., 2., 3.)
+
+    encoding = negotiate(ARRAY, json, msgpack, (JSON, ARRAY))
+    payload = encoding.encode(array.array('i', [-1, 2]))
+    assert payload == struct.pack('<I2i', 8, -1, 2)
+
+    with pytest.raises(ValueError):
+        array_bytes(memoryview(b'abcd')[::2])
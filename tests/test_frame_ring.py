@@ -0,0 +1,118 @@
+import array
+import subprocess
+import sys
+from unittest.mock import Mock
+
+import pytest
+from anyio import sleep, sleep_forever
+
+from runner_with_api import ASGIRunner
+from runner_with_api.frame_ring import FrameReader, FrameRing
+
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing(slots=4, slot_size=1024, metadata={'dtype': 'uint16'})
+    ring.open()
+    yield ring
+    ring.close()
+
+
+def test_publish_and_read(ring):
+    with FrameReader(ring.name) as reader:
+        assert (reader.slots, reader.slot_size, reader.latest) == (4, 1024, 0)
+        assert reader.frame() is None
+
+        assert ring.publish(b'first', timestamp=1.) == 1
+        assert ring.publish(array.array('H', range(512))) == 2  # any contiguous buffer
+        frame = reader.frame(1)
+        assert (frame.sequence, frame.timestamp, bytes(frame.data)) == (1, 1., b'first')
+        frame = reader.frame()
+        assert frame.sequence == reader.latest == 2
+        assert frame.data.cast('H').tolist() == list(range(512))
+        assert frame.valid()
+        assert frame.copy() == array.array('H', range(512)).tobytes()
+
+        first = reader.frame(1)
+        for i in range(4):  # wraps around, the first slot is overwritten
+            ring.publish(bytes([i]))
+        assert not first.valid()
+        assert first.copy() is None
+        assert reader.frame(1) is None and reader.frame(2) is None
+        assert bytes(reader.frame(3).data) == b'\x00'
+        assert reader.frame(7) is None  # not published yet
+        del frame, first
+
+
+def test_info(ring):
+    ring.publish(b'frame')
+    info = ring.info()
+    assert info['name'] == ring.name
+    assert (info['slots'], info['slot_size'], info['latest'], info['metadata']) == (4, 1024, 1, {'dtype': 'uint16'})
+    assert info['data_offset'] % 64 == 0 and info['slot_stride'] % 64 == 0
+
+    with pytest.raises(ValueError, match='larger than the slots'):
+        ring.publish(bytes(1025))
+    with pytest.raises(RuntimeError, match='already open'):
+        ring.open()
+
+
+def test_other_process(ring):
+    ring.publish(bytes(range(256)) * 4)
+    code = (
+        'import sys; from runner_with_api.frame_ring import FrameReader\n'
+        'reader = FrameReader(sys.argv[1]); frame = reader.frame()\n'
+        'print(frame.sequence, sum(frame.data), frame.valid()); del frame; reader.close()\n'
+    )
+    result = subprocess.run([sys.executable, '-c', code, ring.name], capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ['1', str(sum(range(256)) * 4), 'True']
+    assert not result.stderr  # the reader does not remove the shared memory on exit
+    assert bytes(ring.frame().data[:4]) == b'\x00\x01\x02\x03'
+
+
+@pytest.mark.anyio
+async def test_lifespan():
+    class MyRunner(ASGIRunner):
+        frame_ring = FrameRing(slots=2, slot_size=64)
+
+        async def init(self):
+            self.frame_ring.publish(b'init')
+
+        async def run(self):
+            i = 0
+            while True:
+                i += 1
+                self.frame_ring.publish(i.to_bytes(8, 'little'))
+                await sleep(0.01)
+
+    runner = MyRunner()
+    async with runner.lifespan(Mock()):
+        await sleep(0.05)
+        info = await runner.frame_ring_info()
+        with FrameReader(info['name']) as reader:
+            assert reader.latest >= info['latest'] > 2
+            assert reader.frame(1) is None
+    assert runner.frame_ring.name is None
+    with pytest.raises(FileNotFoundError):
+        FrameReader(info['name'])
+
+
+@pytest.mark.anyio
+async def test_instances():
+    class MyRunner(ASGIRunner):
+        frame_ring = FrameRing(slots=2, slot_size=64)
+
+        async def run(self):
+            await sleep_forever()
+
+    first, second = MyRunner(), MyRunner()
+    async with first.lifespan(Mock()):
+        async with second.lifespan(Mock()):
+            assert first.frame_ring is not second.frame_ring
+            assert first.frame_ring.name != second.frame_ring.name
+            first.frame_ring.publish(b'first')
+            assert second.frame_ring.latest == 0
+        assert second.frame_ring.name is None
+        assert bytes(first.frame_ring.frame().data) == b'first'  # still open
+    assert MyRunner.frame_ring.name is None  # the template is never opened
@@ -0,0 +1,67 @@
+import math
+import time
+
+import pytest
+from anyio import create_task_group, sleep
+
+from runner_with_api import ASGIRunner
+from runner_with_api.offload import OffloadPool, offloaded
+
+
+
+class MyRunner(ASGIRunner):
+    offload_pool = OffloadPool(threads=2)
+
+    @offloaded
+    def decode(self, frame: bytes) -> int:
+        time.sleep(0.1)
+        return len(frame)
+
+    @offloaded
+    def scale(self, frame: bytes, factor=1, *, offset=0) -> int:
+        return len(frame) * factor + offset
+
+
+@pytest.mark.anyio
+async def test_offload_threads():
+    runner = MyRunner()
+    ticks = 0
+    queued = []
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            queued.append(runner.offload_pool.queued)
+            await sleep(0.01)
+
+    results = []
+
+    async def decode():
+        results.append(await runner.decode(b'abc'))
+
+    start = time.perf_counter()
+    async with create_task_group() as tg:
+        tg.start_soon(ticker)
+        async with create_task_group() as jobs:
+            for _ in range(4):
+                jobs.start_soon(decode)
+        tg.cancel_scope.cancel()
+    elapsed = time.perf_counter() - start
+
+    pool = runner.offload_pool
+    assert results == [3] * 4
+    assert elapsed >= 0.2  # 2 threads for 4 jobs
+    assert ticks >= 10  # the loop was not blocked
+    assert max(queued) == 2
+    assert (pool.completed, pool.running, pool.queued) == (4, 0, 0)
+    assert pool.wait_time >= 0.2 - 0.02
+    assert 0.1 <= pool.mean_latency <= pool.max_latency
+
+    assert await runner.scale(b'abc', factor=2, offset=1) == 7  # keyword arguments are forwarded
+
+
+@pytest.mark.anyio
+async def test_offload_process():
+    runner = MyRunner()
+    assert await runner.offload(math.factorial, 10, process=True) == math.factorial(10)
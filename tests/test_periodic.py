@@ -0,0 +1,93 @@
+import pytest
+from anyio import create_task_group, current_time, sleep
+
+from runner_with_api import ASGIRunner
+from runner_with_api.metrics import Metrics
+from runner_with_api.periodic import periodic
+
+
+
+class MyRunner(ASGIRunner):
+    def __init__(self):
+        self.calls: list[float] = []
+
+    @periodic(0.05)
+    async def sample(self):
+        self.calls.append(current_time())
+        await sleep(0.03)  # would drift by 60% with sleep(period) after each call
+
+    @periodic(10., name='slow')
+    async def rarely(self):
+        pass
+
+
+def overrunning(overrun):
+    class OverrunRunner(ASGIRunner):
+        def __init__(self):
+            self.calls = 0
+
+        @periodic(0.05, overrun=overrun)
+        async def job(self):
+            self.calls += 1
+            if self.calls == 1:
+                await sleep(0.12)  # past the next 2 deadlines
+
+    return OverrunRunner()
+
+
+@pytest.mark.anyio
+async def test_drift_free():
+    runner = MyRunner()
+    async with create_task_group() as tg:
+        tg.start_soon(runner.periodic.run)
+        await sleep(0.52)
+        tg.cancel_scope.cancel()
+
+    start = runner.calls[0]
+    assert len(runner.calls) == 11
+    for k, t in enumerate(runner.calls):
+        assert abs(t - start - k * 0.05) < 0.02
+
+    stats = (await runner.job_stats())['sample']
+    assert stats['calls'] >= 10  # the last one may have been canceled
+    assert (stats['overruns'], stats['missed']) == (0, 0)
+    assert 0 <= stats['last_jitter'] <= stats['max_jitter'] < 0.02
+    assert runner.periodic.jobs['sample'].jitter.count == 11
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('overrun, missed', [('skip', 2), ('coalesce', 1), ('catch-up', 0)])
+async def test_overrun(overrun, missed):
+    runner = overrunning(overrun)
+    async with create_task_group() as tg:
+        tg.start_soon(runner.periodic.run)
+        await sleep(0.14)  # the calls for the missed deadlines are made right away, or not at all
+        calls = runner.calls
+        tg.cancel_scope.cancel()
+
+    stats = runner.periodic.report()['job']
+    assert stats['missed'] == missed
+    assert stats['overruns'] >= 1
+    assert calls == 1 + 2 - missed
+
+
+@pytest.mark.anyio
+async def test_set_period():
+    runner = MyRunner()
+    metrics = Metrics()
+    runner._collect_metrics(metrics)
+    async with create_task_group() as tg:
+        tg.start_soon(runner.periodic.run)
+        await sleep(0.1)
+        assert runner.periodic.jobs['slow'].calls == 1
+
+        await runner.set_job_period('slow', 0.02)  # wakes up the job sleeping for 10 s
+        await sleep(0.1)
+        assert runner.periodic.jobs['slow'].calls >= 5
+        assert runner.periodic.jobs['slow'].period == 0.02
+        tg.cancel_scope.cancel()
+
+    with pytest.raises(ValueError):
+        runner.periodic.set_period('slow', 0)
+    assert 'runner_periodic_jitter_seconds_count{job="slow"}' in metrics.render()
+    assert 'runner_periodic_overruns_total 0' in metrics.render()
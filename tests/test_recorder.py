@@ -0,0 +1,151 @@
+import io
+import time
+from unittest.mock import Mock
+
+import anyio
+import pytest
+from anyio import sleep
+
+from runner_with_api import ASGIRunner
+from runner_with_api import recorder as recorder_module
+from runner_with_api.metrics import Metrics
+from runner_with_api.recorder import RECORD, Recorder, parse
+
+
+
+def fill(recorder: Recorder, n: int, start=1000., step=0.001) -> None:
+    for i in range(n):
+        recorder.record(i.to_bytes(4, 'little') * 4, start + i * step)
+
+
+def values(records) -> list[int]:
+    return [int.from_bytes(bytes(data[:4]), 'little') for _, data in records]
+
+
+async def collect(recorder: Recorder, start: float, end: float, chunk_size=1 << 16) -> bytes:
+    return b''.join([chunk async for chunk in recorder.stream(start, end, chunk_size)])
+
+
+@pytest.mark.anyio
+async def test_time_range(tmp_path):
+    recorder = Recorder(tmp_path, segment_size=10_000, index_interval=256)
+    fill(recorder, 1000)
+    await recorder.flush()
+    fill(recorder, 10, start=1001.)  # still buffered
+
+    assert len(recorder.segments) == 3  # 28 bytes per record, 358 records per segment
+    assert recorder.segments[1].times[:2] == pytest.approx([1000.358, 1000.368])
+    assert values(recorder.read(1000.1, 1000.2)) == list(range(100, 201))
+    assert values(recorder.read(1000.9995, 1001.0025)) == [0, 1, 2]
+    for chunk_size in (1 << 16, 100):
+        body = await collect(recorder, 1000.1, 1000.2, chunk_size)
+        assert len(body) == 101 * (RECORD.size + 16)
+        assert values(parse(body)) == list(range(100, 201))
+    assert values(parse(await collect(recorder, 1000.998, 1001.0005))) == [998, 999, 0]
+
+
+@pytest.mark.anyio
+async def test_equal_timestamps(tmp_path):
+    recorder = Recorder(tmp_path, index_interval=64)
+    for i in range(20):
+        recorder.record(i.to_bytes(4, 'little'), 5. if 5 <= i < 15 else float(i))
+    recorder.record(b'late', 3.)  # raised to the last timestamp
+    await recorder.flush()
+    assert values(recorder.read(5., 5.)) == list(range(5, 15))
+    assert values(parse(await collect(recorder, 5., 5.))) == list(range(5, 15))
+    assert list(recorder.read(19., 19.))[-1] == (19., b'late')
+
+
+@pytest.mark.anyio
+async def test_retention_and_compaction(tmp_path):
+    recorder = Recorder(tmp_path, segment_size=2_800, segment_duration=0.01, max_bytes=10_000)
+    for i in range(50):  # 10 records per segment duration, in one flush each
+        fill(recorder, 10, start=1000 + i * 0.01)
+        await recorder.flush()
+
+    # segments of 280 bytes merged up to half a segment_size, the oldest deleted beyond max_bytes
+    assert recorder.compactions > 0 and recorder.deleted > 0
+    assert all(segment.size <= 1_400 for segment in recorder.segments)
+    assert sum(segment.size for segment in recorder.segments) <= 10_000
+    assert len(list(tmp_path.glob('*.seg'))) == len(recorder.segments)
+    records = list(recorder.read())
+    assert [t for t, _ in records] == sorted(t for t, _ in records)
+    assert records[-1][0] == pytest.approx(1000.499)
+    assert len(records) == sum(segment.size for segment in recorder.segments) // 28
+
+    aged = Recorder(tmp_path / 'aged', segment_duration=0.01, max_age=60)
+    fill(aged, 10, start=time.time() - 120)
+    fill(aged, 10, start=time.time())
+    await aged.flush()
+    assert aged.deleted == 1
+    assert len(list(aged.read())) == 10
+
+
+@pytest.mark.anyio
+async def test_reopen(tmp_path, monkeypatch):
+    recorder = Recorder(tmp_path, segment_size=1_000, index_interval=100)
+    fill(recorder, 100)
+    await recorder.flush()
+    last = recorder.segments[-1]
+    with open(last.path, 'ab') as f:  # interrupted write
+        f.write(RECORD.pack(2000., 16) + b'partial')
+    last.index_path.write_bytes(last.index_path.read_bytes()[:-3])
+
+    reads: list[int] = []
+
+    class CountingFile(io.FileIO):
+        def read(self, size=-1):
+            data = super().read(size)
+            reads.append(len(data))
+            return data
+
+    monkeypatch.setattr(recorder_module, 'open', lambda path, mode: CountingFile(path), raising=False)
+    reopened = Recorder(tmp_path, segment_size=1_000, index_interval=100)
+    monkeypatch.undo()
+    assert 0 < max(reads) < 300  # the records after the last index entry, not the segments of 1008 bytes
+    assert [(s.start, s.end, s.size, s.times, s.offsets) for s in reopened.segments] == \
+        [(s.start, s.end, s.size, s.times, s.offsets) for s in recorder.segments]
+    assert last.path.stat().st_size == last.size
+    reopened.record(b'next', 1.)
+    assert reopened._buffer == [(recorder.segments[-1].end, b'next')]
+    await reopened.flush()
+    assert values(reopened.read()) == list(range(100)) + [int.from_bytes(b'next', 'little')]
+
+
+@pytest.mark.anyio
+async def test_lifespan(tmp_path):
+    class MyRunner(ASGIRunner):
+        metrics = Metrics()
+
+        def __init__(self):
+            self.recorder = Recorder(tmp_path, flush_interval=0.05)
+
+        async def run(self):
+            i = 0
+            while True:
+                self.recorder.record(i.to_bytes(4, 'little'))
+                i += 1
+                await sleep(0.001)
+
+    runner = MyRunner()
+    async with runner.lifespan(Mock()):
+        await sleep(0.2)
+        assert runner.recorder.flushes >= 2
+        assert runner.recorder.bytes_written > 0
+        assert 'runner_recorder_records_total' in runner.metrics.render()
+    assert values(runner.recorder.read()) == list(range(runner.recorder.records))  # flushed on exit
+    assert not runner.recorder._buffer
+
+
+@pytest.mark.anyio
+async def test_max_buffer(tmp_path):
+    recorder = Recorder(tmp_path, flush_interval=60, max_buffer=100)
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(recorder.run)
+        await sleep(0.01)
+        fill(recorder, 100)
+        with anyio.fail_after(5):
+            while not recorder.flushes:
+                await sleep(0.01)
+        tg.cancel_scope.cancel()
+    assert len(list(recorder.read())) == 100
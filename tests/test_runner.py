@@ -1,9 +1,10 @@
 from unittest.mock import Mock
 
 import pytest
-from anyio import sleep, get_cancelled_exc_class
+from anyio import Event, create_task_group, sleep, get_cancelled_exc_class
 
 from runner_with_api import ASGIRunner
+from runner_with_api.utils import http_long_polling
 
 
 
@@ -73,3 +74,82 @@ async def test_lifespan_error() -> None:
     async with error_run.lifespan(Mock()):
         await sleep(0)
     assert error_run.shutdown
+
+
+@pytest.mark.anyio
+async def test_drain() -> None:
+    class DrainRunner(ASGIRunner):
+        drain_timeout = 1.
+        drain_retry_after = 2.
+
+        def __init__(self):
+            self.cycles = 0
+            self.last_cycle = Event()
+
+        async def run(self):
+            while not self.stopping.is_set():
+                await sleep(0.05)
+                self.cycles += 1
+            self.last_cycle.set()  # the final cycle still publishes its results
+
+    runner = DrainRunner()
+    scheduler = runner.keepalive_scheduler
+    results: dict[str, list] = {'finished': [], 'redirected': []}
+
+    async def poll(name: str, event: Event):
+        async def wait():
+            await event.wait()
+            return name
+
+        async for item in http_long_polling(wait(), '\n', scheduler=scheduler, retry_yield=lambda s: ('retry', s)):
+            results[name].append(item)
+
+    async with create_task_group() as tg:
+        async with runner.lifespan(Mock()):
+            tg.start_soon(poll, 'finished', runner.last_cycle)
+            tg.start_soon(poll, 'redirected', Event())
+            await sleep(0.1)
+            assert len(scheduler.waiters) == 2
+
+    report = runner.drain_report
+    assert report is not None
+    assert report['run_finished']
+    assert report['duration'] < 0.5
+    assert (report['resolved'], report['redirected'], report['dropped']) == (1, 1, 0)
+    assert results['finished'] == ['finished']
+    (retry, seconds), = results['redirected']
+    assert retry == 'retry' and 0 <= seconds <= 2
+
+    async def never():
+        await Event().wait()
+
+    coroutine = never()
+    assert scheduler.draining and scheduler.reject(coroutine) == 2
+    assert scheduler.rejected == 1
+    assert coroutine.cr_frame is None  # closed without a never awaited warning
+
+
+@pytest.mark.anyio
+async def test_drain_deadline() -> None:
+    class StubbornRunner(ASGIRunner):
+        drain_timeout = 0.3
+
+        async def run(self):
+            await sleep(10)  # ignores stopping
+
+    runner = StubbornRunner()
+
+    async with create_task_group() as tg:
+        async with runner.lifespan(Mock()):
+            async def poll():
+                async for _ in http_long_polling(sleep(10), '\n', scheduler=runner.keepalive_scheduler):
+                    pass
+            tg.start_soon(poll)
+            await sleep(0.01)
+        tg.cancel_scope.cancel()
+
+    report = runner.drain_report
+    assert report is not None
+    assert not report['run_finished']
+    assert 0.2 <= report['duration'] < 0.3  # redirected drain_redirect_time before the deadline
+    assert (report['redirected'], report['dropped']) == (1, 0)
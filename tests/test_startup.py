@@ -0,0 +1,112 @@
+import subprocess
+import sys
+import time
+from graphlib import CycleError
+from unittest.mock import Mock
+
+import pytest
+from anyio import Event, sleep
+
+from runner_with_api import ASGIRunner
+from runner_with_api.startup import init_step
+
+
+
+class MyRunner(ASGIRunner):
+    def __init__(self):
+        self.order = []
+        self.warm = Event()
+
+    async def init(self):
+        self.order.append('init')
+
+    @init_step()
+    async def load_config(self):
+        await sleep(0.1)
+        self.order.append('load_config')
+
+    @init_step()
+    async def open_device(self):
+        await sleep(0.1)
+        self.order.append('open_device')
+
+    @init_step(after=['load_config', 'open_device'])
+    async def calibrate(self):
+        self.order.append('calibrate')
+
+    @init_step(after=['calibrate'], warmup=True)
+    async def warmup_model(self):
+        await self.warm.wait()
+        self.order.append('warmup_model')
+
+
+@pytest.mark.anyio
+async def test_init_steps():
+    runner = MyRunner()
+
+    start = time.perf_counter()
+    async with runner.lifespan(Mock()):
+        elapsed = time.perf_counter() - start
+        assert elapsed < 0.19  # the two first steps ran concurrently
+        assert runner.order[0] == 'init'
+        assert set(runner.order[1:3]) == {'load_config', 'open_device'}
+        assert runner.order[3:] == ['calibrate']
+
+        await sleep(0.01)
+        ready, steps = await runner.readiness()
+        assert not ready
+        assert steps['calibrate']['state'] == 'done'
+        assert steps['warmup_model']['state'] == 'running'
+
+        runner.warm.set()
+        await sleep(0.01)
+        ready, steps = await runner.readiness()
+        assert ready
+        assert steps['warmup_model']['state'] == 'done'
+
+
+def test_init_steps_validation():
+    class Unknown(ASGIRunner):
+        @init_step(after=['nope'])
+        async def step(self): ...
+
+    class AfterWarmup(ASGIRunner):
+        @init_step(warmup=True)
+        async def warm(self): ...
+
+        @init_step(after=['warm'])
+        async def step(self): ...
+
+    class Cycle(ASGIRunner):
+        @init_step(after=['b'])
+        async def a(self): ...
+
+        @init_step(after=['a'])
+        async def b(self): ...
+
+    with pytest.raises(ValueError, match='unknown'):
+        Unknown().startup
+    with pytest.raises(ValueError, match='warmup'):
+        AfterWarmup().startup
+    with pytest.raises(CycleError):
+        Cycle().startup
+
+
+OPTIONAL = {'runner_with_api.checkpoint', 'runner_with_api.frame_ring', 'runner_with_api.recorder', 'runner_with_api.workers',
+    'runner_with_api.offload', 'multiprocessing.shared_memory', 'mmap'}
+
+
+@pytest.mark.parametrize('module, lazy', [
+    ('runner_with_api', {'uvicorn', 'fastapi', 'litestar', 'pydantic', *OPTIONAL}),
+    ('runner_with_api.utils', {'uvicorn', 'fastapi', 'litestar', 'pydantic', *OPTIONAL}),
+    ('runner_with_api.litestar.utils', {'uvicorn', 'fastapi', 'pydantic'}),
+    ('runner_with_api.fastapi', {'uvicorn', 'litestar'}),
+])
+def test_import_time(module: str, lazy: set[str]):
+    """Guard the cold start: the modules only needed later, by the optional features or by the other framework, are not imported."""
+    code = f'import sys, time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t); print(*sys.modules)'
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.splitlines()
+    elapsed, modules = float(out[0]), set(out[1].split())
+
+    assert not lazy & modules
+    assert elapsed < 2.
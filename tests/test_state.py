@@ -0,0 +1,115 @@
+from unittest.mock import Mock
+
+import pytest
+from anyio import create_task_group, sleep
+
+from runner_with_api import ASGIRunner
+from runner_with_api.state import VersionConflict, VersionedState
+
+
+
+@pytest.mark.anyio
+async def test_state_coalescing():
+    state = VersionedState({'exposure': 1, 'gain': 1}, debounce=0.05)
+    snapshots = []
+
+    async with create_task_group() as tg:
+        tg.start_soon(state.run)
+        for i in range(100):
+            state.update({'exposure': i})
+            await sleep(0.001)
+
+        assert state.snapshot()['exposure'] == 1  # not committed yet
+        assert state.latest()['exposure'] == 99
+        snapshots.append(await state.wait_changed())
+        tg.cancel_scope.cancel()
+
+    snapshot, = snapshots
+    assert snapshot.values == {'exposure': 99, 'gain': 1}
+    assert snapshot.version == state.version == 100
+    assert state.writes == 100
+    assert state.commits <= 2  # bounded by max_delay, 10 x debounce
+
+
+@pytest.mark.anyio
+async def test_state_max_delay():
+    state = VersionedState(debounce=0.05, max_delay=0.1)
+    commits = []
+
+    async def watch():
+        since = 0
+        while True:
+            snapshot = await state.wait_changed(since=since)
+            commits.append(snapshot['i'])
+            since = snapshot.version
+
+    async with create_task_group() as tg:
+        tg.start_soon(state.run)
+        tg.start_soon(watch)
+        for i in range(50):  # writes never pause for the debounce window
+            state.update({'i': i})
+            await sleep(0.01)
+        await sleep(0.1)
+        tg.cancel_scope.cancel()
+
+    assert 3 <= len(commits) <= 7
+    assert commits[-1] == 49
+
+
+def test_state_compare_and_set():
+    state = VersionedState({'exposure': 1})
+    snapshot = state.latest()
+
+    assert state.update({'exposure': 2}, expected_version=snapshot.version) == 1
+    with pytest.raises(VersionConflict) as e:
+        state.update({'exposure': 3}, expected_version=snapshot.version)
+    assert (e.value.expected, e.value.version) == (0, 1)
+
+    assert state.snapshot()['exposure'] == 2
+    assert snapshot['exposure'] == 1  # snapshots are immutable views
+    with pytest.raises(TypeError):
+        state.snapshot().values['exposure'] = 4  # type: ignore[index]
+
+
+@pytest.mark.anyio
+async def test_state_watch_keys():
+    state = VersionedState({'exposure': 1, 'gain': 1})
+    woken = []
+
+    async def watch(key: str):
+        snapshot = await state.wait_changed([key])
+        woken.append((key, snapshot[key]))
+
+    async with create_task_group() as tg:
+        tg.start_soon(watch, 'exposure')
+        tg.start_soon(watch, 'gain')
+        await sleep(0.01)
+
+        state.update({'exposure': 1})  # same value, nobody is woken
+        await sleep(0.01)
+        assert woken == []
+
+        state.update({'exposure': 2})
+        await sleep(0.01)
+        assert woken == [('exposure', 2)]
+        assert len(state._watches) == 1
+
+        state.update({'gain': 3})
+
+    assert woken == [('exposure', 2), ('gain', 3)]
+    assert state.commits == 3
+
+
+@pytest.mark.anyio
+async def test_state_lifespan():
+    class MyRunner(ASGIRunner):
+        def __init__(self):
+            self.config = VersionedState({'exposure': 1}, debounce=0.02)
+
+    runner = MyRunner()
+    async with runner.lifespan(Mock()):
+        runner.config.update({'exposure': 2})
+        runner.config.update({'exposure': 3})
+        await sleep(0.05)
+        assert runner.config.snapshot()['exposure'] == 3
+        assert runner.config.commits == 1
@@ -0,0 +1,68 @@
+import pytest
+from anyio import create_task_group, sleep
+
+from runner_with_api import ASGIRunner
+from runner_with_api.supervisor import supervised
+
+
+
+class MyRunner(ASGIRunner):
+    def __init__(self):
+        self.polls = 0
+        self.crashes_left = 3
+
+    @supervised(backoff=0.01)
+    async def poll_device(self):
+        self.polls += 1
+        if self.crashes_left:
+            self.crashes_left -= 1
+            raise ConnectionError('device unplugged')
+        await sleep(10)
+
+    @supervised(name='flaky', restart='on-failure', max_restarts=2, backoff=0.001)
+    async def always_crashes(self):
+        raise RuntimeError('boom')
+
+    @supervised(restart='always', backoff=0.001, max_backoff=0.001)
+    async def one_shot(self):
+        await sleep(0.01)
+
+
+@pytest.mark.anyio
+async def test_supervisor():
+    runner = MyRunner()
+    supervisor = runner.supervisor
+    assert set(supervisor.policies) == {'poll_device', 'flaky', 'one_shot'}
+
+    async with create_task_group() as tg:
+        tg.start_soon(supervisor.run)
+        await sleep(0.3)
+
+        health = await runner.task_health()
+        assert health['poll_device']['state'] == 'running'
+        assert health['poll_device']['crashes'] == 3
+        assert health['poll_device']['starts'] == 4 == runner.polls
+        assert health['poll_device']['last_error'] == "ConnectionError('device unplugged')"
+
+        assert health['flaky']['state'] == 'failed'
+        assert health['flaky']['crashes'] == 3  # the first run plus max_restarts
+        assert health['one_shot']['starts'] > 5
+        assert health['one_shot']['crashes'] == 0
+        assert not supervisor.healthy
+        tg.cancel_scope.cancel()
+
+
+@pytest.mark.anyio
+async def test_supervisor_backoff():
+    class Backoff(ASGIRunner):
+        @supervised(backoff=0.02, max_backoff=0.04)
+        async def crash(self):
+            raise RuntimeError
+
+    runner = Backoff()
+    async with create_task_group() as tg:
+        tg.start_soon(runner.supervisor.run)
+        await sleep(0.15)  # sleeps 0.02, 0.04, 0.04, ...
+        tg.cancel_scope.cancel()
+
+    assert 3 <= runner.supervisor.tasks['crash'].crashes <= 5
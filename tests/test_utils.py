@@ -1,8 +1,8 @@
 
 import pytest
-from anyio import create_task_group, sleep
+from anyio import WouldBlock, create_task_group, fail_after, sleep
 
-from runner_with_api.utils import AnyioDeque, http_long_polling
+from runner_with_api.utils import AnyioBroadcast, AnyioDeque, KeepaliveScheduler, ResultSlot, http_long_polling, http_streaming, sse_events
 
 
 @pytest.mark.anyio
@@ -42,3 +42,192 @@ async def test_long_polling():
         else:
             assert event == 42, i
         i += 1
+
+
+@pytest.mark.anyio
+async def test_long_polling_scheduler():
+    period = 0.1
+    n = 2
+    scheduler = KeepaliveScheduler(period)
+
+    async def my_task():
+        await sleep(period * (n + 0.5))
+        return 42
+
+    async def poll(events: list):
+        async for event in http_long_polling(my_task(), keepalive_yield='\n', scheduler=scheduler):
+            events.append(event)
+
+    results: list[list] = [[] for _ in range(3)]
+    async with create_task_group() as tg:
+        tg.start_soon(scheduler.run)
+        async with create_task_group() as polls:
+            for events in results:
+                polls.start_soon(poll, events)
+        tg.cancel_scope.cancel()
+
+    assert results == [['\n'] * n + [42]] * 3
+    assert scheduler.ticks == n
+    assert not scheduler.waiters
+
+
+@pytest.mark.anyio
+async def test_deque_batch():
+    deque = AnyioDeque[int](3)
+
+    await deque.put_many(range(5))
+    assert deque.drain() == [2, 3, 4]
+    assert deque.drain() == []
+
+    deque.put_nowait(1)
+    deque.put_many_nowait([2, 3])
+    assert deque.get_nowait() == 1
+    assert await deque.get_many(max_items=1) == [2]
+    assert await deque.get_many() == [3]
+    assert await deque.get_many(timeout=0.05) == []
+
+    with pytest.raises(WouldBlock):
+        deque.get_nowait()
+
+
+@pytest.mark.anyio
+async def test_deque_nowait_wakeup():
+    deque = AnyioDeque[int](10)
+
+    async def put_later():
+        await sleep(0.05)
+        assert deque.waiters == 1
+        deque.put_nowait(1)
+        deque.put_nowait(2)
+
+    async with create_task_group() as tg:
+        tg.start_soon(put_later)
+        with fail_after(1):
+            assert await deque.get_many() == [1, 2]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('method', ['get', 'get_many'])
+async def test_deque_nowait_interleaved(method):
+    """put_nowait() landing at every checkpoint of a consumer that is about to park must not be lost."""
+    for checkpoints in range(6):
+        deque = AnyioDeque[int](10)
+        received = []
+
+        async def consume():
+            received.append(await getattr(deque, method)())
+
+        with fail_after(1):
+            async with create_task_group() as tg:
+                tg.start_soon(consume)
+                for _ in range(checkpoints):
+                    await sleep(0)
+                deque.put_nowait(1)
+
+        assert received[0] in (1, [1]), checkpoints
+
+
+@pytest.mark.anyio
+async def test_broadcast():
+    broadcast = AnyioBroadcast[int](3)
+    early = broadcast.subscribe()
+    broadcast.publish(0)
+    late = broadcast.subscribe()
+
+    broadcast.publish_many(range(1, 5))
+    assert early.lag == 3
+    assert await early.get_many() == [2, 3, 4]
+    assert early.dropped == 2
+    assert await late.get_many(max_items=2) == [2, 3]
+    assert late.dropped == 1
+
+    resumed = broadcast.subscribe(start=3)
+    assert resumed.get_nowait() == 3
+    assert await early.get_many(timeout=0.05) == []
+
+
+@pytest.mark.anyio
+async def test_broadcast_wakeup():
+    broadcast = AnyioBroadcast[int](10)
+    subscriptions = [broadcast.subscribe() for _ in range(3)]
+    received: list[int] = []
+
+    async def consume(subscription):
+        async for data in subscription:
+            received.append(data)
+            break
+
+    async with create_task_group() as tg:
+        for subscription in subscriptions:
+            tg.start_soon(consume, subscription)
+        await sleep(0.05)
+        assert len(broadcast.parked) == 3
+        broadcast.publish(7)
+
+    assert received == [7, 7, 7]
+    assert not broadcast.parked
+
+
+@pytest.mark.anyio
+async def test_streaming():
+    period = 0.1
+    produced = 0
+
+    async def source():
+        nonlocal produced
+        for i in range(3):
+            produced += 1
+            yield i
+        await sleep(period * 1.5)
+
+    received = []
+    async for event in http_streaming(source(), keepalive_yield=None, keepalive_period=period):
+        if event is not None:
+            assert produced <= event + 2  # backpressure: the source is never far ahead
+            await sleep(period / 10)
+        received.append(event)
+
+    assert received == [0, 1, 2, None]
+
+
+@pytest.mark.anyio
+async def test_sse_resume():
+    broadcast = AnyioBroadcast[str](10)
+    broadcast.publish_many('abcd')
+
+    events = sse_events(broadcast, last_event_id='1')
+    assert await events.__anext__() == (2, 'c')
+    assert await events.__anext__() == (3, 'd')
+    await events.aclose()
+
+    events = sse_events(broadcast, last_event_id='-5')
+    assert await events.__anext__() == (0, 'a')
+    await events.aclose()
+
+
+@pytest.mark.anyio
+async def test_result_slot():
+    serializations = []
+
+    def serialize(value: int) -> bytes:
+        serializations.append(value)
+        return str(value).encode()
+
+    slot = ResultSlot(serialize)
+    slot.set(0)  # nobody waiting, not serialized
+    results = []
+
+    async def wait():
+        results.append(await slot.wait())
+
+    async with create_task_group() as tg:
+        for _ in range(3):
+            tg.start_soon(wait)
+        await sleep(0.01)
+        assert slot.waiting == 3
+        slot.set(1)
+
+    assert results == [b'1'] * 3
+    assert results[0] is results[1] is results[2]
+    assert serializations == [1]
+    assert (slot.published, slot.serializations, slot.fanout, slot.hits) == (2, 1, 3, 2)
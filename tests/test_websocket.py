@@ -0,0 +1,55 @@
+import json
+
+import pytest
+from anyio import create_task_group, create_memory_object_stream, fail_after, sleep
+
+from runner_with_api.websocket import WebSocketHub
+
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.incoming, self.receive_stream = create_memory_object_stream[dict](10)
+        self.sent: list[dict] = []
+
+    async def accept(self):
+        ...
+
+    async def receive(self):
+        return await self.receive_stream.receive()
+
+    async def send(self, event: dict):
+        self.sent.append(event)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('coalesce', [False, True])
+async def test_hub(coalesce: bool):
+    hub = WebSocketHub(coalesce=coalesce)
+    websocket = FakeWebSocket()
+
+    async def on_message(command):
+        if command == 'fail':
+            raise RuntimeError
+        return command
+
+    with fail_after(1):
+        async with create_task_group() as tg:
+            tg.start_soon(hub.serve, websocket, on_message)
+            await sleep(0.01)
+            assert len(hub.connections) == 1
+
+            await websocket.incoming.send({'type': 'websocket.receive', 'text': ''})
+            await websocket.incoming.send({'type': 'websocket.receive', 'text': '"fail"'})
+            await websocket.incoming.send({'type': 'websocket.receive', 'bytes': b'"echo"'})
+            await sleep(0.01)
+            hub.broadcast(1)
+            hub.broadcast(2)
+            await sleep(0.01)
+            await websocket.incoming.send({'type': 'websocket.disconnect'})
+
+    assert not hub.connections
+    frames = [event['text'] for event in websocket.sent]
+    messages = [json.loads(line) for frame in frames for line in frame.split('\n')]
+    assert messages == ['echo', 1, 2]
+    assert len(frames) == (2 if coalesce else 3)
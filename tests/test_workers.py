@@ -0,0 +1,54 @@
+import pytest
+from anyio import create_task_group
+
+from runner_with_api import ASGIRunner
+from runner_with_api.workers import IPCClient, IPCServer, primary
+
+
+
+class MyRunner(ASGIRunner):
+    def __init__(self):
+        self.config = {}
+
+    @primary
+    async def set_config(self, config: dict) -> int:
+        self.config = config
+        return len(config)
+
+    @primary
+    async def fail(self) -> None:
+        raise ValueError('failed in primary')
+
+    async def not_primary(self) -> None:
+        ...
+
+
+@pytest.mark.anyio
+async def test_primary_proxy(tmp_path):
+    path = str(tmp_path / 'ipc.sock')
+    runner = MyRunner()  # primary process
+    worker = MyRunner()  # worker process
+
+    assert await runner.set_config({'a': 0}) == 1  # called directly without a client
+
+    async with create_task_group() as tg:
+        server = IPCServer(runner, path)
+        await tg.start(server.serve)
+        worker._ipc_client = IPCClient(path)
+        await tg.start(worker._ipc_client.run)
+
+        async with create_task_group() as calls:
+            for i in range(10):
+                calls.start_soon(worker.set_config, {'a': i, 'b': i})
+
+        assert worker.config == {}
+        assert runner.config['a'] == runner.config['b']
+        assert server.calls == 10
+
+        with pytest.raises(ValueError, match='failed in primary'):
+            await worker.fail()
+
+        with pytest.raises(AttributeError):
+            await worker._ipc_client.call('not_primary', (), {})
+
+        tg.cancel_scope.cancel()